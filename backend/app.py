@@ -3,20 +3,90 @@
 """Lens Backend Application."""
 
 import logging
+from ingest import get_queue
+from functools import partial
 from motorengine import connect
-from handlers import get_handlers
 from tornado.ioloop import IOLoop
 from tornado.web import Application
 from tornado.options import define, options
+from migrations import BACKFILLS, run_migrations
+from models import ensure_indexes, instrument_queries
+from handlers import RequestDelegate, get_handlers, observe_request
 
 __author__ = "Anass Al-Wohoush"
 __version__ = "0.3.0"
 
 # Set up command-line arguments.
+define("backfill", default=True,
+       help="run data backfills in the background at startup")
+define("codec", default="png",
+       help="codec to store frame images with: png, webp, zlib or lz4")
 define("db", default="lens", help="database name")
+define("batch_size", default=100, type=int,
+       help="number of frames per bulk insert during ingestion")
+define("batch_bytes", default=16 * 1024 * 1024, type=int,
+       help="maximum image bytes buffered before a bulk insert")
 define("debug", default=False, help="debug mode")
 define("host", default="0.0.0.0", help="host to run on")
+define("image_store", default="document",
+       help="where to store frame images (document or segment)")
+define("ingest_checkpoint_interval", default=5, type=int,
+       help="seconds between checkpoints of bag ingestion progress")
+define("ingest_concurrency", default=2, type=int,
+       help="number of bags ingested at once by this process (0 to disable)")
+define("ingest_poll_interval", default=5, type=int,
+       help="seconds between polls for queued bags to ingest")
+define("ingest_schedule", default="priority",
+       help="order queued bags are ingested in: priority or fifo")
+define("ingest_slice_size", default=256 * 1024 * 1024, type=int,
+       help="approximate bytes of a bag read at once by a worker process")
+define("ingest_timeout", default=60, type=int,
+       help="seconds without a checkpoint after which ingestion is resumed")
+define("intern_cache_size", default=10000, type=int,
+       help="maximum number of tags and users cached in memory")
+define("intern_cache_ttl", default=300, type=int,
+       help="seconds tags and users stay cached in memory")
+define("lease_timeout", default=60, type=int,
+       help="seconds before an unannotated frame can be handed out again")
+define("migration_batch_size", default=500, type=int,
+       help="number of documents to migrate per round trip")
+define("png_level", default=3, type=int,
+       help="compression level of the png codec, from 0 to 9")
+define("profile", default=False,
+       help="profile requests with an X-Profile header or --profile_rate")
+define("profile_dir", default="/var/lib/lens/profiles",
+       help="directory to write request profiles to")
+define("profile_history", default=100, type=int,
+       help="number of recent profiled requests listed by /admin/profiles")
+define("profile_rate", default=0.0, type=float,
+       help="fraction of requests profiled at random with --profile")
 define("port", default=8888, help="port to run on")
+define("render_cache_size", default=64 * 1024 * 1024, type=int,
+       help="maximum bytes of rendered images cached in memory")
+define("render_cache_dir", default="",
+       help="directory to also cache rendered images in (disabled if empty)")
+define("render_cache_disk_size", default=1024 * 1024 * 1024, type=int,
+       help="maximum bytes of rendered images cached on disk")
+define("sampler", default="difference",
+       help="frame sampler to ingest bags with: difference or stride")
+define("sample_max_frames", default=0, type=int,
+       help="maximum frames kept per topic (0 for no limit)")
+define("sample_min_gap", default=0.5, type=float,
+       help="minimum seconds between frames kept by the difference sampler")
+define("sample_stride", default=10, type=int,
+       help="number of messages between frames kept by the stride sampler")
+define("sample_threshold", default=0.02, type=float,
+       help="minimum difference between frames kept, between 0 and 1")
+define("segment_dir", default="/var/lib/lens/segments",
+       help="directory of the segment image store")
+define("segment_size", default=1024 * 1024 * 1024, type=int,
+       help="size in bytes after which a new image segment is started")
+define("topic_codecs", default="",
+       help="comma-separated topic=codec overrides of --codec for new feeds")
+define("workers", default=None, type=int,
+       help="number of image encoding processes (default: one per core)")
+define("zlib_level", default=1, type=int,
+       help="compression level of the zlib codec, from 1 to 9")
 
 
 class Backend(Application):
@@ -32,16 +102,40 @@ class Backend(Application):
             **kwargs
         )
 
+    def start_request(self, server_conn, request_conn):
+        """Starts handling a request, with its own RequestMetrics."""
+        return RequestDelegate(
+            super(Backend, self).start_request(server_conn, request_conn)
+        )
+
+    def log_request(self, handler):
+        """Logs and records a completed request."""
+        super(Backend, self).log_request(handler)
+        observe_request(handler)
+
 
 def run():
     """Runs application."""
     options.parse_command_line()
+    instrument_queries()
 
     app = Backend(debug=True, options=options)
     app.listen(options.port, options.host)
     logging.critical("Running on http://{o.host}:{o.port}".format(o=options))
 
     connect(options.db)
+
+    # Create indexes and backfill missing data without holding up requests.
+    IOLoop.instance().spawn_callback(ensure_indexes)
+    if options.backfill:
+        IOLoop.instance().spawn_callback(partial(
+            run_migrations, BACKFILLS, options.migration_batch_size
+        ))
+
+    # Ingest queued bags, unless a separate worker process does.
+    if options.ingest_concurrency:
+        get_queue().start(options.ingest_poll_interval)
+
     IOLoop.instance().start()
 
 
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+"""Lens Backend Benchmarks.
+
+Times the ingest, decode and serialization hot paths on synthetic images of
+each encoding and resolution, and reports frames per second, bytes per frame
+and peak memory. Each case is run in its own process so its peak memory is
+its own. Nothing is written to the database, so no MongoDB is needed.
+
+Usage:
+    python benchmark.py [--benchmark_frames=50] [--codec=png]
+        [--benchmark_output=results.json] [--benchmark_baseline=old.json]
+        [names...]
+
+If no benchmark names are given, all benchmarks are run. Results saved with
+--benchmark_output can be compared with a later run by passing them as
+--benchmark_baseline, in which case this exits with status 1 if any case
+regressed. A case regressed if its frames per second, bytes per frame or
+peak memory got worse by more than --benchmark_tolerance. Only results of
+the same --codec are compared.
+"""
+
+import sys
+import json
+import logging
+from app import options
+from functools import partial
+from datetime import datetime
+from tornado.ioloop import IOLoop
+from tornado.options import define
+from subprocess import CalledProcessError
+from benchmarks import BENCHMARKS, Case, compare, measure, report, run_case
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+define("benchmark_baseline", default="",
+       help="results of a previous run to compare with")
+define("benchmark_case", default="",
+       help="single case to run and print the results of, used internally")
+define("benchmark_encodings", default="mono8,bgr8,16UC1",
+       help="comma-separated image encodings to benchmark")
+define("benchmark_frames", default=50, type=int,
+       help="number of frames timed per case")
+define("benchmark_output", default="",
+       help="file to save the results to as JSON")
+define("benchmark_resolutions", default="320x240,640x480,1280x720",
+       help="comma-separated image resolutions to benchmark")
+define("benchmark_tolerance", default=0.1, type=float,
+       help="relative change tolerated before a case is a regression")
+
+
+def run_one():
+    """Runs the case given by --benchmark_case and prints its results."""
+    case = Case.parse(options.benchmark_case)
+    result = IOLoop.instance().run_sync(partial(
+        run_case, case, dict(BENCHMARKS)[case.name], options.benchmark_frames
+    ))
+    print(json.dumps(result))
+
+
+def run():
+    """Runs benchmarks given on the command line."""
+    names = options.parse_command_line()
+    if options.benchmark_case:
+        run_one()
+        return
+
+    unknown = set(names) - set(name for name, _ in BENCHMARKS)
+    if unknown:
+        logging.error("Unknown benchmarks: %s", ", ".join(sorted(unknown)))
+        sys.exit(1)
+
+    try:
+        cases = [
+            Case.parse(":".join([name, encoding, resolution]))
+            for name, _ in BENCHMARKS if not names or name in names
+            for encoding in options.benchmark_encodings.split(",")
+            for resolution in options.benchmark_resolutions.split(",")
+        ]
+    except ValueError as e:
+        logging.error("Invalid encodings or resolutions: %s", e)
+        sys.exit(1)
+
+    # Cases are run by this same script, with the same options.
+    argv = [arg for arg in sys.argv[1:] if arg.startswith("--")]
+    results = []
+    for case in cases:
+        logging.info("Running %s", case)
+        try:
+            results.append(measure(__file__, case, argv))
+        except CalledProcessError:
+            logging.error("Benchmark %s failed", case)
+            sys.exit(1)
+
+    baseline = []
+    if options.benchmark_baseline:
+        with open(options.benchmark_baseline) as f:
+            saved = json.load(f)
+        baseline = saved["results"]
+        if saved.get("codec") != options.codec:
+            logging.warning("Baseline was run with --codec=%s, so none of "
+                            "its results are compared", saved.get("codec"))
+    comparison = compare(results, baseline, options.benchmark_tolerance)
+    print(report(comparison))
+
+    if options.benchmark_output:
+        with open(options.benchmark_output, "w") as f:
+            json.dump({
+                "created": datetime.utcnow().isoformat(),
+                "codec": options.codec,
+                "frames": options.benchmark_frames,
+                "results": results
+            }, f, indent=2, sort_keys=True)
+
+    if any(regressed for _, _, regressed in comparison):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+
+"""Lens Backend Benchmarks."""
+
+import cases
+from seed import reset, seed
+from payloads import ENCODINGS
+from annotator import Annotator, LoadStats
+from runner import Case, compare, measure, report, run_case
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+# Benchmarks by name, in the order they are run.
+BENCHMARKS = [
+    ("encode", cases.encode),
+    ("from_ros_image", cases.from_ros_image),
+    ("parse_image", cases.parse_image),
+    ("to_jpeg", cases.to_jpeg),
+    ("dump", cases.dump),
+    ("encoder", cases.encoder),
+]
+
+__all__ = [
+    "Annotator", "BENCHMARKS", "Case", "ENCODINGS", "LoadStats", "compare",
+    "measure", "report", "reset", "run_case", "seed"
+]
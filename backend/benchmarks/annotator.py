@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+
+"""Simulated annotators."""
+
+import json
+import time
+import random
+from collections import deque
+from tornado.httpclient import HTTPRequest
+from tornado.gen import coroutine, Return, sleep
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+# Endpoints latencies are reported for, in the order of an annotation cycle.
+ENDPOINTS = ["next", "image", "renew", "annotate", "release"]
+
+# Seconds to wait before leasing again after GET /next failed, so a failing
+# backend isn't flooded with retries.
+RETRY_DELAY = 0.5
+
+
+def percentile(values, p):
+    """Returns a percentile by the nearest-rank method.
+
+    Args:
+        values: Sorted list of values.
+        p: Percentile, between 0 and 100.
+
+    Returns:
+        Percentile, or None if there are no values.
+    """
+    if not values:
+        return None
+    rank = max(1, int(round(p / 100.0 * len(values))))
+    return values[min(rank, len(values)) - 1]
+
+
+class LoadStats(object):
+
+    """Latencies and frame assignments recorded by simulated annotators.
+
+    Attributes:
+        annotators: Number of simultaneous annotators.
+        latencies: Dictionary of lists of request latencies in seconds by
+            endpoint.
+        errors: Dictionary of the number of failed requests by endpoint.
+        leases: Dictionary of the set of annotators each frame was leased
+            to by frame ID.
+        annotations: Dictionary of the number of times each frame was
+            annotated by frame ID.
+        started: Time the load test started.
+        stopped: Time the load test stopped.
+    """
+
+    def __init__(self, annotators):
+        """Constructs a LoadStats.
+
+        Args:
+            annotators: Number of simultaneous annotators.
+        """
+        self.annotators = annotators
+        self.latencies = dict((endpoint, []) for endpoint in ENDPOINTS)
+        self.errors = dict((endpoint, 0) for endpoint in ENDPOINTS)
+        self.leases = {}
+        self.annotations = {}
+        self.started = None
+        self.stopped = None
+
+    def summary(self):
+        """Returns a dictionary summary of the load test.
+
+        Latencies are in milliseconds and throughputs per second.
+        """
+        seconds = float((self.stopped or time.time()) - self.started)
+        endpoints = {}
+        for endpoint in ENDPOINTS:
+            latencies = sorted(self.latencies[endpoint])
+            endpoints[endpoint] = {
+                "requests": len(latencies),
+                "errors": self.errors[endpoint],
+                "per_second": len(latencies) / seconds if seconds else None,
+                "mean": (sum(latencies) / len(latencies) * 1000
+                         if latencies else None),
+                "p50": percentile([l * 1000 for l in latencies], 50),
+                "p95": percentile([l * 1000 for l in latencies], 95),
+                "p99": percentile([l * 1000 for l in latencies], 99),
+            }
+
+        annotated = sum(self.annotations.values())
+        return {
+            "annotators": self.annotators,
+            "seconds": seconds,
+            "endpoints": endpoints,
+            "requests_per_second": (
+                sum(len(l) for l in self.latencies.values()) / seconds
+                if seconds else None
+            ),
+            "annotations_per_second": annotated / seconds if seconds else None,
+            "frames_leased": len(self.leases),
+            "duplicate_leases": sum(
+                1 for annotators in self.leases.values() if len(annotators) > 1
+            ),
+            "duplicate_annotations": sum(
+                1 for count in self.annotations.values() if count > 1
+            )
+        }
+
+    def report(self):
+        """Returns the summary of the load test formatted as a table."""
+        def ms(value):
+            return "{:.1f}".format(value) if value is not None else "-"
+
+        summary = self.summary()
+        row = "{:<10}{:>10}{:>8}{:>10}{:>10}{:>10}{:>10}"
+        lines = [
+            "{annotators} annotators for {seconds:.0f}s: "
+            "{requests_per_second:.1f} requests/s, "
+            "{annotations_per_second:.1f} annotations/s".format(**summary),
+            "{frames_leased} frames leased, {duplicate_leases} to more than "
+            "one annotator, {duplicate_annotations} annotated more than once"
+            .format(**summary),
+            row.format("endpoint", "requests", "errors", "mean ms", "p50 ms",
+                       "p95 ms", "p99 ms")
+        ]
+        for endpoint in ENDPOINTS:
+            stats = summary["endpoints"][endpoint]
+            lines.append(row.format(
+                endpoint, stats["requests"], stats["errors"],
+                ms(stats["mean"]), ms(stats["p50"]), ms(stats["p95"]),
+                ms(stats["p99"])
+            ))
+        return "\n".join(lines)
+
+
+class Annotator(object):
+
+    """Closed-loop annotator running the same cycle as frame.js.
+
+    Frames are leased in batches with GET /next, and all of a batch's images
+    are prefetched with GET /image/<id> as soon as it arrives. The leases of
+    the frames still queued are renewed with POST /next/renew whenever a
+    frame is shown. Each frame is then annotated with POST /annotate/<id>
+    once its image has loaded and the annotator has thought about it, and
+    the next batch is leased in the background once only one frame is left.
+    Unannotated frames are released with POST /next/release when the
+    annotator stops.
+
+    Attributes:
+        index: Annotator number.
+        session: Annotation session frames are leased under.
+        exhausted: Whether there were no frames left to lease.
+    """
+
+    def __init__(self, index, client, url, stats, batch_size=5,
+                 think_time=0, level=0):
+        """Constructs an Annotator.
+
+        Args:
+            index: Annotator number.
+            client: AsyncHTTPClient.
+            url: Base URL of the backend.
+            stats: LoadStats to record to.
+            batch_size: Number of frames leased at once.
+            think_time: Mean seconds spent annotating a frame, exponentially
+                distributed.
+            level: Pyramid level of the images requested.
+        """
+        self.index = index
+        self.session = "loadtest-{}-{}".format(index, random.getrandbits(32))
+        self.exhausted = False
+        self._client = client
+        self._url = url.rstrip("/")
+        self._stats = stats
+        self._batch_size = batch_size
+        self._think_time = think_time
+        self._level = level
+        self._queue = deque()
+        self._fetching = None
+
+    @coroutine
+    def _request(self, endpoint, path, **kwargs):
+        """Requests the backend and records the latency.
+
+        Args:
+            endpoint: Endpoint to record the latency under.
+            path: Path to request.
+            **kwargs: HTTPRequest arguments.
+
+        Returns:
+            HTTPResponse.
+        """
+        start = time.time()
+        response = yield self._client.fetch(
+            HTTPRequest(self._url + path, **kwargs), raise_error=False
+        )
+        self._stats.latencies[endpoint].append(time.time() - start)
+        if response.code != 200 and not (
+                endpoint == "next" and response.code == 404):
+            self._stats.errors[endpoint] += 1
+        raise Return(response)
+
+    @coroutine
+    def _fetch(self):
+        """Leases a batch of frames and prefetches their images."""
+        response = yield self._request("next", "/next?count={}&session={}"
+                                       .format(self._batch_size, self.session))
+        if response.code == 404:
+            self.exhausted = True
+            return
+        if response.code != 200:
+            return
+
+        for frame in json.loads(response.body)["frames"]:
+            self._stats.leases.setdefault(frame["id"], set()).add(self.index)
+            path = "/image/{}".format(frame["id"])
+            if self._level:
+                path += "?level={}".format(self._level)
+            self._queue.append((frame, self._request("image", path)))
+
+    def _prefetch(self):
+        """Leases the next batch in the background unless already leasing."""
+        if self._fetching is None or self._fetching.done():
+            self._fetching = self._fetch()
+
+    @coroutine
+    def run(self, deadline):
+        """Annotates frames until the deadline or until none are left.
+
+        Args:
+            deadline: Time to stop at.
+        """
+        while time.time() < deadline:
+            if not self._queue:
+                self._prefetch()
+                yield self._fetching
+                if not self._queue:
+                    if self.exhausted:
+                        break
+                    # The failure was already counted by _request().
+                    yield sleep(RETRY_DELAY)
+                    continue
+
+            frame, image = self._queue.popleft()
+            yield self._request(
+                "renew", "/next/renew?session={}".format(self.session),
+                method="POST", body=""
+            )
+            if len(self._queue) <= 1:
+                self._prefetch()
+
+            yield image
+            if self._think_time:
+                yield sleep(random.expovariate(1.0 / self._think_time))
+
+            body = json.dumps({
+                "interesting": True,
+                "tags": ["buoy"],
+                "annotations": [{
+                    "x": random.random(), "y": random.random(),
+                    "width": 0.1, "height": 0.1,
+                    "label": "buoy", "type": "rectangle"
+                }]
+            })
+            response = yield self._request(
+                "annotate", "/annotate/{}".format(frame["id"]),
+                method="POST", body=body,
+                headers={"Content-Type": "application/json"}
+            )
+            if response.code == 200:
+                annotations = self._stats.annotations
+                annotations[frame["id"]] = annotations.get(frame["id"], 0) + 1
+
+        if self._fetching is not None:
+            yield self._fetching
+        yield self._request(
+            "release", "/next/release?session={}".format(self.session),
+            method="POST", body=""
+        )
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmarks of the ingest, decode and serialization hot paths.
+
+Each benchmark prepares what it needs from a synthetic image message and a
+codec, and returns a step function to time. Steps return the number of
+bytes they produce for one frame, or a Future of it, or None if that isn't
+meaningful.
+"""
+
+from models import Frame
+from helpers import Encoder
+from models.frame import encode_message
+from tornado.gen import coroutine, Return
+from memory import sample_feed, sample_frame
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+
+def _frame(msg, codec):
+    """Returns an annotated frame of a message encoded with a codec."""
+    name, img, encoding, shape = encode_message(msg, codec)
+    return sample_frame(
+        sample_feed(), msg.header.seq, encoding, img, shape, name
+    )
+
+
+def encode(msg, codec):
+    """Times encoding a message in this process, as ingest workers do."""
+    def step():
+        return len(encode_message(msg, codec)[1])
+    return step
+
+
+def from_ros_image(msg, codec):
+    """Times Frame.from_ros_image(), which encodes in the worker process
+    pool and saves the frame.
+    """
+    feed = sample_feed()
+    feed.codec = codec.name
+
+    @coroutine
+    def step():
+        frame = yield Frame.from_ros_image(feed, msg.header.seq, msg)
+        raise Return(len(frame.image_buffer()))
+    return step
+
+
+def parse_image(msg, codec):
+    """Times Frame.parse_image(), which decodes a stored frame."""
+    frame = _frame(msg, codec)
+
+    def step():
+        return frame.parse_image().nbytes
+    return step
+
+
+def to_jpeg(msg, codec):
+    """Times Frame.to_jpeg() of a stored frame at full size."""
+    frame = _frame(msg, codec)
+
+    @coroutine
+    def step():
+        jpeg = yield frame.to_jpeg()
+        raise Return(len(jpeg))
+    return step
+
+
+def dump(msg, codec):
+    """Times Frame.dump() of an annotated frame."""
+    frame = _frame(msg, codec)
+
+    def step():
+        frame.dump()
+    return step
+
+
+def encoder(msg, codec):
+    """Times helpers.Encoder on a dumped annotated frame."""
+    dumped = _frame(msg, codec).dump()
+
+    def step():
+        return len(Encoder().encode(dumped))
+    return step
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+"""In-memory stand-in for the database."""
+
+from datetime import datetime
+from bson import Binary, ObjectId
+from contextlib import contextmanager
+from tornado.gen import coroutine, Return
+from models import Annotation, Bag, Feed, Frame, Tag, User
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+
+@contextmanager
+def in_memory(*documents):
+    """Saves documents to memory instead of the database.
+
+    Documents are still serialized as they would be for the database, so
+    that the cost of serialization is measured, but nothing is sent.
+
+    Args:
+        *documents: Document classes to save to memory.
+
+    Yields:
+        Dictionary of serialized documents by ObjectId.
+    """
+    saved = {}
+
+    @coroutine
+    def save(self, alias=None):
+        if self._id is None:
+            self._id = ObjectId()
+        son = self.to_son()
+        son["_id"] = self._id
+        saved[self._id] = son
+        raise Return(self)
+
+    for document in documents:
+        document.save = save
+    try:
+        yield saved
+    finally:
+        for document in documents:
+            del document.save
+
+
+def sample_feed(topic="/camera/image_raw"):
+    """Returns a feed of a bag as they would be once loaded.
+
+    Args:
+        topic: ROS topic name.
+
+    Returns:
+        Feed with its references resolved.
+    """
+    bag = Bag(
+        _id=ObjectId(),
+        name="benchmark",
+        robot="benchmark",
+        location="benchmark",
+        conditions=["sunny", "indoors"],
+        recorded=datetime(2016, 1, 1),
+    )
+    tags = [Tag(_id=ObjectId(), name=name) for name in ("buoy", "gate")]
+    return Feed(_id=ObjectId(), bag=bag, topic=topic, available_tags=tags)
+
+
+def sample_annotations(count=3):
+    """Returns annotations as they would be once loaded.
+
+    Args:
+        count: Number of annotations.
+
+    Returns:
+        List of Annotations with their references resolved.
+    """
+    author = User(_id=ObjectId(), name="benchmark", points=count)
+    return [
+        Annotation(
+            _id=ObjectId(),
+            author=author,
+            timestamp=datetime(2016, 1, 1),
+            data={"tag": "buoy", "x": i, "y": i, "width": 20, "height": 20}
+        )
+        for i in range(count)
+    ]
+
+
+def sample_frame(feed, seq, encoding, img, shape, codec):
+    """Returns an annotated frame as it would be once loaded.
+
+    Args:
+        feed: Feed of the frame.
+        seq: Frame sequence in feed.
+        encoding: Original ROS image encoding.
+        img: Encoded image.
+        shape: Image shape.
+        codec: ID of the codec the image was encoded with.
+
+    Returns:
+        Frame with its references resolved.
+    """
+    # Loaded frames carry their image, as with the default image store.
+    frame = Frame(
+        _id=ObjectId(),
+        feed=feed,
+        seq=seq,
+        stamp=seq,
+        width=shape[1],
+        height=shape[0],
+        channels=shape[2] if len(shape) > 2 else 1,
+        encoding=encoding,
+        codec=codec,
+        data=Binary(img)
+    )
+    frame.tags = list(feed.available_tags)
+    frame.annotations = sample_annotations()
+    frame.annotated = True
+    frame.accessed = datetime(2016, 1, 1)
+    return frame
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+
+"""Synthetic image payloads."""
+
+import numpy as np
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+# NumPy type, number of channels and maximum value of the ROS image
+# encodings payloads can be generated for.
+ENCODINGS = {
+    "mono8": (np.uint8, 1, 255),
+    "bgr8": (np.uint8, 3, 255),
+    "16UC1": (np.uint16, 1, 5000),
+}
+
+
+class SyntheticHeader(object):
+
+    """std_msgs/Header of a SyntheticImage.
+
+    Attributes:
+        seq: Sequence number.
+        stamp: Time the image was taken in seconds.
+        frame_id: Frame the image was taken in.
+    """
+
+    def __init__(self, seq, stamp, frame_id="camera"):
+        """Constructs a SyntheticHeader."""
+        self.seq = seq
+        self.stamp = stamp
+        self.frame_id = frame_id
+
+
+class SyntheticImage(object):
+
+    """Stand-in for a ROS sensor_msgs/Image with the same attributes.
+
+    Unlike a real message, this can be made and pickled without ROS.
+
+    Attributes:
+        header: SyntheticHeader.
+        height: Image height in pixels.
+        width: Image width in pixels.
+        encoding: ROS image encoding.
+        is_bigendian: Whether the pixels are big endian.
+        step: Length of a row in bytes.
+        data: Pixel byte string.
+    """
+
+    def __init__(self, seq, width, height, encoding, data):
+        """Constructs a SyntheticImage."""
+        self.header = SyntheticHeader(seq, float(seq))
+        self.height = height
+        self.width = width
+        self.encoding = encoding
+        self.is_bigendian = 0
+        self.step = len(data) // height
+        self.data = data
+
+
+def synthetic_image(width, height, encoding, seq=0):
+    """Generates an image that compresses like a camera or depth image.
+
+    Images are smooth gradients that move with seq, with a little noise, so
+    they are neither trivially compressible nor pure noise. The same
+    arguments always generate the same image.
+
+    Args:
+        width: Image width in pixels.
+        height: Image height in pixels.
+        encoding: One of ENCODINGS.
+        seq: Sequence number of the image.
+
+    Returns:
+        SyntheticImage.
+
+    Raises:
+        ValueError: If the encoding is not one of ENCODINGS.
+    """
+    if encoding not in ENCODINGS:
+        raise ValueError("Unknown encoding: {}".format(encoding))
+    dtype, channels, maximum = ENCODINGS[encoding]
+
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    gradient = (x + y + seq * 4) % (width + height) / (width + height)
+    noise = np.random.RandomState(seq).normal(0, 0.01, (height, width))
+    img = np.clip(gradient + noise, 0, 1) * maximum
+    if channels > 1:
+        img = np.dstack([np.roll(img, c * 8, axis=1) for c in range(channels)])
+
+    data = img.astype(dtype).tostring()
+    return SyntheticImage(seq, width, height, encoding, data)
+
+
+def parse_resolution(resolution):
+    """Parses a resolution.
+
+    Args:
+        resolution: Resolution as "<width>x<height>", e.g. "640x480".
+
+    Returns:
+        Tuple of (width, height).
+
+    Raises:
+        ValueError: If the resolution is invalid.
+    """
+    width, height = resolution.lower().split("x")
+    return int(width), int(height)
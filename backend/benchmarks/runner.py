@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmark runner."""
+
+import sys
+import json
+import time
+import resource
+import subprocess
+from models import Frame
+from codec import get_codec
+from memory import in_memory
+from tornado.concurrent import is_future
+from tornado.gen import coroutine, Return
+from payloads import ENCODINGS, parse_resolution, synthetic_image
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+# Number of distinct images cycled through, so that no step sees the same
+# image twice in a row without holding every image in memory.
+IMAGES = 4
+
+
+class Case(object):
+
+    """Benchmark of one hot path on one kind of image.
+
+    Attributes:
+        name: Benchmark name.
+        encoding: ROS image encoding.
+        width: Image width in pixels.
+        height: Image height in pixels.
+    """
+
+    def __init__(self, name, encoding, width, height):
+        """Constructs a Case."""
+        self.name = name
+        self.encoding = encoding
+        self.width = width
+        self.height = height
+
+    def __str__(self):
+        """Returns the case as "<name>:<encoding>:<width>x<height>"."""
+        return "{}:{}:{}x{}".format(
+            self.name, self.encoding, self.width, self.height
+        )
+
+    @classmethod
+    def parse(cls, case):
+        """Parses a case.
+
+        Args:
+            case: Case as returned by str().
+
+        Returns:
+            Case.
+
+        Raises:
+            ValueError: If the case is invalid.
+        """
+        name, encoding, resolution = case.split(":")
+        if encoding not in ENCODINGS:
+            raise ValueError("Unknown encoding: {}".format(encoding))
+        width, height = parse_resolution(resolution)
+        return Case(name, encoding, width, height)
+
+
+def peak_memory():
+    """Returns the peak resident memory of this process in bytes."""
+    # Linux reports kilobytes.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@coroutine
+def run_case(case, prepare, frames):
+    """Times a benchmark in this process.
+
+    The benchmark is run once before it's timed, so that one-off costs like
+    starting the worker process pool aren't measured. Memory used by worker
+    processes isn't measured.
+
+    Args:
+        case: Case.
+        prepare: Benchmark function.
+        frames: Number of frames to time.
+
+    Returns:
+        Dictionary of results.
+    """
+    codec = get_codec()
+    steps = [
+        prepare(synthetic_image(case.width, case.height, case.encoding, i),
+                codec)
+        for i in range(IMAGES)
+    ]
+
+    with in_memory(Frame):
+        size = steps[0]()
+        if is_future(size):
+            yield size
+        baseline = peak_memory()
+
+        total = 0
+        start = time.time()
+        for i in range(frames):
+            size = steps[i % IMAGES]()
+            if is_future(size):
+                size = yield size
+            total += size or 0
+        seconds = time.time() - start
+
+    raise Return({
+        "name": case.name,
+        "encoding": case.encoding,
+        "width": case.width,
+        "height": case.height,
+        "codec": codec.name,
+        "frames": frames,
+        "seconds": seconds,
+        "frames_per_second": frames / seconds if seconds else None,
+        "bytes_per_frame": float(total) / frames if total else None,
+        "peak_memory": peak_memory(),
+        "memory_growth": peak_memory() - baseline
+    })
+
+
+def measure(script, case, argv):
+    """Runs a case in a new process, so its peak memory is its own.
+
+    Args:
+        script: Path of the benchmark script, which runs the case given by
+            --benchmark_case and prints its results as JSON.
+        case: Case.
+        argv: Command-line options to pass on.
+
+    Returns:
+        Dictionary of results.
+
+    Raises:
+        CalledProcessError: If the case failed.
+    """
+    output = subprocess.check_output(
+        [sys.executable, script] + argv +
+        ["--benchmark_case={}".format(case)]
+    )
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def compare(results, baseline, tolerance):
+    """Compares results with those of a previous run.
+
+    Cases are only compared with cases of the same codec. A case regressed
+    if its throughput dropped, or if it produced more bytes per frame or
+    used more peak memory, by more than the tolerance.
+
+    Args:
+        results: List of results.
+        baseline: List of results of a previous run.
+        tolerance: Relative change tolerated, e.g. 0.1 for 10%.
+
+    Returns:
+        List of (result, baseline result or None, regressed) tuples.
+    """
+    def key(result):
+        return (
+            result["name"], result["encoding"],
+            result["width"], result["height"], result.get("codec")
+        )
+
+    previous = dict((key(result), result) for result in baseline)
+    comparison = []
+    for result in results:
+        base = previous.get(key(result))
+        regressed = False
+        if base:
+            fps = result["frames_per_second"]
+            base_fps = base["frames_per_second"]
+            if fps and base_fps and fps < base_fps * (1 - tolerance):
+                regressed = True
+
+            size = result["bytes_per_frame"]
+            base_size = base["bytes_per_frame"]
+            if size and base_size and size > base_size * (1 + tolerance):
+                regressed = True
+
+            memory = result["peak_memory"]
+            base_memory = base.get("peak_memory")
+            if base_memory and memory > base_memory * (1 + tolerance):
+                regressed = True
+        comparison.append((result, base, regressed))
+    return comparison
+
+
+def report(comparison):
+    """Formats compared results as a table.
+
+    Args:
+        comparison: List of tuples as returned by compare().
+
+    Returns:
+        Table string.
+    """
+    def change(value, base):
+        if not value or not base:
+            return ""
+        return "{:+.0%}".format(float(value) / base - 1)
+
+    rows = [(
+        "case", "frames/s", "change", "bytes/frame", "change", "peak MB",
+        "change", ""
+    )]
+    for result, base, regressed in comparison:
+        base = base or {}
+        fps = result["frames_per_second"]
+        size = result["bytes_per_frame"]
+        memory = result["peak_memory"]
+        rows.append((
+            "{name}:{encoding}:{width}x{height}".format(**result),
+            "{:.1f}".format(fps) if fps else "-",
+            change(fps, base.get("frames_per_second")),
+            "{:.0f}".format(size) if size else "-",
+            change(size, base.get("bytes_per_frame")),
+            "{:.1f}".format(memory / 1024.0 / 1024.0),
+            change(memory, base.get("peak_memory")),
+            "REGRESSED" if regressed else ""
+        ))
+
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    return "\n".join(
+        "  ".join(cell.ljust(width) for cell, width in zip(row, widths))
+        .rstrip()
+        for row in rows
+    )
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+"""Synthetic database seeding."""
+
+from codec import get_codec
+from datetime import datetime
+from tornado.options import options
+from payloads import synthetic_image
+from ingest.writer import FrameWriter
+from models.frame import encode_message
+from tornado.gen import coroutine, Return
+from models import Annotation, Bag, Feed, Frame, IngestJob, ensure_indexes
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+# Number of distinct images encoded, which are then reused for every frame
+# so seeding doesn't take longer than the test itself.
+IMAGES = 8
+
+
+@coroutine
+def reset():
+    """Deletes every bag, frame and annotation from the database.
+
+    Tags and users are kept, since a running backend caches them.
+    """
+    for model in (Annotation, Bag, Feed, Frame, IngestJob):
+        yield model.objects.coll().remove({})
+    Bag.touch()
+
+
+@coroutine
+def seed(bags, feeds, frames, width, height, encoding):
+    """Writes synthetic bags of unannotated frames to the database.
+
+    Args:
+        bags: Number of bags.
+        feeds: Number of feeds per bag.
+        frames: Number of frames per feed.
+        width: Image width in pixels.
+        height: Image height in pixels.
+        encoding: ROS image encoding of the images.
+
+    Returns:
+        Number of frames written.
+    """
+    yield ensure_indexes()
+
+    codec = get_codec()
+    images = [
+        encode_message(synthetic_image(width, height, encoding, i), codec)
+        for i in range(IMAGES)
+    ]
+
+    writer = FrameWriter(options.batch_size, options.batch_bytes)
+    for i in range(bags):
+        bag = yield Bag.from_ros_bag(
+            "loadtest-{}".format(i), "loadtest", "loadtest", [],
+            datetime.utcnow()
+        )
+        for j in range(feeds):
+            feed = yield Feed.from_topic(bag, "/camera_{}/image".format(j))
+            for seq in range(frames):
+                name, img, encoding, shape = images[seq % IMAGES]
+                frame = yield Frame.from_encoded(
+                    feed, seq, encoding, img, shape, float(seq), name
+                )
+                yield writer.add(frame)
+    yield writer.flush()
+    raise Return(writer.written)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+"""Lens Backend Frame Codecs."""
+
+from helpers import histogram
+from tornado.options import options
+from raw import Lz4Codec, RawCodec, ZlibCodec
+from image import ImageCodec, JpegCodec, PngCodec, WebpCodec
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+__all__ = [
+    "DECODE_SECONDS", "ENCODE_SECONDS", "ImageCodec", "JpegCodec",
+    "Lz4Codec", "PngCodec", "RawCodec", "WebpCodec", "ZlibCodec",
+    "codec_for", "encode_image", "get_codec", "topic_codec"
+]
+
+ENCODE_SECONDS = histogram(
+    "lens_image_encode_seconds",
+    "Seconds taken to encode an image, by codec.",
+    ["codec"]
+)
+DECODE_SECONDS = histogram(
+    "lens_image_decode_seconds",
+    "Seconds taken to decode a stored image, by codec.",
+    ["codec"]
+)
+
+_codecs = {}
+
+
+def get_codec(name=None, decoding=False):
+    """Returns a frame codec.
+
+    Image codecs fall back to zlib at the level set by --zlib_level for
+    images they don't support.
+
+    Args:
+        name: Codec ID, defaults to the one set by --codec.
+        decoding: Whether the codec is only used to decode stored images, in
+            which case codecs of images stored as recorded, like JPEGs, are
+            also returned.
+
+    Returns:
+        Codec.
+
+    Raises:
+        ValueError: If the codec ID is unknown, the codec is unavailable or
+            it can't be used to encode frames.
+    """
+    name = name or options.codec
+    if name == JpegCodec.name and not decoding:
+        raise ValueError("Frames can't be encoded as JPEGs")
+    if name not in _codecs:
+        fallback = ZlibCodec(options.zlib_level)
+        if name == PngCodec.name:
+            _codecs[name] = PngCodec(options.png_level, fallback)
+        elif name == WebpCodec.name:
+            _codecs[name] = WebpCodec(fallback)
+        elif name == JpegCodec.name:
+            _codecs[name] = JpegCodec()
+        elif name == ZlibCodec.name:
+            _codecs[name] = fallback
+        elif name == Lz4Codec.name:
+            _codecs[name] = Lz4Codec()
+        else:
+            raise ValueError("Unknown codec: {}".format(name))
+    return _codecs[name]
+
+
+def codec_for(frame):
+    """Returns the codec a frame's image was encoded with.
+
+    Args:
+        frame: Frame.
+
+    Returns:
+        Codec.
+    """
+    return get_codec(frame.codec or PngCodec.name, decoding=True)
+
+
+def topic_codec(topic):
+    """Returns the ID of the codec to encode a topic's frames with.
+
+    Args:
+        topic: ROS topic name.
+
+    Returns:
+        Codec ID set for the topic by --topic_codecs, or by --codec.
+    """
+    for override in options.topic_codecs.split(","):
+        name, _, codec = override.partition("=")
+        if name.strip() == topic and codec.strip():
+            return codec.strip()
+    return options.codec
+
+
+def encode_image(codec, img):
+    """Encodes an image, falling back to the codec's fallback if it doesn't
+    support the image's pixel type or channels, so no image is ever converted.
+
+    This does not depend on the command-line options, so it can be run in a
+    worker process.
+
+    Args:
+        codec: Codec to encode with.
+        img: OpenCV image.
+
+    Returns:
+        Tuple of (codec ID, encoded byte string).
+    """
+    if not codec.accepts(img):
+        codec = codec.fallback
+    return codec.name, codec.encode(img)
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+"""Image file format codecs."""
+
+import cv2
+import numpy as np
+from raw import ZlibCodec
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+
+class ImageCodec(object):
+
+    """Base codec of an image file format OpenCV reads and writes.
+
+    Attributes:
+        name: Codec ID recorded on frames.
+        extension: File extension OpenCV picks the format by.
+        params: OpenCV encoding parameters.
+        fallback: Codec to encode images with instead if their pixel type
+            or number of channels is not supported by the format.
+    """
+
+    name = None
+    extension = None
+
+    def __init__(self, params=(), fallback=None):
+        """Constructs an ImageCodec.
+
+        Args:
+            params: OpenCV encoding parameters.
+            fallback: Codec to encode images whose pixel type or number of
+                channels is not supported with, defaults to zlib at its
+                default level.
+        """
+        self.params = list(params)
+        self.fallback = fallback or ZlibCodec()
+
+    def accepts(self, img):
+        """Returns whether an image's pixel type and number of channels are
+        supported by the format.
+
+        Args:
+            img: OpenCV image.
+
+        Returns:
+            Whether the image can be encoded without converting its pixels.
+        """
+        # Image formats only hold grayscale, BGR or BGRA pixels.
+        if img.ndim != 2 and img.shape[2] not in (1, 3, 4):
+            return False
+        return img.dtype in (np.uint8, np.uint16)
+
+    def encode(self, img):
+        """Encodes an image.
+
+        Args:
+            img: OpenCV image.
+
+        Returns:
+            Encoded byte string.
+        """
+        return cv2.imencode(self.extension, img, self.params)[1].tostring()
+
+    def decode(self, data):
+        """Decodes an image for display.
+
+        Args:
+            data: Encoded byte string or buffer.
+
+        Returns:
+            8-bit BGR OpenCV image.
+        """
+        nparr = np.frombuffer(data, np.uint8)
+        return cv2.imdecode(nparr, cv2.CV_LOAD_IMAGE_COLOR)
+
+
+class PngCodec(ImageCodec):
+
+    """PNG codec.
+
+    Higher compression levels are much slower to encode for only slightly
+    smaller images, while decoding is just as fast at any level.
+    """
+
+    name = "png"
+    extension = ".png"
+
+    def __init__(self, level=3, fallback=None):
+        """Constructs a PngCodec.
+
+        Args:
+            level: Compression level, from 0 to 9.
+            fallback: Codec to encode images whose pixel type is not
+                supported with.
+        """
+        super(PngCodec, self).__init__(
+            [cv2.IMWRITE_PNG_COMPRESSION, level], fallback
+        )
+        self.level = level
+
+
+class WebpCodec(ImageCodec):
+
+    """Lossless WebP codec.
+
+    WebP images are usually smaller than PNGs, but only 8-bit images are
+    supported.
+    """
+
+    name = "webp"
+    extension = ".webp"
+
+    # OpenCV encodes WebPs losslessly above the highest quality.
+    LOSSLESS = 101
+
+    def __init__(self, fallback=None):
+        """Constructs a WebpCodec.
+
+        Args:
+            fallback: Codec to encode images that aren't 8-bit with.
+        """
+        super(WebpCodec, self).__init__(
+            [cv2.IMWRITE_WEBP_QUALITY, self.LOSSLESS], fallback
+        )
+
+    def accepts(self, img):
+        """Returns whether an image is 8-bit with supported channels."""
+        return super(WebpCodec, self).accepts(img) and img.dtype == np.uint8
+
+
+class JpegCodec(ImageCodec):
+
+    """JPEG codec.
+
+    JPEGs are lossy, so this is only used to decode images that were
+    recorded as JPEGs, never to encode frames.
+    """
+
+    name = "jpeg"
+    extension = ".jpg"
+
+    def accepts(self, img):
+        """Returns whether an image is 8-bit with supported channels."""
+        return super(JpegCodec, self).accepts(img) and img.dtype == np.uint8
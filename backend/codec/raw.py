@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+"""Raw pixel codecs."""
+
+import cv2
+import zlib
+import struct
+import numpy as np
+
+try:
+    import lz4.block as lz4
+except ImportError:
+    lz4 = None
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+# Height, width, channels and NumPy type character of the pixels.
+_HEADER = struct.Struct("<IIBc")
+
+
+class RawCodec(object):
+
+    """Base codec of raw pixels compressed by a general-purpose compressor.
+
+    Pixels are kept exactly as they were recorded, whatever their type, in
+    little endian after a small header describing their shape. This is much
+    faster to encode than any image format, at the cost of larger images.
+
+    Attributes:
+        name: Codec ID recorded on frames.
+    """
+
+    name = None
+
+    def compress(self, data):
+        """Compresses pixels.
+
+        Args:
+            data: Byte string.
+
+        Returns:
+            Compressed byte string.
+        """
+        raise NotImplementedError
+
+    def decompress(self, data):
+        """Decompresses pixels.
+
+        Args:
+            data: Compressed byte string or buffer.
+
+        Returns:
+            Byte string.
+        """
+        raise NotImplementedError
+
+    def accepts(self, img):
+        """Returns True, since any pixel type is supported."""
+        return True
+
+    def encode(self, img):
+        """Encodes an image.
+
+        Args:
+            img: OpenCV image.
+
+        Returns:
+            Encoded byte string.
+        """
+        height, width = img.shape[:2]
+        channels = img.shape[2] if img.ndim > 2 else 1
+        dtype = img.dtype.newbyteorder("<")
+        header = _HEADER.pack(height, width, channels, dtype.char)
+        return header + self.compress(img.astype(dtype, copy=False).tobytes())
+
+    def decode(self, data):
+        """Decodes an image for display.
+
+        Like OpenCV does when decoding other formats, 16-bit pixels are
+        reduced to their most significant byte and other types are saturated
+        to 8 bits.
+
+        Args:
+            data: Encoded byte string or buffer.
+
+        Returns:
+            8-bit BGR OpenCV image.
+        """
+        height, width, channels, char = _HEADER.unpack_from(data)
+        dtype = np.dtype(char).newbyteorder("<")
+        pixels = self.decompress(buffer(data, _HEADER.size))
+        img = np.frombuffer(pixels, dtype).reshape(height, width, channels)
+
+        if img.dtype.itemsize == 2 and img.dtype.kind == "u":
+            img = (img >> 8).astype(np.uint8)
+        elif img.dtype != np.uint8:
+            img = np.clip(img, 0, 255).astype(np.uint8)
+
+        if channels < 3:
+            gray = np.ascontiguousarray(img[:, :, 0])
+            return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+        if channels == 4:
+            return cv2.cvtColor(img, cv2.COLOR_BGRA2BGR)
+        return np.ascontiguousarray(img[:, :, :3])
+
+
+class ZlibCodec(RawCodec):
+
+    """Raw pixels compressed with zlib."""
+
+    name = "zlib"
+
+    def __init__(self, level=1):
+        """Constructs a ZlibCodec.
+
+        Args:
+            level: Compression level, from 1 to 9.
+        """
+        self.level = level
+
+    def compress(self, data):
+        """Compresses pixels with zlib."""
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data):
+        """Decompresses pixels with zlib."""
+        return zlib.decompress(data)
+
+
+class Lz4Codec(RawCodec):
+
+    """Raw pixels compressed with LZ4, which requires the lz4 package."""
+
+    name = "lz4"
+
+    def __init__(self):
+        """Constructs an Lz4Codec.
+
+        Raises:
+            ValueError: If the lz4 package is not installed.
+        """
+        if lz4 is None:
+            raise ValueError("The lz4 codec requires the lz4 package")
+
+    def compress(self, data):
+        """Compresses pixels with LZ4."""
+        return lz4.compress(data)
+
+    def decompress(self, data):
+        """Decompresses pixels with LZ4."""
+        return lz4.decompress(bytes(data))
@@ -6,8 +6,11 @@ from image import ImageHandler
 from lensui import LensUIHandler
 from metadata import MetadataHandler
 from search import SearchByTagHandler
-from nextframe import NextFrameHandler
-from bag import BagHandler, BagsHandler
+from bag import BagHandler, BagProgressHandler, BagsHandler
+from nextframe import NextFrameHandler, ReleaseHandler, RenewHandler
+from admin import CacheStatsHandler, IndexesHandler, ProfilesHandler
+from metrics import MetricsHandler, RequestDelegate, observe_request
+from jobs import IngestCancelHandler, IngestJobHandler, IngestJobsHandler
 
 __author__ = "Anass Al-Wohoush"
 __version__ = "0.3.0"
@@ -17,12 +20,22 @@ def get_handlers():
     handlers = [
         (r"/?", LensUIHandler),
         (r"/next/?", NextFrameHandler),
+        (r"/next/renew/?", RenewHandler),
+        (r"/next/release/?", ReleaseHandler),
         (r"/image/(.+)/?", ImageHandler),
         (r"/annotate/(.+)?", MetadataHandler),
         (r"/bags/?", BagsHandler),
+        (r"/bags/(.+)/progress/?", BagProgressHandler),
         (r"/bag/?", BagHandler),
         (r"/success/?", BagHandler),
-        (r"/search/?", SearchByTagHandler)
+        (r"/search/?", SearchByTagHandler),
+        (r"/ingest/?", IngestJobsHandler),
+        (r"/ingest/([^/]+)/?", IngestJobHandler),
+        (r"/ingest/([^/]+)/cancel/?", IngestCancelHandler),
+        (r"/admin/cache/?", CacheStatsHandler),
+        (r"/admin/indexes/?", IndexesHandler),
+        (r"/admin/profiles/?", ProfilesHandler),
+        (r"/metrics/?", MetricsHandler)
     ]
 
     return handlers
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+
+"""Administration handlers."""
+
+from tornado.gen import coroutine
+from models import describe_indexes
+from tornado.options import options
+from tornado.web import HTTPError, RequestHandler
+from helpers import Encoder, get_profile_log, get_render_cache, intern_caches
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+
+class CacheStatsHandler(RequestHandler):
+
+    """Cache statistics request handler."""
+
+    def get(self):
+        """Returns cache statistics.
+
+        Returns:
+            application/json.
+
+            For example:
+                {
+                    'render': {
+                        'hits': renders served from memory,
+                        'disk_hits': renders served from disk,
+                        'misses': renders not cached,
+                        'evictions': renders evicted from memory,
+                        'hit_ratio': ratio of cached lookups,
+                        ...
+                    },
+                    'tags': {
+                        'hits': lookups served from memory,
+                        'misses': lookups resolved from the database,
+                        'evictions': entries evicted to make room,
+                        ...
+                    },
+                    ...
+                }
+        """
+        stats = {
+            "render": get_render_cache().stats()
+        }
+        for name, cache in intern_caches().items():
+            stats[name] = cache.stats()
+
+        self.set_header("Content-Type", "application/json")
+        self.write(Encoder().encode(stats))
+
+
+class ProfilesHandler(RequestHandler):
+
+    """Profiled request list request handler."""
+
+    # Default number of requests listed.
+    DEFAULT_LIMIT = 20
+
+    def get(self):
+        """Lists the slowest of the most recent profiled requests.
+
+        Requests are only profiled with --profile, and then either when they
+        have the X-Profile header or at random with --profile_rate. Only the
+        last --profile_history profiled requests are kept.
+
+        Parameters:
+            limit: Maximum number of requests. Defaults to 20.
+
+        Returns:
+            application/json.
+
+            For example:
+                {
+                    'enabled': whether requests can be profiled,
+                    'requests': [{
+                        'id': request ID, from its X-Request-Id header if
+                            given,
+                        'handler': name of the request handler,
+                        'method': HTTP method,
+                        'uri': requested URI,
+                        'status': response status code,
+                        'finished': datetime finished in ISO 8601,
+                        'seconds': seconds taken to handle the request,
+                        'queries': number of database queries made,
+                        'query_seconds': seconds spent waiting on database
+                            queries,
+                        'profile': path of the profile, readable with
+                            pstats, or null if it could not be saved
+                    }, ...]
+                }
+        """
+        try:
+            limit = int(self.get_argument("limit", self.DEFAULT_LIMIT))
+        except ValueError:
+            raise HTTPError(400, "Invalid limit")
+
+        self.set_header("Content-Type", "application/json")
+        self.write(Encoder().encode({
+            "enabled": options.profile,
+            "requests": get_profile_log().slowest(max(1, limit))
+        }))
+
+
+class IndexesHandler(RequestHandler):
+
+    """Database index request handler."""
+
+    @coroutine
+    def get(self):
+        """Returns the declared and existing indexes of every collection.
+
+        Returns:
+            application/json.
+
+            For example:
+                {
+                    'frames': {
+                        'declared': [{
+                            'collection': collection name,
+                            'keys': list of [field, direction],
+                            'options': index options,
+                            'name': index name if created,
+                            'error': error message if not created
+                        }],
+                        'existing': index information from MongoDB
+                    },
+                    ...
+                }
+        """
+        indexes = yield describe_indexes()
+
+        self.set_header("Content-Type", "application/json")
+        self.write(Encoder().encode(indexes))
@@ -2,17 +2,17 @@
 
 """ROS bag handler."""
 
-import os
 import uuid
-import rosbag
-import logging
 import json
 import dateutil.parser
 from helpers import Encoder
-from tornado.gen import coroutine
-from models import Bag, Feed, Frame, Tag
-from tornado.web import RequestHandler
+from ingest import get_queue
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
 from urlparse import urlparse, parse_qs
+from tornado.gen import coroutine, Return
+from models import Bag, Feed, IngestJob, Tag
+from tornado.web import HTTPError, RequestHandler
 
 __author__ = "Anass Al-Wohoush"
 __version__ = "0.1.0"
@@ -39,6 +39,7 @@ class BagHandler(RequestHandler):
             location: Location taken.
             conditions: List of conditions.
             recorded: Datetime recorded as ISO 8601.
+            priority: Optional ingestion priority, higher is sooner.
 
         Returns:
             application/json of the video properties.
@@ -66,6 +67,10 @@ class BagHandler(RequestHandler):
         location = form_data['location'][0]
         conditions = form_data['conditions'][0].split(",")
         recorded = dateutil.parser.parse(form_data['recorded'][0])
+        try:
+            priority = int(form_data.get('priority', ['0'])[0])
+        except ValueError:
+            raise HTTPError(400, "Invalid priority")
 
         # Write bag properties to database.
         self.bag = yield Bag.from_ros_bag(
@@ -76,49 +81,13 @@ class BagHandler(RequestHandler):
             recorded=recorded
         )
 
+        # Queue frames to be written to the database in the background.
+        yield get_queue().enqueue(self.bag, self.path, priority)
+
         # Respond.
         self.set_header("Content-Type", "application/json")
         self.finish(Encoder().encode(self.bag.dump()))
 
-        # Write frames to database in the background.
-        yield self.write_frames()
-
-    @coroutine
-    def write_frames(self):
-        """Writes image frames to the database in the backgroumd."""
-
-        # Open ROS bag.
-        bag = rosbag.Bag(self.path)
-
-        # Filter to only get image feeds.
-        def images_pls(topic, datatype, md5sum, msg_def, header):
-            return datatype == "sensor_msgs/Image"
-
-        # Iterate through all ROS Images and write them to the database.
-        feeds = {}
-        count = 0
-        for topic, msg, t in bag.read_messages(connection_filter=images_pls):
-            count += 1
-            if not (count % 10 == 0):
-                continue
-
-            if topic in feeds:
-                feed = feeds[topic]
-            else:
-                feed = yield Feed.from_topic(self.bag, topic)
-                feeds[topic] = feed
-            logging.warn("Making frames for topic:")
-            logging.warn(topic)
-            yield Frame.from_ros_image(
-                feed=feed,
-                seq=msg.header.seq,
-                msg=msg
-            )
-
-        # Delete temporary file.
-        logging.warn("Deleting %s", self.path)
-        os.remove(self.path)
-
 
 class BagsHandler(RequestHandler):
 
@@ -127,15 +96,11 @@ class BagsHandler(RequestHandler):
     @coroutine
     def get(self):
         # Get all bag and feed data to display on web page
-        bags = yield Bag.get_bags()
-        if not bags:
+        d = yield Feed.listing()
+        if not d:
             self.set_status(404)
             self.write_error(404)
             return
-        d = []  # each element is a tuple containing a bag and its feeds
-        for bag in bags:
-            feeds = yield Feed.get_feeds(bag)
-            d.append((bag, feeds))
         self.render("bags.html", d=d)
 
     @coroutine
@@ -149,44 +114,90 @@ class BagsHandler(RequestHandler):
 
         # Get bag and update it
         bag = yield Bag.get_bag(bag_id)
+        if not bag:
+            self.set_status(404)
+            self.write_error(404)
+            return
         bag.name = name
         bag.robot = robot
         bag.location = location
         bag.conditions = conditions
-        bag.save()
-
-        # Save feed information
-        related_feeds = yield Feed.get_feeds(bag)
-        for feed in related_feeds:
-            # Clear existing tags in case any tags were deleted in the form
-            feed.clear_tags()
-            tags = self.get_argument("tags_" + str(feed._id)).split(",")
-            # Save tags to database
-            for tag_name in tags:
+        yield bag.save()
+        Bag.touch()
+
+        # Save feed information, replacing the existing tags in case any
+        # were deleted in the form
+        related_feeds = yield Feed.by_bags([bag])
+        for feed in related_feeds[bag._id]:
+            tags = []
+            tag_names = self.get_argument("tags_" + str(feed._id)).split(",")
+            for tag_name in tag_names:
                 tag_name_sanitized = tag_name.strip().lower()
                 if tag_name_sanitized:
                     tag = yield Tag.from_tag(tag_name_sanitized)
-                    feed.add_tag(tag)
+                    tags.append(tag)
+            yield feed.set_tags(tags)
 
         # Get all bag and feed data to display on web page
-        bags = yield Bag.get_bags()
-        if not bags:
-            self.set_status(404)
-            self.write_error(404)
-            return
-        d = []  # each element is a tuple containing a bag and its feeds
-        for bag in bags:
-            feeds = yield Feed.get_feeds(bag)
-            d.append((bag, feeds))
+        d = yield Feed.listing()
         self.render("bags.html", d=d)
 
     @coroutine
     def get_data(self):
-        bags = yield Bag.get_bags()
-        feeds = yield Feed.get_feeds()
-        d = []  # each element is a tuple containing a bag and its feeds
-        for bag in bags:
-            feeds = yield Feed.get_feeds(bag)
-            d.append((bag, feeds))
-        yield d
-        return
+        """Returns every bag along with its feeds.
+
+        Returns:
+            List of (Bag, list of Feeds) tuples.
+        """
+        d = yield Feed.listing()
+        raise Return(d)
+
+
+class BagProgressHandler(RequestHandler):
+
+    """ROS bag ingestion progress request handler."""
+
+    @coroutine
+    def get(self, bag_id):
+        """Returns the progress of the latest ingestion of a bag.
+
+        Args:
+            bag_id: Unique bag object ID.
+
+        Returns:
+            application/json if found, 404 otherwise.
+
+            For example:
+                {
+                    'id': unique ingest job ID,
+                    'bag': unique bag ID,
+                    'path': path to the bag file,
+                    'state': queued, running, done, failed or cancelled,
+                    'priority': higher priority jobs are run first,
+                    'error': error message if failed,
+                    'created': datetime created in ISO 8601,
+                    'started': datetime the current run started in ISO 8601,
+                    'updated': datetime last checkpointed in ISO 8601,
+                    'finished': datetime finished in ISO 8601,
+                    'progress': fraction of the bag ingested,
+                    'total': number of image messages in the bag,
+                    'messages': number of image messages read,
+                    'frames': number of frames written,
+                    'bytes': number of image bytes read,
+                    'size': size of the bag file in bytes,
+                    'frames_per_second': frames written per second,
+                    'eta': estimated seconds left
+                }
+        """
+        try:
+            job = yield IngestJob.latest(ObjectId(bag_id))
+        except InvalidId:
+            job = None
+
+        if not job:
+            self.set_status(404)
+            self.write_error(404)
+            return
+
+        self.set_header("Content-Type", "application/json")
+        self.write(Encoder().encode(job.dump()))
@@ -2,9 +2,13 @@
 
 """Image handler."""
 
+import math
 from models import Frame
+from bson.errors import InvalidId
 from tornado.gen import coroutine
-from tornado.web import RequestHandler
+from bson.objectid import ObjectId
+from helpers import get_render_cache
+from tornado.web import HTTPError, RequestHandler
 
 __author__ = "Anass Al-Wohoush"
 __version__ = "0.3.0"
@@ -14,23 +18,140 @@ class ImageHandler(RequestHandler):
 
     """Image request handler."""
 
+    # Frames never change once ingested, so renders can be cached for good.
+    CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+    # Deepest pyramid level served, i.e. 1/8 of the full size.
+    MAX_LEVEL = 3
+
+    # Width and height of tiles in pixels.
+    TILE_SIZE = 256
+
+    def parse_arguments(self):
+        """Parses the pyramid level and tile requested.
+
+        Returns:
+            Tuple of (level, tile), where tile is a (column, row) tuple or
+            None for the whole image.
+
+        Raises:
+            HTTPError: If the arguments are invalid.
+        """
+        try:
+            level = int(self.get_argument("level", 0))
+            tile = self.get_argument("tile", None)
+            if tile is not None:
+                column, row = tile.split(",")
+                tile = (int(column), int(row))
+        except ValueError:
+            raise HTTPError(400, "Invalid level or tile")
+
+        if not 0 <= level <= self.MAX_LEVEL:
+            raise HTTPError(400, "Level must be between 0 and {}".format(
+                self.MAX_LEVEL
+            ))
+
+        return level, tile
+
+    def has_tile(self, frame, level, tile):
+        """Returns whether a frame's pyramid level has a tile.
+
+        Args:
+            frame: Frame document, which needs only its size.
+            level: Pyramid level.
+            tile: (column, row) tuple.
+
+        Returns:
+            Whether the tile is within the level, or True if the frame's size
+            is not known without decoding it.
+        """
+        width, height = frame.get("width"), frame.get("height")
+        if width is None or height is None:
+            return True
+        column, row = tile
+        size = float(self.TILE_SIZE)
+        columns = math.ceil(max(1, width >> level) / size)
+        rows = math.ceil(max(1, height >> level) / size)
+        return 0 <= column < columns and 0 <= row < rows
+
+    def not_found(self):
+        """Responds with a 404."""
+        self.set_status(404)
+        self.write_error(404)
+
     @coroutine
     def get(self, frame_id):
         """Returns corresponding frame as a JPEG.
 
+        Renders are cached, and a 304 is returned if the client already has
+        the current render according to If-None-Match. Frames recorded as
+        JPEGs are served without being decoded at full size.
+
         Args:
             frame_id: Unique frame object ID.
 
+        Parameters:
+            level: Pyramid level, where level n is 1/2^n of the full size.
+                Defaults to 0.
+            tile: Optional "column,row" of the TILE_SIZE square tile of the
+                level to return instead of the whole image.
+
         Returns:
-            image/jpeg if found, 404 otherwise.
+            image/jpeg if found, 304 if not modified, 404 otherwise,
+            including for tiles outside of the level.
         """
-        frame = yield Frame.objects.get(frame_id)
+        level, tile = self.parse_arguments()
+
+        def key(tile):
+            tile = "{},{}".format(*tile) if tile else None
+            return cache.key(frame_id, format="jpeg", level=level, tile=tile)
 
-        if not frame:
-            self.set_status(404)
-            self.write_error(404)
+        # Make sure the frame and tile exist before answering with a 304, or
+        # from the cache, without loading the image.
+        try:
+            doc = yield Frame.objects.coll().find_one(
+                {"_id": ObjectId(frame_id)}, fields=["width", "height"]
+            )
+        except InvalidId:
+            doc = None
+        if not doc or tile and not self.has_tile(doc, level, tile):
+            self.not_found()
             return
 
-        jpeg = yield frame.to_jpeg()
+        cache = get_render_cache()
+        self.set_header("Etag", '"{}"'.format(key(tile)))
+        if self.check_etag_header():
+            self.set_status(304)
+            return
+
+        jpeg = yield cache.get(key(tile))
+        if jpeg is None:
+            frame = yield Frame.objects.get(frame_id)
+            if not frame:
+                self.clear_header("Etag")
+                self.not_found()
+                return
+
+            if tile is None:
+                jpeg = yield frame.to_jpeg(level)
+
+                # Frames stored as JPEGs are already served as they are, so
+                # caching them would only duplicate them.
+                if frame.codec != "jpeg" or level:
+                    cache.put(key(tile), jpeg)
+            else:
+                # Render all of the level's tiles at once since neighbouring
+                # tiles are likely to be requested next.
+                tiles = yield frame.to_jpeg_tiles(level, self.TILE_SIZE)
+                for position, data in tiles.items():
+                    cache.put(key(position), data)
+                jpeg = tiles.get(tile)
+
+            if jpeg is None:
+                self.clear_header("Etag")
+                self.not_found()
+                return
+
+        self.set_header("Cache-Control", self.CACHE_CONTROL)
         self.set_header("Content-Type", "image/jpeg")
         self.write(jpeg)
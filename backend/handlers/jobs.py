@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+"""Ingest job handlers."""
+
+from helpers import Encoder
+from ingest import get_queue
+from bson.errors import InvalidId
+from models import IngestJob, Loader
+from tornado.gen import coroutine, Return
+from tornado.web import HTTPError, RequestHandler
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+
+@coroutine
+def get_job(job_id):
+    """Returns an ingest job by ID.
+
+    Args:
+        job_id: Unique ingest job object ID.
+
+    Returns:
+        IngestJob.
+
+    Raises:
+        HTTPError: If there is no such job.
+    """
+    try:
+        job = yield Loader().load(IngestJob, job_id)
+    except InvalidId:
+        job = None
+
+    if not job:
+        raise HTTPError(404)
+    raise Return(job)
+
+
+class IngestJobsHandler(RequestHandler):
+
+    """Ingest job list request handler."""
+
+    # States that can be filtered by.
+    STATES = {"queued", "running", "done", "failed", "cancelled"}
+
+    # Default and maximum number of jobs listed.
+    DEFAULT_LIMIT = 100
+    MAX_LIMIT = 1000
+
+    @coroutine
+    def get(self):
+        """Lists the latest ingest jobs.
+
+        Parameters:
+            state: Optional comma-separated states to filter by.
+            limit: Maximum number of jobs, up to 1000. Defaults to 100.
+
+        Returns:
+            application/json.
+
+            For example:
+                {
+                    'jobs': list of jobs as returned by /ingest/<id>, latest
+                        first,
+                    'running': number of jobs running in this process,
+                    'concurrency': maximum number of jobs run at once by this
+                        process
+                }
+        """
+        states = self.get_argument("state", "").split(",")
+        states = [s.strip() for s in states if s.strip()]
+        if not set(states) <= self.STATES:
+            raise HTTPError(400, "States must be among: {}".format(
+                ", ".join(sorted(self.STATES))
+            ))
+
+        try:
+            limit = int(self.get_argument("limit", self.DEFAULT_LIMIT))
+        except ValueError:
+            raise HTTPError(400, "Invalid limit")
+        limit = max(1, min(limit, self.MAX_LIMIT))
+
+        jobs = yield IngestJob.find(states, limit)
+        queue = get_queue()
+
+        self.set_header("Content-Type", "application/json")
+        self.write(Encoder().encode({
+            "jobs": [job.dump() for job in jobs],
+            "running": len(queue.running),
+            "concurrency": queue.concurrency
+        }))
+
+
+class IngestJobHandler(RequestHandler):
+
+    """Ingest job request handler."""
+
+    @coroutine
+    def get(self, job_id):
+        """Returns an ingest job.
+
+        Args:
+            job_id: Unique ingest job object ID.
+
+        Returns:
+            application/json if found, 404 otherwise.
+
+            For example:
+                {
+                    'id': unique ingest job ID,
+                    'bag': unique bag ID,
+                    'path': path to the bag file,
+                    'state': queued, running, done, failed or cancelled,
+                    'priority': higher priority jobs are run first,
+                    ...
+                }
+
+            See /bags/<id>/progress for the remaining fields.
+        """
+        job = yield get_job(job_id)
+
+        self.set_header("Content-Type", "application/json")
+        self.write(Encoder().encode(job.dump()))
+
+
+class IngestCancelHandler(RequestHandler):
+
+    """Ingest job cancellation request handler."""
+
+    @coroutine
+    def post(self, job_id):
+        """Cancels an ingest job that is not over yet.
+
+        Queued jobs are cancelled right away, while running jobs stop within
+        --ingest_checkpoint_interval seconds and keep the frames they already
+        wrote.
+
+        Args:
+            job_id: Unique ingest job object ID.
+
+        Returns:
+            application/json of the job if cancelled, 404 if not found and
+            409 if it is already over.
+        """
+        job = yield get_job(job_id)
+        cancelled = yield get_queue().cancel(job._id)
+        if not cancelled:
+            raise HTTPError(409, "Job is already over")
+
+        job = yield get_job(job_id)
+        self.set_header("Content-Type", "application/json")
+        self.write(Encoder().encode(job.dump()))
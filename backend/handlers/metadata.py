@@ -7,7 +7,7 @@ from helpers import Encoder
 from tornado.gen import coroutine
 from tornado.escape import json_decode
 from tornado.web import RequestHandler
-from models import Annotation, Frame, Tag, User
+from models import Annotation, Frame, Loader, Tag, User
 
 __author__ = "Anass Al-Wohoush"
 __version__ = "0.3.0"
@@ -44,13 +44,15 @@ class MetadataHandler(RequestHandler):
                     'added': datetime added in ISO 8601
                 }
         """
-        frame = yield Frame.objects.get(frame_id)
+        loader = Loader()
+        frame = yield loader.load(Frame, frame_id)
 
         if not frame:
             self.set_status(404)
             self.write_error(404)
             return
-        
+
+        yield loader.resolve([frame])
         self.set_header("Content-Type", "application/json")
         self.write(Encoder().encode(frame.dump()))
 
@@ -95,13 +97,14 @@ class MetadataHandler(RequestHandler):
         data = json_decode(self.request.body)
         logging.debug("Annotating frame %s with: %r", frame_id, data)
 
-        frame = yield Frame.objects.get(frame_id)
+        loader = Loader()
+        frame = yield loader.load(Frame, frame_id)
 
         if not frame:
             self.set_status(404)
             self.write_error(404)
             return
-        
+
         user = yield User.from_username("robotics")
         ant_data = data["annotations"]
         annotations = yield [Annotation.from_json(a, user)
@@ -109,6 +112,7 @@ class MetadataHandler(RequestHandler):
         tags = yield [Tag.from_tag(s.lower())
                       for s in data["tags"]]
 
+        yield loader.resolve([frame])
         yield frame.annotate(annotations, tags)
         logging.info(
             "Annotated frame %r of %s",
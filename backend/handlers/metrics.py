@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+
+"""Metrics handlers."""
+
+from ingest import get_queue
+from models import IngestJob
+from datetime import datetime
+from tornado.gen import coroutine
+from tornado.web import RequestHandler
+from helpers.metrics import RequestMetrics
+from tornado.httputil import HTTPMessageDelegate
+from helpers.profiling import request_id, save_profile, start_profiler
+from helpers import (
+    counter, current_request, gauge, get_profile_log, get_render_cache,
+    histogram, intern_caches, render_metrics
+)
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+# Buckets of the number of database queries made per request.
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250)
+
+REQUESTS = counter(
+    "lens_http_requests_total",
+    "Requests handled.",
+    ["handler", "method", "status"]
+)
+REQUEST_SECONDS = histogram(
+    "lens_http_request_seconds",
+    "Seconds taken to handle requests.",
+    ["handler", "method"]
+)
+REQUEST_QUERIES = histogram(
+    "lens_http_request_mongo_queries",
+    "Database queries made per request.",
+    ["handler"],
+    QUERY_COUNT_BUCKETS
+)
+REQUEST_QUERY_SECONDS = histogram(
+    "lens_http_request_mongo_seconds",
+    "Seconds spent waiting on database queries per request.",
+    ["handler"]
+)
+
+
+def cache_stats():
+    """Returns the statistics of every cache by name."""
+    stats = dict(
+        (name, cache.stats()) for name, cache in intern_caches().items()
+    )
+    stats["render"] = get_render_cache().stats()
+    return stats
+
+
+def cache_metric(key):
+    """Returns a collect function of a cache statistic.
+
+    Args:
+        key: Statistic, as returned by the caches' stats().
+
+    Returns:
+        Function returning a dictionary of values by (cache name,).
+    """
+    def collect():
+        return dict(
+            ((name,), stats[key]) for name, stats in cache_stats().items()
+        )
+    return collect
+
+
+counter("lens_cache_hits_total", "Lookups served from memory.",
+        ["cache"], cache_metric("hits"))
+counter("lens_cache_misses_total", "Lookups that had to be resolved.",
+        ["cache"], cache_metric("misses"))
+counter("lens_cache_evictions_total", "Entries evicted to make room.",
+        ["cache"], cache_metric("evictions"))
+gauge("lens_cache_hit_ratio", "Ratio of lookups served from the cache.",
+      ["cache"], cache_metric("hit_ratio"))
+gauge("lens_cache_entries", "Entries held in memory.",
+      ["cache"], cache_metric("entries"))
+counter("lens_render_cache_disk_hits_total",
+        "Renders served from disk after missing in memory.",
+        collect=lambda: {(): get_render_cache().disk_hits})
+gauge("lens_render_cache_bytes", "Bytes of rendered images cached.",
+      ["tier"], lambda: {
+          ("memory",): get_render_cache().stats()["bytes"],
+          ("disk",): get_render_cache().stats()["disk_bytes"]
+      })
+gauge("lens_ingest_jobs_running", "Ingest jobs run by this process.",
+      collect=lambda: {(): len(get_queue().running)})
+
+INGEST_JOBS = gauge(
+    "lens_ingest_jobs",
+    "Ingest jobs that are not over yet, across every process.",
+    ["state"]
+)
+
+
+class RequestDelegate(HTTPMessageDelegate):
+
+    """Runs a request with RequestMetrics, so work done for it is counted
+    towards it, and profiled if need be, across coroutine yields.
+    """
+
+    def __init__(self, delegate):
+        """Constructs a RequestDelegate.
+
+        Args:
+            delegate: HTTPMessageDelegate handling the request.
+        """
+        self.delegate = delegate
+        self.metrics = RequestMetrics()
+
+    def headers_received(self, start_line, headers):
+        self.metrics.profiler = start_profiler(headers)
+        if self.metrics.profiler:
+            self.metrics.request_id = request_id(headers)
+        return self.metrics.run(
+            self.delegate.headers_received, start_line, headers
+        )
+
+    def data_received(self, chunk):
+        return self.metrics.run(self.delegate.data_received, chunk)
+
+    def finish(self):
+        return self.metrics.run(self.delegate.finish)
+
+    def on_connection_close(self):
+        return self.delegate.on_connection_close()
+
+
+def observe_request(handler):
+    """Records a completed request, and saves its profile if it was
+    profiled.
+
+    Args:
+        handler: RequestHandler that handled the request.
+    """
+    name = type(handler).__name__
+    method = handler.request.method
+    REQUESTS.inc((name, method, handler.get_status()))
+    REQUEST_SECONDS.observe(handler.request.request_time(), (name, method))
+
+    metrics = current_request()
+    if metrics is None:
+        return
+
+    REQUEST_QUERIES.observe(metrics.queries, (name,))
+    REQUEST_QUERY_SECONDS.observe(metrics.query_seconds, (name,))
+    metrics.finish()
+
+    if metrics.profiler:
+        get_profile_log().add({
+            "id": metrics.request_id,
+            "handler": name,
+            "method": method,
+            "uri": handler.request.uri,
+            "status": handler.get_status(),
+            "finished": datetime.utcnow(),
+            "seconds": handler.request.request_time(),
+            "queries": metrics.queries,
+            "query_seconds": metrics.query_seconds,
+            "profile": save_profile(
+                metrics.profiler, name, metrics.request_id
+            )
+        })
+
+
+class MetricsHandler(RequestHandler):
+
+    """Prometheus metrics request handler."""
+
+    @coroutine
+    def get(self):
+        """Returns every metric of this process.
+
+        Returns:
+            text/plain in the Prometheus text exposition format.
+        """
+        counts = yield IngestJob.count_active()
+        for state, count in counts.items():
+            INGEST_JOBS.set(count, (state,))
+
+        self.set_header("Content-Type", "text/plain; version=0.0.4")
+        self.write(render_metrics())
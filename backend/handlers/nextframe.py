@@ -2,10 +2,10 @@
 
 """Next frame request handler."""
 
-from models import Frame
 from helpers import Encoder
+from models import Frame, Loader
 from tornado.gen import coroutine
-from tornado.web import RequestHandler
+from tornado.web import HTTPError, RequestHandler
 
 __author__ = "Anass Al-Wohoush"
 __version__ = "0.3.0"
@@ -15,10 +15,18 @@ class NextFrameHandler(RequestHandler):
 
     """Next frame request handler."""
 
+    # Maximum number of frames that can be leased at once.
+    MAX_COUNT = 20
+
     @coroutine
     def get(self):
         """Returns next frame information.
 
+        Parameters:
+            count: Optional number of frames to lease at once.
+            session: Optional annotation session to lease frames to, so
+                they can be released early.
+
         Returns:
             application/json if found, 404 otherwise.
 
@@ -36,13 +44,97 @@ class NextFrameHandler(RequestHandler):
                     'annotations': list of JSON metadata,
                     'accessed': datetime last accessed in ISO 8601
                 }
+
+            If count is given, the frames are returned as a list instead:
+                {
+                    'session': annotation session,
+                    'frames': list of frames as above
+                }
         """
-        frame = yield Frame.next()
+        session = self.get_argument("session", None)
+        count = self.get_argument("count", None)
 
-        if not frame:
+        if count is None:
+            frame = yield Frame.next(session)
+            frames = [frame] if frame else []
+        else:
+            try:
+                count = int(count)
+            except ValueError:
+                raise HTTPError(400, "Invalid count")
+            count = max(1, min(count, self.MAX_COUNT))
+            frames = yield Frame.lease(session, count)
+
+        if not frames:
             self.set_status(404)
             self.write_error(404)
             return
 
+        # Load the references of every frame together.
+        yield Loader().resolve(frames)
+
+        if count is None:
+            data = frames[0].dump()
+        else:
+            data = {
+                "session": session,
+                "frames": [f.dump() for f in frames]
+            }
+
+        self.set_header("Content-Type", "application/json")
+        self.write(Encoder().encode(data))
+
+
+class RenewHandler(RequestHandler):
+
+    """Frame lease renewal request handler."""
+
+    @coroutine
+    def post(self):
+        """Renews the leases of the unannotated frames leased to a session,
+        so frames leased in a batch don't expire while the ones before them
+        are being annotated.
+
+        Parameters:
+            session: Annotation session.
+
+        Returns:
+            application/json of the number of frames renewed.
+
+            For example:
+                {
+                    'renewed': number of frames renewed
+                }
+        """
+        session = self.get_argument("session")
+        renewed = yield Frame.renew(session)
+
+        self.set_header("Content-Type", "application/json")
+        self.write(Encoder().encode({"renewed": renewed}))
+
+
+class ReleaseHandler(RequestHandler):
+
+    """Frame lease release request handler."""
+
+    @coroutine
+    def post(self):
+        """Releases the unannotated frames leased to a session, so they can
+        be handed out again right away instead of once their lease expires.
+
+        Parameters:
+            session: Annotation session.
+
+        Returns:
+            application/json of the number of frames released.
+
+            For example:
+                {
+                    'released': number of frames released
+                }
+        """
+        session = self.get_argument("session")
+        released = yield Frame.release(session)
+
         self.set_header("Content-Type", "application/json")
-        self.write(Encoder().encode(frame.dump()))
+        self.write(Encoder().encode({"released": released}))
@@ -3,42 +3,225 @@
 """Search handler."""
 
 import logging
+import dateutil.parser
 from helpers import Encoder
-from models import Frame, Tag
-from tornado.gen import coroutine
-from tornado.web import RequestHandler
+from bson.errors import InvalidId
+from bson.objectid import ObjectId
+from models import Feed, Frame, Tag
+from tornado.gen import coroutine, Return
+from tornado.web import HTTPError, RequestHandler
 
 __author__ = "Anass Al-Wohoush"
-__version__ = "0.1.0"
+__version__ = "0.2.0"
 
 
 class SearchByTagHandler(RequestHandler):
 
     """Search by tag request handler."""
 
+    # Frame fields that can be requested.
+    FIELDS = {
+        "feed", "seq", "tags", "width", "height", "channels", "encoding",
+        "annotated", "accessed"
+    }
+
+    # Default and maximum number of results per page.
+    DEFAULT_LIMIT = 100
+    MAX_LIMIT = 1000
+
+    # Number of results written between flushes of the response.
+    FLUSH_EVERY = 100
+
+    def get_list_argument(self, name):
+        """Returns a comma-separated argument as a list.
+
+        Args:
+            name: Argument name.
+
+        Returns:
+            List of non-empty stripped values.
+        """
+        values = self.get_argument(name, "").split(",")
+        return [v.strip() for v in values if v.strip()]
+
+    @coroutine
+    def build_query(self):
+        """Builds the frame query from the request arguments.
+
+        Returns:
+            MongoDB query, or None if nothing can match.
+
+        Raises:
+            HTTPError: If the arguments are invalid.
+        """
+        # Tag filters. For backwards compatibility, q is the same as all.
+        all_tags = [t.lower() for t in self.get_list_argument("all")]
+        all_tags.extend(t.lower() for t in self.get_list_argument("q"))
+        any_tags = [t.lower() for t in self.get_list_argument("any")]
+        not_tags = [t.lower() for t in self.get_list_argument("not")]
+
+        tag_ids = yield Tag.ids_by_name(set(all_tags + any_tags + not_tags))
+
+        tags = {}
+        if all_tags:
+            if not all(t in tag_ids for t in all_tags):
+                return
+            tags["$all"] = [tag_ids[t] for t in set(all_tags)]
+        if any_tags:
+            tags["$in"] = [tag_ids[t] for t in any_tags if t in tag_ids]
+            if not tags["$in"]:
+                return
+        if not_tags:
+            tags["$nin"] = [tag_ids[t] for t in not_tags if t in tag_ids]
+
+        query = {}
+        if tags:
+            query["tags"] = tags
+
+        # Bag filters.
+        bag_query = {}
+        try:
+            bags = self.get_list_argument("bag")
+            if bags:
+                bag_query["_id"] = {"$in": [ObjectId(b) for b in bags]}
+
+            recorded = {}
+            since = self.get_argument("since", None)
+            if since:
+                recorded["$gte"] = dateutil.parser.parse(since)
+            until = self.get_argument("until", None)
+            if until:
+                recorded["$lt"] = dateutil.parser.parse(until)
+            if recorded:
+                bag_query["recorded"] = recorded
+
+            cursor = self.get_argument("cursor", None)
+            if cursor:
+                query["_id"] = {"$gt": ObjectId(cursor)}
+        except (InvalidId, ValueError):
+            raise HTTPError(400, "Invalid bag, date or cursor")
+
+        for field in ("robot", "location"):
+            value = self.get_argument(field, None)
+            if value:
+                bag_query[field] = value
+
+        if bag_query:
+            feed_ids = yield Feed.ids_for_bags(bag_query)
+            if not feed_ids:
+                return
+            query["feed"] = {"$in": feed_ids}
+
+        raise Return(query)
+
+    @staticmethod
+    def dump(doc, fields):
+        """Returns the JSON representation of a search result.
+
+        Args:
+            doc: Projected frame document.
+            fields: List of requested fields.
+
+        Returns:
+            Frame ID if no fields were requested, dictionary otherwise.
+        """
+        if not fields:
+            return str(doc["_id"])
+
+        result = {"id": str(doc["_id"])}
+        for field in fields:
+            value = doc.get(field)
+            if field == "feed" and value is not None:
+                value = str(value)
+            elif field == "tags":
+                value = [str(t) for t in value or []]
+            result[field] = value
+        return result
+
     @coroutine
     def get(self):
-        """Annotates and tags a frame.
+        """Searches for frames by tags and bag properties.
+
+        Results are streamed in ascending ID order. If a page is full, its
+        cursor can be passed to get the next page.
 
         Parameters:
-            q: Search query (tag name).
+            q: Tag that frames must have.
+            all: Comma-separated tags that frames must all have.
+            any: Comma-separated tags that frames must have at least one of.
+            not: Comma-separated tags that frames must not have.
+            bag: Comma-separated bag IDs that frames must belong to.
+            robot: Robot of the frames' bag.
+            location: Location of the frames' bag.
+            since: Earliest recorded datetime of the frames' bag in ISO 8601.
+            until: Latest recorded datetime of the frames' bag in ISO 8601,
+                exclusive.
+            fields: Comma-separated frame fields to return along with the
+                IDs.
+            limit: Maximum number of results, up to 1000. Defaults to 100.
+            cursor: Cursor of the previous page.
 
         Returns:
-            A list of frame IDs.
-            application/json if successfull, 404 otherwise.
+            application/json if successfull, 404 otherwise. Pages past the
+            last are empty instead.
+
+            For example:
+                {
+                    'results': list of frame IDs, or of dictionaries of the
+                        requested fields with the frame ID as 'id',
+                    'cursor': cursor of the next page, or null
+                }
         """
-        tag_name = self.get_argument("q")
-        logging.debug("Searching for frames tagged as: %s", tag_name)
+        fields = self.get_list_argument("fields")
+        if not set(fields) <= self.FIELDS:
+            raise HTTPError(400, "Fields must be among: {}".format(
+                ", ".join(sorted(self.FIELDS))
+            ))
+
+        try:
+            limit = int(self.get_argument("limit", self.DEFAULT_LIMIT))
+        except ValueError:
+            raise HTTPError(400, "Invalid limit")
+        limit = max(1, min(limit, self.MAX_LIMIT))
+
+        query = yield self.build_query()
+        logging.debug("Searching for frames matching: %r", query)
 
-        tag = yield Tag.from_tag(tag_name)
-        frames = yield Frame.objects.filter({"tags": tag._id}).find_all()
+        cursor = None
+        if query is not None:
+            cursor = Frame.objects.coll().find(query, fields=fields or ["_id"])
+            cursor = cursor.sort("_id", 1).limit(limit)
 
-        if not frames:
+        if cursor is None or not (yield cursor.fetch_next):
+            # A page following a full one can be empty without the search
+            # having found nothing.
+            if self.get_argument("cursor", None):
+                self.write({"results": [], "cursor": None})
+                return
             self.set_status(404)
             self.write_error(404)
             return
 
-        frame_ids = [str(f._id) for f in frames]
-
+        # Stream the results as they come in instead of building the whole
+        # response in memory.
+        encoder = Encoder()
         self.set_header("Content-Type", "application/json")
-        self.write(Encoder().encode(frame_ids))
+        self.write('{"results": [')
+
+        count = 0
+        last_id = None
+        while True:
+            doc = cursor.next_object()
+            if count:
+                self.write(", ")
+            self.write(encoder.encode(self.dump(doc, fields)))
+            last_id = doc["_id"]
+            count += 1
+
+            if count % self.FLUSH_EVERY == 0:
+                yield self.flush()
+            if not (yield cursor.fetch_next):
+                break
+
+        next_cursor = str(last_id) if count == limit else None
+        self.write('], "cursor": {}}}'.format(encoder.encode(next_cursor)))
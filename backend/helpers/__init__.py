@@ -3,8 +3,20 @@
 """Lens Backend Helpers."""
 
 from encoder import Encoder
+from pool import get_pool, pool_size
+from profiling import ProfileLog, get_profile_log
+from render_cache import RenderCache, get_render_cache
+from imageinfo import guess_encoding, image_format, image_info
+from intern import InternCache, get_intern_cache, intern_caches
+from metrics import counter, current_request, gauge, histogram, render_metrics
 
 __author__ = "Anass Al-Wohoush"
 __version__ = "0.1.0"
 
-__all__ = ["Encoder"]
+__all__ = [
+    "Encoder", "InternCache", "ProfileLog", "RenderCache", "counter",
+    "current_request", "gauge", "get_intern_cache", "get_pool",
+    "get_profile_log", "get_render_cache", "guess_encoding", "histogram",
+    "image_format", "image_info", "intern_caches", "pool_size",
+    "render_metrics"
+]
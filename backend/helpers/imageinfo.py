@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+"""Encoded image header parsing."""
+
+import struct
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+JPEG_SIGNATURE = b"\xff\xd8"
+
+# Number of channels per PNG color type.
+PNG_CHANNELS = {
+    0: 1,  # Grayscale.
+    2: 3,  # Truecolor.
+    3: 3,  # Indexed.
+    4: 2,  # Grayscale with alpha.
+    6: 4,  # Truecolor with alpha.
+}
+
+# JPEG start of frame markers, which hold the image dimensions.
+JPEG_SOF = set(range(0xc0, 0xd0)) - {0xc4, 0xc8, 0xcc}
+
+# JPEG markers without a length: TEM and RST0 to RST7.
+JPEG_STANDALONE = {0x01} | set(range(0xd0, 0xd8))
+
+# JPEG markers after which the start of frame can no longer be found: SOS
+# and EOI.
+JPEG_END = {0xda, 0xd9}
+
+
+def image_format(data):
+    """Returns the format of an encoded image from its signature.
+
+    Args:
+        data: Encoded image byte string or buffer.
+
+    Returns:
+        'png', 'jpeg' or None if the format is not recognized.
+    """
+    if data[:8] == PNG_SIGNATURE:
+        return "png"
+    if data[:2] == JPEG_SIGNATURE:
+        return "jpeg"
+    return None
+
+
+def jpeg_info(data):
+    """Returns the dimensions of a JPEG from its start of frame segment.
+
+    Segments are skipped by their length, so only the headers before the
+    start of frame are read.
+
+    Args:
+        data: JPEG encoded byte string or buffer.
+
+    Returns:
+        Tuple of (width, height, channels, bit depth), or None if no start
+        of frame is found.
+    """
+    offset = len(JPEG_SIGNATURE)
+    while offset + 4 <= len(data):
+        prefix, marker = struct.unpack_from(">BB", data, offset)
+        if prefix != 0xff:
+            return None
+
+        # Markers may be padded with any number of fill bytes.
+        if marker == 0xff:
+            offset += 1
+            continue
+        if marker in JPEG_STANDALONE:
+            offset += 2
+            continue
+        if marker in JPEG_END:
+            return None
+
+        if marker in JPEG_SOF:
+            if offset + 10 > len(data):
+                return None
+            depth, height, width, channels = struct.unpack_from(
+                ">BHHB", data, offset + 4
+            )
+            return width, height, channels, depth
+
+        length, = struct.unpack_from(">H", data, offset + 2)
+        offset += 2 + length
+    return None
+
+
+def image_info(data):
+    """Returns the dimensions of an encoded image from its header, without
+    decoding any pixels.
+
+    Args:
+        data: Encoded image byte string or buffer.
+
+    Returns:
+        Tuple of (width, height, channels, bit depth), or None if the format
+        is not recognized.
+    """
+    header = data[:26]
+    if header[:8] == PNG_SIGNATURE and header[12:16] == b"IHDR":
+        width, height, depth, color = struct.unpack(">IIBB", header[16:26])
+        return width, height, PNG_CHANNELS.get(color, 3), depth
+    if header[:2] == JPEG_SIGNATURE:
+        return jpeg_info(data)
+    return None
+
+
+def guess_encoding(channels, depth):
+    """Guesses the ROS image encoding an image was most likely encoded from.
+
+    OpenCV writes color images in BGR order.
+
+    Args:
+        channels: Number of channels.
+        depth: Bit depth per channel.
+
+    Returns:
+        ROS image encoding, or None if unknown.
+    """
+    if depth == 8:
+        return {1: "mono8", 3: "bgr8", 4: "bgra8"}.get(channels)
+    if depth == 16:
+        return {1: "mono16", 3: "bgr16", 4: "bgra16"}.get(channels)
+    return None
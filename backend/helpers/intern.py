@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+"""Document interning cache."""
+
+import time
+from collections import OrderedDict
+from tornado.options import options
+from tornado.concurrent import Future
+from tornado.gen import coroutine, Return
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+_caches = {}
+
+
+class InternCache(object):
+
+    """Size-bounded LRU cache of documents by key with a time to live.
+
+    Lookups of a key that is already being resolved wait on the same
+    resolution instead of starting another, so concurrent callers always
+    converge on the same document.
+
+    Attributes:
+        max_size: Maximum number of entries.
+        ttl: Number of seconds an entry stays valid for.
+        hits: Number of lookups served from the cache or from a concurrent
+            lookup of the same key.
+        misses: Number of lookups that had to be resolved.
+        evictions: Number of entries evicted to make room.
+    """
+
+    def __init__(self, max_size, ttl):
+        """Constructs an InternCache.
+
+        Args:
+            max_size: Maximum number of entries.
+            ttl: Number of seconds an entry stays valid for.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._pending = {}
+
+    @coroutine
+    def get(self, key, resolve):
+        """Returns the cached value of a key, resolving it if needed.
+
+        Args:
+            key: Cache key.
+            resolve: Function returning a Future of the value of the key.
+
+        Returns:
+            Value.
+        """
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry[0] > time.time():
+            self._entries[key] = entry
+            self.hits += 1
+            raise Return(entry[1])
+
+        if key in self._pending:
+            self.hits += 1
+            value = yield self._pending[key]
+            raise Return(value)
+
+        self.misses += 1
+        future = self._pending[key] = Future()
+        try:
+            value = yield resolve()
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+        finally:
+            del self._pending[key]
+
+        self.put(key, value)
+        raise Return(value)
+
+    def put(self, key, value):
+        """Caches the value of a key.
+
+        Args:
+            key: Cache key.
+            value: Value.
+        """
+        self._entries.pop(key, None)
+        self._entries[key] = (time.time() + self.ttl, value)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        """Returns a dictionary of cache statistics."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": float(self.hits) / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "max_size": self.max_size,
+        }
+
+
+def get_intern_cache(name):
+    """Returns a shared intern cache by name, creating it on first use.
+
+    Args:
+        name: Cache name, usually the collection name.
+
+    Returns:
+        InternCache.
+    """
+    if name not in _caches:
+        _caches[name] = InternCache(
+            options.intern_cache_size,
+            options.intern_cache_ttl
+        )
+    return _caches[name]
+
+
+def intern_caches():
+    """Returns every shared intern cache by name."""
+    return dict(_caches)
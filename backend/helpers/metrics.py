@@ -0,0 +1,344 @@
+# -*- coding: utf-8 -*-
+
+"""Prometheus metrics."""
+
+import bisect
+from collections import OrderedDict
+from tornado.stack_context import StackContext
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+# Default histogram buckets of durations in seconds.
+DURATION_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+
+_metrics = OrderedDict()
+_requests = []
+
+
+def _number(value):
+    """Formats a sample value or bucket bound."""
+    if isinstance(value, (int, long)):
+        return str(value)
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+def _labels(names, values, extra=()):
+    """Formats label names and values, e.g. {handler="ImageHandler"}."""
+    pairs = zip(names, values) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\")
+                         .replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in pairs
+    ) + "}"
+
+
+class Metric(object):
+
+    """Metric with a value for every combination of label values.
+
+    Attributes:
+        name: Metric name.
+        help: Description of the metric.
+        labels: Tuple of label names.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name, help, labels=()):
+        """Constructs a Metric.
+
+        Args:
+            name: Metric name.
+            help: Description of the metric.
+            labels: Label names.
+        """
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+
+    def samples(self):
+        """Returns a list of (name suffix, label values, extra label pairs,
+        value) tuples.
+        """
+        raise NotImplementedError()
+
+    def expose(self):
+        """Returns the metric in the Prometheus text format as a list of
+        lines.
+        """
+        lines = [
+            "# HELP {} {}".format(self.name, self.help),
+            "# TYPE {} {}".format(self.name, self.kind)
+        ]
+        for suffix, values, extra, value in self.samples():
+            lines.append("{}{}{} {}".format(
+                self.name, suffix, _labels(self.labels, values, extra),
+                _number(value)
+            ))
+        return lines
+
+
+class Counter(Metric):
+
+    """Monotonically increasing value.
+
+    Values are either incremented as things happen, or read at scrape time
+    from counters kept elsewhere with a collect function.
+
+    Attributes:
+        collect: Function returning a dictionary of values by tuple of
+            label values, or None.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name, help, labels=(), collect=None):
+        """Constructs a Counter.
+
+        Args:
+            name: Metric name.
+            help: Description of the metric.
+            labels: Label names.
+            collect: Function returning a dictionary of values by tuple of
+                label values, or None to keep values here.
+        """
+        super(Counter, self).__init__(name, help, labels)
+        self.collect = collect
+        self._values = {}
+
+    def inc(self, labels=(), amount=1):
+        """Increments the value.
+
+        Args:
+            labels: Tuple of label values.
+            amount: Amount to increment by.
+        """
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        """Returns a list of samples as described by Metric.samples()."""
+        values = self.collect() if self.collect else self._values
+        return [
+            ("", labels, (), value)
+            for labels, value in sorted(values.items())
+        ]
+
+
+class Gauge(Counter):
+
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def set(self, value, labels=()):
+        """Sets the value.
+
+        Args:
+            value: Value.
+            labels: Tuple of label values.
+        """
+        self._values[labels] = value
+
+
+class Histogram(Metric):
+
+    """Distribution of observed values in cumulative buckets.
+
+    Attributes:
+        buckets: Tuple of bucket upper bounds, in increasing order.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DURATION_BUCKETS):
+        """Constructs a Histogram.
+
+        Args:
+            name: Metric name.
+            help: Description of the metric.
+            labels: Label names.
+            buckets: Bucket upper bounds.
+        """
+        super(Histogram, self).__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+
+    def observe(self, value, labels=()):
+        """Records an observation.
+
+        Only the bucket it falls in is counted here, so this is cheap enough
+        for hot paths. Buckets are made cumulative when exposed.
+
+        Args:
+            value: Observed value.
+            labels: Tuple of label values.
+        """
+        counts = self._values.get(labels)
+        if counts is None:
+            # One count per bucket, then +Inf, then the sum.
+            counts = [0] * (len(self.buckets) + 1) + [0.0]
+            self._values[labels] = counts
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def samples(self):
+        """Returns a list of samples as described by Metric.samples()."""
+        samples = []
+        bounds = self.buckets + (float("inf"),)
+        for labels, counts in sorted(self._values.items()):
+            total = 0
+            for bound, count in zip(bounds, counts):
+                total += count
+                samples.append(
+                    ("_bucket", labels, [("le", _number(bound))], total)
+                )
+            samples.append(("_sum", labels, (), counts[-1]))
+            samples.append(("_count", labels, (), total))
+        return samples
+
+
+def _register(cls, name, *args, **kwargs):
+    """Returns a registered metric, registering it on first use."""
+    if name not in _metrics:
+        _metrics[name] = cls(name, *args, **kwargs)
+    return _metrics[name]
+
+
+def counter(name, help, labels=(), collect=None):
+    """Returns a registered Counter, registering it on first use.
+
+    Args:
+        name: Metric name.
+        help: Description of the metric.
+        labels: Label names.
+        collect: Function returning a dictionary of values by tuple of label
+            values, or None to increment it instead.
+
+    Returns:
+        Counter.
+    """
+    return _register(Counter, name, help, labels, collect)
+
+
+def gauge(name, help, labels=(), collect=None):
+    """Returns a registered Gauge, registering it on first use.
+
+    Args:
+        name: Metric name.
+        help: Description of the metric.
+        labels: Label names.
+        collect: Function returning a dictionary of values by tuple of label
+            values, or None to set it instead.
+
+    Returns:
+        Gauge.
+    """
+    return _register(Gauge, name, help, labels, collect)
+
+
+def histogram(name, help, labels=(), buckets=DURATION_BUCKETS):
+    """Returns a registered Histogram, registering it on first use.
+
+    Args:
+        name: Metric name.
+        help: Description of the metric.
+        labels: Label names.
+        buckets: Bucket upper bounds.
+
+    Returns:
+        Histogram.
+    """
+    return _register(Histogram, name, help, labels, buckets)
+
+
+def render_metrics():
+    """Returns every registered metric in the Prometheus text format."""
+    lines = []
+    for metric in _metrics.values():
+        lines.extend(metric.expose())
+    return "\n".join(lines) + "\n"
+
+
+class RequestMetrics(object):
+
+    """Metrics of a single request.
+
+    Whatever a request runs, including callbacks it schedules and coroutines
+    it resumes after yielding, is run with its RequestMetrics as the current
+    one, so work can be attributed to the request that caused it. If the
+    request is profiled, its profiler is enabled for exactly that work, so
+    the profile covers the request from start to finish without including
+    other requests handled while it was waiting.
+
+    Attributes:
+        queries: Number of database queries made.
+        query_seconds: Total seconds spent waiting on database queries.
+        profiler: cProfile.Profile of the request, or None.
+        request_id: ID of the request, or None.
+        finished: Whether the request was finished.
+    """
+
+    def __init__(self):
+        """Constructs a RequestMetrics."""
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.profiler = None
+        self.request_id = None
+        self.finished = False
+        self._context = StackContext(lambda: self)
+        self._deactivate = None
+
+    def __enter__(self):
+        _requests.append(self)
+        if self.profiler and not self.finished:
+            self.profiler.enable()
+
+    def __exit__(self, type, value, traceback):
+        _requests.pop()
+        if self.profiler and not self.finished:
+            self.profiler.disable()
+
+            # Only one profiler can run at a time, so resume the one of the
+            # request this was run from, if any.
+            outer = current_request()
+            if outer and outer.profiler and not outer.finished:
+                outer.profiler.enable()
+
+    def run(self, fn, *args):
+        """Runs a function as part of the request.
+
+        Args:
+            fn: Function.
+            *args: Arguments to call it with.
+
+        Returns:
+            The function's return value.
+        """
+        with self._context as deactivate:
+            self._deactivate = deactivate
+            return fn(*args)
+
+    def finish(self):
+        """Stops attributing callbacks scheduled by the request to it, and
+        stops its profiler.
+
+        Background work the request started, like ingesting an uploaded bag,
+        then stops counting towards it.
+        """
+        self.finished = True
+        if self._deactivate:
+            self._deactivate()
+        if self.profiler:
+            self.profiler.disable()
+
+
+def current_request():
+    """Returns the RequestMetrics of the request being handled, or None."""
+    return _requests[-1] if _requests else None
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+
+"""Worker process pool."""
+
+import multiprocessing
+from tornado.options import options
+from concurrent.futures import ProcessPoolExecutor
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+_pool = None
+
+
+def pool_size():
+    """Returns the number of worker processes to use.
+
+    Defaults to one per core unless overridden by the --workers option.
+    """
+    return options.workers or multiprocessing.cpu_count()
+
+
+def get_pool():
+    """Returns the shared worker process pool, creating it on first use.
+
+    CPU-bound work such as image decoding and encoding should be submitted
+    here instead of being run on the IOLoop. The returned futures can be
+    yielded from coroutines directly.
+
+    Returns:
+        ProcessPoolExecutor.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=pool_size())
+    return _pool
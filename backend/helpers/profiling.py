@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+
+"""Request profiling."""
+
+import os
+import re
+import uuid
+import random
+import logging
+import cProfile
+from datetime import datetime
+from collections import deque
+from tornado.options import options
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+# Request header asking for a request to be profiled.
+PROFILE_HEADER = "X-Profile"
+
+# Request header identifying a request, which names its profile.
+REQUEST_ID_HEADER = "X-Request-Id"
+
+_log = None
+
+
+class ProfileLog(object):
+
+    """Most recent profiled requests.
+
+    The profiles of requests that are forgotten are deleted, so there are
+    never more profiles on disk than there are requests kept.
+
+    Attributes:
+        max_size: Maximum number of requests kept.
+    """
+
+    def __init__(self, max_size):
+        """Constructs a ProfileLog.
+
+        Args:
+            max_size: Maximum number of requests to keep.
+        """
+        self.max_size = max_size
+        self._entries = deque()
+
+    def add(self, entry):
+        """Adds a profiled request, forgetting the oldest if full.
+
+        Args:
+            entry: Dictionary describing the request, with its duration in
+                seconds as 'seconds' and the path of its profile, if saved,
+                as 'profile'.
+        """
+        self._entries.append(entry)
+        while len(self._entries) > self.max_size:
+            forgotten = self._entries.popleft()
+            if forgotten["profile"]:
+                try:
+                    os.remove(forgotten["profile"])
+                except OSError:
+                    pass
+
+    def slowest(self, limit):
+        """Returns the slowest profiled requests.
+
+        Args:
+            limit: Maximum number of requests.
+
+        Returns:
+            List of dictionaries describing the requests, slowest first.
+        """
+        entries = sorted(
+            self._entries, key=lambda entry: entry["seconds"], reverse=True
+        )
+        return entries[:limit]
+
+
+def get_profile_log():
+    """Returns the shared profile log, creating it on first use.
+
+    Returns:
+        ProfileLog.
+    """
+    global _log
+    if _log is None:
+        _log = ProfileLog(options.profile_history)
+    return _log
+
+
+def start_profiler(headers):
+    """Returns a profiler for a request if it should be profiled.
+
+    Requests are only profiled with --profile, and then either when they
+    have the X-Profile header or at random with --profile_rate.
+
+    Args:
+        headers: Request HTTPHeaders.
+
+    Returns:
+        cProfile.Profile, or None.
+    """
+    if not options.profile:
+        return None
+    if PROFILE_HEADER in headers or random.random() < options.profile_rate:
+        return cProfile.Profile()
+    return None
+
+
+def request_id(headers):
+    """Returns the ID of a request.
+
+    Args:
+        headers: Request HTTPHeaders.
+
+    Returns:
+        The X-Request-Id header if it is safe to use in a file name,
+        otherwise a new random ID.
+    """
+    value = headers.get(REQUEST_ID_HEADER, "")
+    if re.match(r"^[A-Za-z0-9_-]{1,64}$", value):
+        return value
+    return uuid.uuid4().hex
+
+
+def save_profile(profiler, route, request_id):
+    """Writes a request's profile to --profile_dir.
+
+    Profiles are named after the route and request ID, and the time they
+    were saved at so that requests given the same ID by clients don't
+    overwrite each other. They can be read with the pstats module, or any
+    tool that reads its format.
+
+    Args:
+        profiler: Stopped cProfile.Profile.
+        route: Name of the handler of the request.
+        request_id: ID of the request.
+
+    Returns:
+        Path of the profile, or None if it could not be written.
+    """
+    path = os.path.join(options.profile_dir, "{}-{}-{}.prof".format(
+        route, request_id, datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+    ))
+    try:
+        if not os.path.isdir(options.profile_dir):
+            os.makedirs(options.profile_dir)
+        profiler.dump_stats(path)
+    except (IOError, OSError):
+        logging.exception("Could not save profile to %s", path)
+        return None
+    return path
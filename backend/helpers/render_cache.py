@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+
+"""Rendered image cache."""
+
+import os
+import logging
+import hashlib
+from collections import OrderedDict
+from tornado.options import options
+from tornado.gen import coroutine, Return
+from concurrent.futures import ThreadPoolExecutor
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+# Bump this whenever the way frames are rendered changes, so that stale
+# renders and ETags are never reused.
+RENDER_VERSION = 1
+
+_cache = None
+
+
+class RenderCache(object):
+
+    """Size-bounded LRU cache of rendered images.
+
+    Renders are kept in memory, and optionally written through to a second
+    tier on disk which is also size-bounded. Since frames never change after
+    they are ingested, renders never need to be invalidated.
+
+    The disk tier is only ever touched by a thread of its own, so the IOLoop
+    never waits on it, and renders that can't be written to it are only
+    kept in memory.
+
+    Attributes:
+        max_bytes: Maximum number of bytes kept in memory.
+        path: Directory of the on-disk tier, or None.
+        max_disk_bytes: Maximum number of bytes kept on disk.
+        hits: Number of lookups served from memory.
+        disk_hits: Number of lookups served from disk.
+        misses: Number of lookups not found in either tier.
+        evictions: Number of renders evicted from memory.
+    """
+
+    def __init__(self, max_bytes, path=None, max_disk_bytes=0):
+        """Constructs a RenderCache.
+
+        Args:
+            max_bytes: Maximum number of bytes to keep in memory.
+            path: Directory of the on-disk tier, or None to disable it.
+            max_disk_bytes: Maximum number of bytes to keep on disk.
+        """
+        self.max_bytes = max_bytes
+        self.path = path
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._disk_bytes = 0
+        self._executor = None
+
+        if path:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+            if not os.path.isdir(path):
+                os.makedirs(path)
+            self._disk_bytes = sum(
+                os.path.getsize(os.path.join(path, f))
+                for f in os.listdir(path)
+            )
+
+    @staticmethod
+    def key(frame_id, **params):
+        """Returns the cache key of a render.
+
+        The key is also suitable as a strong ETag.
+
+        Args:
+            frame_id: Unique frame object ID.
+            params: Render parameters.
+
+        Returns:
+            Hex digest.
+        """
+        params = "&".join(
+            "{}={}".format(k, v) for k, v in sorted(params.items())
+        )
+        return hashlib.sha1("{}:{}?{}".format(
+            RENDER_VERSION, frame_id, params
+        )).hexdigest()
+
+    @coroutine
+    def get(self, key):
+        """Returns a cached render.
+
+        Args:
+            key: Cache key.
+
+        Returns:
+            Rendered byte string, or None if not cached.
+        """
+        data = self._entries.pop(key, None)
+        if data is not None:
+            self._entries[key] = data
+            self.hits += 1
+            raise Return(data)
+
+        if self.path:
+            data = yield self._executor.submit(self._read, key)
+            if data is not None:
+                self.disk_hits += 1
+                self._insert(key, data)
+                raise Return(data)
+
+        self.misses += 1
+        raise Return(None)
+
+    def put(self, key, data):
+        """Caches a render.
+
+        The render is written to disk in the background.
+
+        Args:
+            key: Cache key.
+            data: Rendered byte string.
+        """
+        self._insert(key, data)
+        if self.path:
+            self._executor.submit(self._write, key, data)
+
+    def stats(self):
+        """Returns a dictionary of cache statistics."""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": (
+                float(self.hits + self.disk_hits) / lookups
+                if lookups else 0.0
+            ),
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "disk_bytes": self._disk_bytes,
+            "max_disk_bytes": self.max_disk_bytes,
+        }
+
+    def _insert(self, key, data):
+        """Inserts a render in memory, evicting the least recently used."""
+        if len(data) > self.max_bytes:
+            return
+
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+
+        self._entries[key] = data
+        self._bytes += len(data)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.evictions += 1
+
+    def _file(self, key):
+        """Returns the path of a render on disk."""
+        return os.path.join(self.path, key)
+
+    def _read(self, key):
+        """Reads a render from disk, or returns None."""
+        try:
+            with open(self._file(key), "rb") as f:
+                data = f.read()
+
+            # Mark as recently used so it is pruned last.
+            os.utime(self._file(key), None)
+        except (IOError, OSError):
+            return None
+        return data
+
+    def _write(self, key, data):
+        """Writes a render to disk, pruning the oldest renders if needed."""
+        if len(data) > self.max_disk_bytes:
+            return
+
+        # Write to a temporary file first so readers never see partial data.
+        path = self._file(key)
+        tmp = path + ".tmp"
+        try:
+            old = os.path.getsize(path) if os.path.exists(path) else 0
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.rename(tmp, path)
+        except (IOError, OSError):
+            logging.exception("Could not write render to %s", path)
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        self._disk_bytes += len(data) - old
+
+        if self._disk_bytes > self.max_disk_bytes:
+            try:
+                self._prune()
+            except OSError:
+                logging.exception("Could not prune renders in %s", self.path)
+
+    def _prune(self):
+        """Deletes the least recently modified renders from disk until
+        under 90% of capacity.
+        """
+        files = []
+        for name in os.listdir(self.path):
+            path = os.path.join(self.path, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+
+        self._disk_bytes = sum(size for _, size, _ in files)
+        target = 0.9 * self.max_disk_bytes
+        for _, size, path in files:
+            if self._disk_bytes <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._disk_bytes -= size
+
+
+def get_render_cache():
+    """Returns the shared render cache, creating it on first use.
+
+    Returns:
+        RenderCache.
+    """
+    global _cache
+    if _cache is None:
+        _cache = RenderCache(
+            options.render_cache_size,
+            options.render_cache_dir or None,
+            options.render_cache_disk_size
+        )
+    return _cache
@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+
+"""Lens Backend Ingestion."""
+
+from writer import FrameWriter
+from jobqueue import IngestQueue, get_queue
+from sampler import DifferenceSampler, StrideSampler, create_sampler
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+__all__ = [
+    "DifferenceSampler", "FrameWriter", "IngestQueue", "StrideSampler",
+    "create_sampler", "get_queue"
+]
@@ -0,0 +1,327 @@
+# -*- coding: utf-8 -*-
+
+"""Resumable bag ingester."""
+
+import os
+import math
+import rosbag
+import logging
+from datetime import datetime
+from collections import deque
+from writer import FrameWriter
+from sampler import create_sampler
+from tornado.options import options
+from tornado.gen import coroutine, Return
+from tornado.ioloop import PeriodicCallback
+from helpers import counter, get_pool, pool_size
+from models import Feed, Frame, IngestJob, Loader
+from codec import ENCODE_SECONDS, get_codec, topic_codec
+from reader import IMAGE_MSG_TYPES, read_slice, scan_slice, time_slices
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+MESSAGES = counter(
+    "lens_ingest_messages_total",
+    "Image messages read from bags."
+)
+BYTES = counter(
+    "lens_ingest_bytes_total",
+    "Image bytes read from bags."
+)
+
+
+@coroutine
+def written(feed_id):
+    """Returns what was already written of a feed.
+
+    Args:
+        feed_id: Feed ObjectId.
+
+    Returns:
+        Tuple of (number of frames, recorded time of the last frame or None).
+    """
+    query = {"feed": feed_id}
+    count = yield Frame.objects.coll().find(query).count()
+    cursor = Frame.objects.coll().find(query, fields=["stamp"])
+    last = yield cursor.sort("stamp", -1).limit(1).to_list(None)
+    raise Return((count, last[0].get("stamp") if last else None))
+
+
+@coroutine
+def stopped(job):
+    """Cleans up after a job that stopped running in this process.
+
+    Args:
+        job: IngestJob that was cancelled or claimed by another process.
+    """
+    current = yield Loader().load(IngestJob, job._id)
+    if current and current.state == "cancelled":
+        logging.warn("Cancelled ingestion of %s", job.path)
+        if os.path.exists(job.path):
+            os.remove(job.path)
+    else:
+        logging.warn("Lost ingest job of %s", job.path)
+
+
+class Heartbeat(object):
+
+    """Renews an ingest job's heartbeat in the background.
+
+    Attributes:
+        owned: Whether the job was still running and owned by this process
+            at every beat so far.
+    """
+
+    def __init__(self, job, interval):
+        """Constructs a Heartbeat.
+
+        Args:
+            job: IngestJob owned by this process.
+            interval: Seconds between beats.
+        """
+        self.owned = True
+        self._job = job
+        self._beating = False
+        self._callback = PeriodicCallback(self.beat, interval * 1000)
+
+    def start(self):
+        """Starts beating."""
+        self._callback.start()
+
+    def stop(self):
+        """Stops beating."""
+        self._callback.stop()
+
+    @coroutine
+    def beat(self):
+        """Renews the job's heartbeat."""
+        # Beats don't pile up if the database is slow.
+        if self._beating:
+            return
+        self._beating = True
+        try:
+            owned = yield self._job.checkpoint()
+            self.owned = self.owned and owned
+        except Exception:
+            logging.exception("Could not renew heartbeat of %s",
+                              self._job.path)
+        finally:
+            self._beating = False
+
+
+@coroutine
+def ingest(job):
+    """Writes the image frames of a bag to the database.
+
+    The bag is split into time slices that are read in parallel by the
+    worker process pool, with only one more slice in flight than there are
+    workers so that memory stays bounded while every worker is kept busy.
+    Each slice is read twice. It is first scanned for the summaries the
+    --sampler needs, and the messages to keep are picked here in recorded
+    order, so what is kept doesn't depend on where the bag was split. The
+    messages kept are then read again and encoded with their feed's codec,
+    and their frames are written to the database in batches, slice after
+    slice, so frames are written in recorded order on every feed.
+
+    The job's heartbeat is renewed every --ingest_checkpoint_interval seconds
+    in the background, however long a slice takes to read, so the job is
+    never mistaken for abandoned and resumed elsewhere while it is running.
+    The recorded time of the last frame written on each topic is checkpointed
+    after every slice. When resuming, messages up to there are skipped, as
+    are any frames that were written after the last checkpoint, so no frame
+    is ever written twice.
+
+    Once a heartbeat finds the job cancelled, or owned by another process,
+    no more frames are written. If a slice is being waited on, ingestion
+    stops once the worker has finished reading it.
+
+    Args:
+        job: IngestJob owned by this process.
+    """
+    yield Loader().resolve([job])
+    bag = rosbag.Bag(job.path)
+    topics = bag.get_type_and_topic_info().topics
+    image_topics = [
+        topic for topic, info in topics.items()
+        if info.msg_type in IMAGE_MSG_TYPES
+    ]
+
+    if job.total is None:
+        total = sum(topics[topic].message_count for topic in image_topics)
+        start = bag.get_start_time() if total else 0
+        end = bag.get_end_time() if total else 0
+        yield job.checkpoint(
+            size=os.path.getsize(job.path),
+            total=total,
+            start_stamp=start,
+            end_stamp=end,
+            run_stamp=start
+        )
+    bag.close()
+
+    # Pick up from what was already written.
+    feeds = {}
+    done = {}
+    cursor = Feed.objects.coll().find({"bag": job.bag._id})
+    for doc in (yield cursor.to_list(None)):
+        feed = Feed.from_son(doc)
+        count, stamp = yield written(feed._id)
+        feeds[feed.topic] = feed
+        done[feed.topic] = {"stamp": stamp, "frames": count}
+
+    # Messages up to the earliest of the last frames written on each topic
+    # can be skipped altogether.
+    start = job.start_stamp
+    stamps = [done.get(topic, {}).get("stamp") for topic in image_topics]
+    if image_topics and None not in stamps:
+        start = min(stamps)
+    frames = sum(d["frames"] for d in done.values())
+    yield job.checkpoint(
+        topics=done,
+        frames=frames,
+        run_frames=frames,
+        run_stamp=start
+    )
+
+    def checkpoint(**values):
+        topics = {}
+        for topic, feed in feeds.items():
+            count, last = writer.progress.get(feed._id, (0, None))
+            previous = done.get(topic, {"stamp": None, "frames": 0})
+            topics[topic] = {
+                "stamp": last.stamp if last else previous["stamp"],
+                "frames": previous["frames"] + count
+            }
+        return job.checkpoint(
+            topics=topics,
+            frames=sum(t["frames"] for t in topics.values()),
+            messages=messages,
+            bytes=nbytes,
+            **values
+        )
+
+    # Split what is left of the bag into slices of about
+    # --ingest_slice_size bytes, assuming a steady data rate, with at least
+    # one per worker.
+    slices = deque()
+    if image_topics:
+        remaining = job.size
+        if job.end_stamp > job.start_stamp:
+            remaining *= ((job.end_stamp - start) /
+                          (job.end_stamp - job.start_stamp))
+        count = int(math.ceil(remaining / options.ingest_slice_size))
+        count = max(count, pool_size())
+        slices.extend(time_slices(start, job.end_stamp, count))
+
+    # Feeds keep the codec they were first ingested with.
+    codecs = dict(
+        (topic, get_codec(
+            feeds[topic].codec if topic in feeds else topic_codec(topic)
+        ))
+        for topic in image_topics
+    )
+
+    # Messages are kept by a single sampler in recorded order, and the frame
+    # limit per topic has to count frames already written, so both are
+    # decided here instead of by each slice's worker.
+    sampler = create_sampler()
+    max_frames = sampler.max_frames
+    sampler.max_frames = 0
+    counts = dict((topic, d["frames"]) for topic, d in done.items())
+    skip = dict(
+        (topic, d["stamp"]) for topic, d in done.items()
+        if d["stamp"] is not None
+    )
+
+    def pick(messages):
+        keep = []
+        for i, (topic, stamp, summary) in enumerate(messages):
+            if max_frames and counts.get(topic, 0) >= max_frames:
+                continue
+            if sampler.keep(topic, stamp, summary):
+                counts[topic] = counts.get(topic, 0) + 1
+                keep.append(i)
+        return keep
+
+    writer = FrameWriter(options.batch_size, options.batch_bytes)
+    scanning = deque()
+    reading = deque()
+    max_pending = pool_size() + 1
+    messages = job.messages
+    nbytes = job.bytes
+    heartbeat = Heartbeat(job, options.ingest_checkpoint_interval)
+    heartbeat.start()
+    try:
+        while slices or scanning or reading:
+            # Keep every worker busy scanning or reading a slice.
+            while slices and len(scanning) + len(reading) < max_pending:
+                time_slice = slices.popleft()
+                scanning.append((time_slice, get_pool().submit(
+                    scan_slice, job.path, image_topics, time_slice, skip,
+                    sampler
+                )))
+
+            # Pick the messages to keep of the oldest slice scanned, in
+            # order, and have them read and encoded.
+            if scanning and (not reading or scanning[0][1].done()):
+                time_slice, future = scanning.popleft()
+                scanned, read_bytes = yield future
+                messages += len(scanned)
+                nbytes += read_bytes
+                MESSAGES.inc(amount=len(scanned))
+                BYTES.inc(amount=read_bytes)
+                keep = pick(scanned)
+                reading.append((time_slice, get_pool().submit(
+                    read_slice, job.path, image_topics, time_slice, skip,
+                    keep, codecs
+                ) if keep else None))
+                continue
+
+            # Write the oldest slice's frames, so frames are written in
+            # order.
+            time_slice, future = reading.popleft()
+            encoded = (yield future) if future else []
+            for frame in encoded:
+                topic, seq, stamp, encoding, img, shape, codec, seconds = frame
+                ENCODE_SECONDS.observe(seconds, (codec,))
+                if not heartbeat.owned:
+                    yield stopped(job)
+                    return
+
+                if topic in feeds:
+                    feed = feeds[topic]
+                else:
+                    logging.info("Making frames for topic: %s", topic)
+                    feed = yield Feed.from_topic(job.bag, topic)
+                    feeds[topic] = feed
+
+                frame = yield Frame.from_encoded(
+                    feed, seq, encoding, img, shape, stamp, codec
+                )
+                yield writer.add(frame)
+
+            end = time_slice[1]
+            stamp = end[0] + end[1] / 1e9 if end else job.end_stamp
+            owned = yield checkpoint(stamp=stamp)
+            if not owned:
+                yield stopped(job)
+                return
+    finally:
+        heartbeat.stop()
+
+    yield writer.flush()
+    logging.info("Wrote %d frames from %d messages", writer.written, messages)
+
+    owned = yield checkpoint(
+        state="done",
+        stamp=job.end_stamp,
+        finished=datetime.utcnow()
+    )
+
+    # Delete temporary file.
+    if owned:
+        logging.warn("Deleting %s", job.path)
+        os.remove(job.path)
+    else:
+        yield stopped(job)
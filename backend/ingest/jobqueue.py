@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+
+"""Ingest job queue."""
+
+import os
+import uuid
+import logging
+from ingester import ingest
+from models import IngestJob
+from datetime import datetime
+from tornado.options import options
+from tornado.gen import coroutine, Return
+from tornado.ioloop import IOLoop, PeriodicCallback
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+
+class IngestQueue(object):
+
+    """Runs queued ingest jobs, a bounded number at a time.
+
+    Jobs are queued in the database, so any number of backend or worker
+    processes can share the queue. Each process claims jobs atomically until
+    it is running as many as its concurrency allows, and polls for more
+    whenever one finishes and every poll_interval seconds. Running jobs that
+    stop being checkpointed, e.g. because their process was stopped, are
+    claimed again and resumed.
+
+    Attributes:
+        concurrency: Maximum number of jobs run at once by this process.
+        by_priority: Whether to run jobs by priority, or in the order they
+            were queued.
+        timeout: Seconds without a checkpoint after which a running job is
+            considered abandoned.
+        owner: Identifies this process as the owner of the jobs it runs.
+        running: Dictionary of running IngestJobs by ObjectId.
+    """
+
+    def __init__(self, concurrency, by_priority=True, timeout=60):
+        """Constructs an IngestQueue.
+
+        Args:
+            concurrency: Maximum number of jobs to run at once.
+            by_priority: Whether to run jobs by priority, or in the order
+                they were queued.
+            timeout: Seconds without a checkpoint after which a running job
+                is considered abandoned.
+        """
+        self.concurrency = concurrency
+        self.by_priority = by_priority
+        self.timeout = timeout
+        self.owner = uuid.uuid4().hex
+        self.running = {}
+        self._polling = False
+
+    def start(self, poll_interval):
+        """Starts running jobs in the background.
+
+        Args:
+            poll_interval: Seconds between polls for new jobs.
+        """
+        IOLoop.current().spawn_callback(self.poll)
+        PeriodicCallback(self.poll, poll_interval * 1000).start()
+
+    @coroutine
+    def poll(self):
+        """Claims and starts jobs until enough are running."""
+        # Only one poll at a time, or both could claim the last free slot.
+        if self._polling:
+            return
+        self._polling = True
+        try:
+            while len(self.running) < self.concurrency:
+                job = yield IngestJob.claim(
+                    self.owner,
+                    self.timeout,
+                    exclude=self.running,
+                    by_priority=self.by_priority
+                )
+                if not job:
+                    break
+                self.running[job._id] = job
+                IOLoop.current().spawn_callback(self.run, job)
+        finally:
+            self._polling = False
+
+    @coroutine
+    def run(self, job):
+        """Runs a job, marking it as failed if anything goes wrong.
+
+        Args:
+            job: Claimed IngestJob.
+        """
+        logging.info("Ingesting %s", job.path)
+        try:
+            yield ingest(job)
+        except Exception as e:
+            logging.exception("Could not ingest %s", job.path)
+            yield job.checkpoint(
+                state="failed",
+                error=str(e),
+                finished=datetime.utcnow()
+            )
+        finally:
+            del self.running[job._id]
+            IOLoop.current().spawn_callback(self.poll)
+
+    @coroutine
+    def enqueue(self, bag, path, priority=0):
+        """Queues a bag to be ingested.
+
+        Args:
+            bag: Bag the file was uploaded as.
+            path: Path to the ROS bag file.
+            priority: Jobs with a higher priority are run first.
+
+        Returns:
+            IngestJob.
+        """
+        job = yield IngestJob.from_bag(bag, path, priority)
+        if self.concurrency:
+            IOLoop.current().spawn_callback(self.poll)
+        raise Return(job)
+
+    @coroutine
+    def cancel(self, job_id):
+        """Cancels a job that is not over yet.
+
+        Queued jobs are cancelled right away, while running jobs stop at
+        their next checkpoint.
+
+        Args:
+            job_id: IngestJob ObjectId.
+
+        Returns:
+            Whether the job was cancelled.
+        """
+        job = yield IngestJob.cancel(job_id)
+        if not job:
+            raise Return(False)
+
+        # Running jobs clean up after themselves once they notice.
+        if job.state == "queued" and os.path.exists(job.path):
+            os.remove(job.path)
+        raise Return(True)
+
+
+_queue = None
+
+
+def get_queue():
+    """Returns the ingest job queue configured by the command-line options.
+
+    Returns:
+        IngestQueue.
+    """
+    global _queue
+    if _queue is None:
+        _queue = IngestQueue(
+            options.ingest_concurrency,
+            options.ingest_schedule == "priority",
+            options.ingest_timeout
+        )
+    return _queue
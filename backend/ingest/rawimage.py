@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+"""Serialized ROS image parsing."""
+
+import rospy
+import struct
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+_UINT32 = struct.Struct("<I")
+_HEADER = struct.Struct("<III")
+_SIZE = struct.Struct("<II")
+_LAYOUT = struct.Struct("<BII")
+
+
+def _string(serialized, offset):
+    """Unpacks a string.
+
+    Args:
+        serialized: Serialized message.
+        offset: Offset of the string.
+
+    Returns:
+        Tuple of (string, offset past the string).
+    """
+    length, = _UINT32.unpack_from(serialized, offset)
+    offset += _UINT32.size
+    return serialized[offset:offset + length], offset + length
+
+
+def _header(serialized):
+    """Unpacks the std_msgs/Header a message starts with.
+
+    Args:
+        serialized: Serialized message.
+
+    Returns:
+        Tuple of (RawHeader, offset past the header).
+    """
+    seq, secs, nsecs = _HEADER.unpack_from(serialized, 0)
+    frame_id, offset = _string(serialized, _HEADER.size)
+    return RawHeader(seq, rospy.Time(secs, nsecs), frame_id), offset
+
+
+class RawHeader(object):
+
+    """std_msgs/Header of a RawImage.
+
+    Attributes:
+        seq: Sequence number.
+        stamp: Time the image was taken.
+        frame_id: Frame the image was taken in.
+    """
+
+    __slots__ = ["seq", "stamp", "frame_id"]
+
+    def __init__(self, seq, stamp, frame_id):
+        """Constructs a RawHeader."""
+        self.seq = seq
+        self.stamp = stamp
+        self.frame_id = frame_id
+
+
+class RawImage(object):
+
+    """ROS sensor_msgs/Image parsed from its serialized form.
+
+    Only the fixed fields are unpacked. The pixels are left in place in the
+    serialized message as a read-only buffer, so reading an image neither
+    deserializes nor copies it. This has the same attributes as a
+    sensor_msgs/Image, so it can be used anywhere one is only read.
+
+    Attributes:
+        header: RawHeader.
+        height: Image height in pixels.
+        width: Image width in pixels.
+        encoding: ROS image encoding.
+        is_bigendian: Whether the pixels are big endian.
+        step: Length of a row in bytes.
+        data: Buffer of the pixels.
+    """
+
+    __slots__ = [
+        "header", "height", "width", "encoding", "is_bigendian", "step",
+        "data", "_serialized", "_pytype"
+    ]
+
+    def __init__(self, serialized, pytype):
+        """Constructs a RawImage.
+
+        Args:
+            serialized: Serialized sensor_msgs/Image.
+            pytype: sensor_msgs/Image message class.
+        """
+        self._serialized = serialized
+        self._pytype = pytype
+        self.header, offset = _header(serialized)
+
+        self.height, self.width = _SIZE.unpack_from(serialized, offset)
+        self.encoding, offset = _string(serialized, offset + _SIZE.size)
+
+        self.is_bigendian, self.step, length = _LAYOUT.unpack_from(
+            serialized, offset
+        )
+        self.data = buffer(serialized, offset + _LAYOUT.size, length)
+
+    def to_message(self):
+        """Returns the fully deserialized sensor_msgs/Image."""
+        msg = self._pytype()
+        msg.deserialize(self._serialized)
+        return msg
+
+
+class RawCompressedImage(object):
+
+    """ROS sensor_msgs/CompressedImage parsed from its serialized form.
+
+    Like RawImage, the compressed image is left in place in the serialized
+    message as a read-only buffer.
+
+    Attributes:
+        header: RawHeader.
+        format: Format of the compressed image, as set by image_transport.
+        data: Buffer of the compressed image.
+    """
+
+    __slots__ = ["header", "format", "data"]
+
+    def __init__(self, serialized):
+        """Constructs a RawCompressedImage.
+
+        Args:
+            serialized: Serialized sensor_msgs/CompressedImage.
+        """
+        self.header, offset = _header(serialized)
+        self.format, offset = _string(serialized, offset)
+        length, = _UINT32.unpack_from(serialized, offset)
+        self.data = buffer(serialized, offset + _UINT32.size, length)
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+
+"""Parallel bag reader."""
+
+import time
+import rospy
+import rosbag
+from rawimage import RawCompressedImage, RawImage
+from models.frame import IMAGE_TYPES, encode_message
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+# ROS message types of the image topics that are read.
+IMAGE_MSG_TYPES = ["sensor_msgs/Image", "sensor_msgs/CompressedImage"]
+
+# Last bag opened by this worker process, as (path, rosbag.Bag), so that its
+# index is only read once for all the slices a worker reads.
+_bag = None
+
+
+def open_bag(path):
+    """Returns a ROS bag opened by this process.
+
+    Args:
+        path: Path to the ROS bag file.
+
+    Returns:
+        rosbag.Bag.
+    """
+    global _bag
+    if _bag is None or _bag[0] != path:
+        if _bag is not None:
+            _bag[1].close()
+        _bag = (path, rosbag.Bag(path))
+    return _bag[1]
+
+
+def time_slices(start, end, count):
+    """Splits a time range into consecutive slices of equal duration.
+
+    Args:
+        start: Start of the range in seconds.
+        end: End of the range in seconds, inclusive.
+        count: Number of slices.
+
+    Returns:
+        List of (start, end) tuples of (secs, nsecs), where each end is
+        exclusive except for the last one, which is None.
+    """
+    count = max(1, count)
+
+    # Work in nanoseconds to split exactly, and widen the range by a
+    # microsecond to make up for the precision of the times in seconds.
+    start = int(start * 1e9) - 1000
+    end = int(end * 1e9) + 1000
+    bounds = [start + (end - start) * i // count for i in range(count)]
+    bounds = [divmod(bound, 10 ** 9) for bound in bounds] + [None]
+    return zip(bounds[:-1], bounds[1:])
+
+
+def slice_messages(path, topics, time_slice, done):
+    """Yields the image messages of a slice of a bag in recorded order.
+
+    Messages are read serialized and only their fixed fields are parsed, so
+    their pixels can be used straight from the bag's buffer.
+
+    Args:
+        path: Path to the ROS bag file.
+        topics: List of image topics to read.
+        time_slice: (start, end) as returned by time_slices().
+        done: Dictionary of the recorded time in seconds of the last frame
+            already written by topic, to skip messages up to.
+
+    Yields:
+        Tuples of (topic, RawImage or RawCompressedImage, recorded time in
+        seconds).
+    """
+    start, end = time_slice
+    start = rospy.Time(*start)
+    end = rospy.Time(*end) if end else None
+
+    bag = open_bag(path)
+    for topic, raw, t in bag.read_messages(topics=topics, start_time=start,
+                                           end_time=end, raw=True):
+        # Both ends are inclusive when reading, so leave the end to the next
+        # slice.
+        if end is not None and t >= end:
+            continue
+
+        stamp = t.to_sec()
+        last_stamp = done.get(topic)
+        if last_stamp is not None and stamp <= last_stamp:
+            continue
+
+        datatype, serialized, _, _, pytype = raw
+        if datatype == "sensor_msgs/CompressedImage":
+            yield topic, RawCompressedImage(serialized), stamp
+        else:
+            yield topic, RawImage(serialized, pytype), stamp
+
+
+def scan_slice(path, topics, time_slice, done, sampler):
+    """Summarizes the image messages of a slice of a bag for a sampler.
+
+    This is kept at module level so it can be pickled and run in a worker
+    process, off the IOLoop. Only the summaries are sent back, so that which
+    messages to keep can be decided in recorded order across every slice
+    without the messages themselves going through the IOLoop's process.
+
+    Args:
+        path: Path to the ROS bag file.
+        topics: List of image topics to read.
+        time_slice: (start, end) as returned by time_slices().
+        done: Dictionary of the recorded time in seconds of the last frame
+            already written by topic, to skip messages up to.
+        sampler: Sampler to summarize the messages for.
+
+    Returns:
+        Tuple of (list of messages as tuples of (topic, recorded time in
+        seconds, summary) in recorded order, number of image bytes read).
+    """
+    messages = []
+    nbytes = 0
+    for topic, msg, stamp in slice_messages(path, topics, time_slice, done):
+        nbytes += len(msg.data)
+        messages.append((topic, stamp, sampler.summarize(msg)))
+    return messages, nbytes
+
+
+def read_slice(path, topics, time_slice, done, keep, codecs):
+    """Reads and encodes the image messages kept of a slice of a bag.
+
+    This is kept at module level so it can be pickled and run in a worker
+    process, off the IOLoop. Messages are read from the bag by the worker
+    itself, so that neither raw messages nor their deserialization have to
+    go through the IOLoop's process.
+
+    The pixels are encoded straight from the bag's buffer. Only the messages
+    kept with an encoding that needs CvBridge are deserialized. Compressed
+    images are kept as they are, and are skipped if they are not JPEGs or
+    PNGs.
+
+    Args:
+        path: Path to the ROS bag file.
+        topics: List of image topics to read.
+        time_slice: (start, end) as returned by time_slices().
+        done: Dictionary of the recorded time in seconds of the last frame
+            already written by topic, to skip messages up to.
+        keep: Sorted list of the indices of the messages to encode, in the
+            order they are returned by scan_slice().
+        codecs: Dictionary of the codec to encode images with by topic.
+
+    Returns:
+        List of encoded frames in recorded order as tuples of (topic, seq,
+        recorded time in seconds, ROS image encoding, encoded image, image
+        shape, codec, seconds taken to encode).
+    """
+    frames = []
+    keep = set(keep)
+    last = max(keep) if keep else -1
+    messages = slice_messages(path, topics, time_slice, done)
+    for i, (topic, msg, stamp) in enumerate(messages):
+        if i > last:
+            break
+        if i not in keep:
+            continue
+
+        if isinstance(msg, RawImage) and msg.encoding not in IMAGE_TYPES:
+            msg = msg.to_message()
+        encode_start = time.time()
+        encoded = encode_message(msg, codecs[topic])
+        if encoded is None:
+            continue
+
+        codec, img, encoding, shape = encoded
+        frames.append((
+            topic, msg.header.seq, stamp, encoding, img, shape, codec,
+            time.time() - encode_start
+        ))
+
+    return frames
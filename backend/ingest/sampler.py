@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+
+"""Frame samplers."""
+
+import cv2
+import numpy as np
+from tornado.options import options
+from models.frame import compressed_image, is_compressed
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+
+class Sampler(object):
+
+    """Base frame sampler.
+
+    Decides which image messages of a bag are worth keeping as frames, and
+    keeps at most max_frames per topic.
+
+    Messages are summarized by summarize() as they are read, which may be
+    done in worker processes, while keep() is called with the summaries of
+    every message of the bag in recorded order, so decisions never depend on
+    how the bag was split up to be read.
+
+    Attributes:
+        max_frames: Maximum number of frames kept per topic, 0 for no limit.
+        seen: Number of messages seen.
+        kept: Number of messages kept.
+    """
+
+    def __init__(self, max_frames=0):
+        """Constructs a Sampler.
+
+        Args:
+            max_frames: Maximum number of frames kept per topic, 0 for no
+                limit.
+        """
+        self.max_frames = max_frames
+        self.seen = 0
+        self.kept = 0
+        self._counts = {}
+
+    def summarize(self, msg):
+        """Returns what the sampler needs to know of a message to decide
+        whether to keep it.
+
+        Args:
+            msg: ROS sensor_msgs/Image or CompressedImage message.
+
+        Returns:
+            Picklable summary of the message, or None.
+        """
+        return None
+
+    def keep(self, topic, t, summary):
+        """Returns whether a message should be kept.
+
+        Args:
+            topic: ROS topic name.
+            t: Time the message was recorded at in seconds.
+            summary: Summary of the message returned by summarize().
+
+        Returns:
+            Whether to keep the message.
+        """
+        self.seen += 1
+        count = self._counts.get(topic, 0)
+        if self.max_frames and count >= self.max_frames:
+            return False
+        if not self.accept(topic, t, summary):
+            return False
+
+        self._counts[topic] = count + 1
+        self.kept += 1
+        return True
+
+    def accept(self, topic, t, summary):
+        """Returns whether a message should be kept, ignoring the limit.
+
+        Args:
+            topic: ROS topic name.
+            t: Time the message was recorded at in seconds.
+            summary: Summary of the message returned by summarize().
+
+        Returns:
+            Whether to keep the message.
+        """
+        raise NotImplementedError
+
+
+class StrideSampler(Sampler):
+
+    """Keeps every stride-th message of each topic regardless of content."""
+
+    name = "stride"
+
+    def __init__(self, stride, max_frames=0):
+        """Constructs a StrideSampler.
+
+        Args:
+            stride: Number of messages between kept messages.
+            max_frames: Maximum number of frames kept per topic, 0 for no
+                limit.
+        """
+        super(StrideSampler, self).__init__(max_frames)
+        self.stride = max(1, stride)
+        self._seen = {}
+
+    def accept(self, topic, t, summary):
+        """Returns whether a message is a stride-th message of its topic."""
+        seen = self._seen.get(topic, 0) + 1
+        self._seen[topic] = seen
+        return seen % self.stride == 0
+
+
+class DifferenceSampler(Sampler):
+
+    """Drops messages that look the same as the last one kept.
+
+    Each image is reduced to a small grayscale thumbnail by averaging a grid
+    of pixels sampled from each block, and is kept only if the mean absolute
+    difference from the thumbnail of the last message kept on the same
+    topic, with intensities scaled to [0, 1], is at least threshold.
+    Messages less than min_gap seconds after the last one kept are dropped
+    without being compared.
+
+    Compressed images have to be decoded to be summarized, which is the most
+    expensive part of sampling compressed topics.
+    """
+
+    name = "difference"
+
+    # Side of the thumbnails compared, in pixels.
+    SIZE = 32
+
+    # Side of the grid of pixels averaged per thumbnail pixel, so the cost
+    # of a thumbnail doesn't grow with the image's resolution.
+    SAMPLES = 4
+
+    def __init__(self, threshold, min_gap=0, max_frames=0):
+        """Constructs a DifferenceSampler.
+
+        Args:
+            threshold: Minimum difference from the last message kept,
+                between 0 and 1.
+            min_gap: Minimum number of seconds between messages kept.
+            max_frames: Maximum number of frames kept per topic, 0 for no
+                limit.
+        """
+        super(DifferenceSampler, self).__init__(max_frames)
+        self.threshold = threshold
+        self.min_gap = min_gap
+        self._last = {}
+
+    @staticmethod
+    def _dtype(encoding):
+        """Returns the NumPy type of a channel of a ROS image encoding."""
+        if "32F" in encoding:
+            return np.dtype(np.float32)
+        if "16" in encoding:
+            return np.dtype(np.uint16)
+        return np.dtype(np.uint8)
+
+    @classmethod
+    def pixels(cls, msg):
+        """Returns the pixels of an image.
+
+        Args:
+            msg: ROS sensor_msgs/Image or CompressedImage message.
+
+        Returns:
+            Array of shape (height, width, channels), or None if the image is
+            empty or can't be decoded.
+        """
+        if is_compressed(msg):
+            compressed = compressed_image(msg)
+            if compressed is None:
+                return
+            img = cv2.imdecode(
+                np.frombuffer(compressed[1], np.uint8),
+                cv2.CV_LOAD_IMAGE_GRAYSCALE
+            )
+            return img.reshape(img.shape + (1,)) if img is not None else None
+
+        if not msg.width or not msg.height:
+            return
+
+        dtype = cls._dtype(msg.encoding)
+        if msg.is_bigendian:
+            dtype = dtype.newbyteorder(">")
+        channels = max(1, msg.step // (msg.width * dtype.itemsize))
+
+        # Rows may be padded past the last pixel.
+        img = np.frombuffer(msg.data, dtype=dtype, count=(
+            msg.height * msg.step // dtype.itemsize
+        )).reshape(msg.height, -1)[:, :msg.width * channels]
+        return img.reshape(msg.height, msg.width, channels)
+
+    @classmethod
+    def thumbnail(cls, msg):
+        """Returns the grayscale thumbnail of an image.
+
+        Args:
+            msg: ROS sensor_msgs/Image or CompressedImage message.
+
+        Returns:
+            Thumbnail as a 2D array with values in [0, 1], or None if the
+            image is empty or can't be decoded.
+        """
+        img = cls.pixels(msg)
+        if img is None or not img.size:
+            return
+
+        # Strided views don't copy any pixels.
+        height, width = img.shape[:2]
+        img = img[::max(1, height // (cls.SIZE * cls.SAMPLES)),
+                  ::max(1, width // (cls.SIZE * cls.SAMPLES))]
+        height, width, channels = img.shape
+        dtype = img.dtype
+
+        # Average blocks of pixels and channels.
+        rows = np.linspace(0, height, min(cls.SIZE, height) + 1)
+        cols = np.linspace(0, width, min(cls.SIZE, width) + 1)
+        rows = rows[:-1].astype(np.intp)
+        cols = cols[:-1].astype(np.intp)
+        sums = np.add.reduceat(img.astype(np.float32), rows, axis=0)
+        sums = np.add.reduceat(sums, cols, axis=1).sum(axis=2)
+        counts = np.outer(
+            np.diff(np.append(rows, height)),
+            np.diff(np.append(cols, width))
+        ) * channels
+        thumb = (sums / counts).astype(np.float32)
+
+        # Scale intensities to [0, 1]. Deeper images, like depth maps, rarely
+        # span their whole range, so they are scaled by their own maximum.
+        if dtype.itemsize == 1:
+            scale = np.iinfo(dtype).max
+        else:
+            thumb = np.nan_to_num(thumb)
+            scale = np.abs(thumb).max()
+        if scale:
+            thumb /= scale
+        return thumb
+
+    def summarize(self, msg):
+        """Returns the thumbnail of a message's image."""
+        return self.thumbnail(msg)
+
+    def accept(self, topic, t, thumb):
+        """Returns whether a message differs enough from the last one kept."""
+        last = self._last.get(topic)
+        if last and t - last[0] < self.min_gap:
+            return False
+
+        if thumb is None:
+            return False
+        if last and last[1].shape == thumb.shape:
+            if np.abs(thumb - last[1]).mean() < self.threshold:
+                return False
+
+        self._last[topic] = (t, thumb)
+        return True
+
+
+def create_sampler(name=None):
+    """Returns a new frame sampler configured by the command-line options.
+
+    Args:
+        name: Sampler name, defaults to the one set by --sampler.
+
+    Returns:
+        Sampler.
+
+    Raises:
+        ValueError: If the sampler name is unknown.
+    """
+    name = name or options.sampler
+    if name == StrideSampler.name:
+        return StrideSampler(options.sample_stride, options.sample_max_frames)
+    elif name == DifferenceSampler.name:
+        return DifferenceSampler(
+            options.sample_threshold,
+            options.sample_min_gap,
+            options.sample_max_frames
+        )
+    raise ValueError("Unknown sampler: {}".format(name))
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+"""Batching frame writer."""
+
+from models import Frame
+from helpers import counter
+from storage import get_store
+from tornado.gen import coroutine
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+FRAMES = counter(
+    "lens_ingest_frames_total",
+    "Frames written by ingestion."
+)
+
+
+class FrameWriter(object):
+
+    """Buffers frames per feed and writes them with bulk inserts.
+
+    A feed's buffer is flushed once it holds batch_size frames, and every
+    buffer is flushed once max_bytes of in-document image data is held in
+    total. Since add() does not return until any flush it triggers is done, a
+    producer that yields on it can never get more than one batch ahead of the
+    database.
+
+    Attributes:
+        batch_size: Maximum number of frames per bulk insert.
+        max_bytes: Maximum number of image bytes buffered across all feeds.
+        written: Number of frames written so far.
+        progress: Dictionary of (number of frames written, last Frame
+            written) by feed ObjectId.
+    """
+
+    def __init__(self, batch_size, max_bytes):
+        """Constructs a FrameWriter.
+
+        Args:
+            batch_size: Maximum number of frames per bulk insert.
+            max_bytes: Maximum number of image bytes to buffer.
+        """
+        self.batch_size = max(1, batch_size)
+        self.max_bytes = max_bytes
+        self.written = 0
+        self.progress = {}
+        self._buffers = {}
+        self._bytes = 0
+
+    @staticmethod
+    def _size(frame):
+        """Returns the number of image bytes held in memory by a frame."""
+        return len(frame.data) if frame.data else 0
+
+    @coroutine
+    def add(self, frame):
+        """Buffers a frame, flushing if a threshold is hit.
+
+        Args:
+            frame: Unsaved Frame.
+        """
+        buf = self._buffers.setdefault(frame.feed._id, [])
+        buf.append(frame)
+        self._bytes += self._size(frame)
+
+        if self._bytes >= self.max_bytes:
+            yield self.flush()
+        elif len(buf) >= self.batch_size:
+            yield self.flush(frame.feed._id)
+
+    @coroutine
+    def flush(self, feed_id=None):
+        """Writes buffered frames to the database.
+
+        Args:
+            feed_id: Feed ObjectId to flush, or None to flush every feed.
+        """
+        if feed_id is None:
+            feed_ids = list(self._buffers)
+        else:
+            feed_ids = [feed_id]
+
+        for feed_id in feed_ids:
+            frames = self._buffers.pop(feed_id, None)
+            if not frames:
+                continue
+
+            self._bytes -= sum(self._size(f) for f in frames)
+
+            # Make sure images in an external store are on disk before any
+            # frame refers to them.
+            yield get_store().sync()
+            yield Frame.objects.bulk_insert(frames)
+            self.written += len(frames)
+            FRAMES.inc(amount=len(frames))
+            count, _ = self.progress.get(feed_id, (0, None))
+            self.progress[feed_id] = (count + len(frames), frames[-1])
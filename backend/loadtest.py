@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+
+"""Lens Backend Load Test.
+
+Simulates annotators running the frame.js cycle against a backend, to find
+how many can be served at once before latency becomes unacceptable. Each
+annotator waits for its previous request before making the next one, so
+load grows with the number of annotators.
+
+A separate database is seeded with synthetic bags before each run, and a
+backend is started on it unless --loadtest_url points at one already
+running on that database. Every document in that database is deleted, so
+it must not be the one set by --db.
+
+Usage:
+    python loadtest.py [--loadtest_annotators=1,5,10,20]
+        [--loadtest_duration=30] [--loadtest_db=lens_loadtest]
+        [--loadtest_output=results.json]
+
+Latency percentiles are reported per endpoint along with throughput and the
+number of frames handed to, or annotated by, more than one annotator. The
+load test fails if any frame was handed to more than one annotator.
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import subprocess
+from app import options
+from motorengine import connect
+from tornado.ioloop import IOLoop
+from tornado.options import define
+from tornado.httpclient import AsyncHTTPClient
+from tornado.gen import coroutine, Return, sleep
+from benchmarks.payloads import parse_resolution
+from benchmarks import Annotator, LoadStats, reset, seed
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+define("loadtest_annotators", default="10",
+       help="comma-separated numbers of simultaneous annotators to test")
+define("loadtest_bags", default=2, type=int,
+       help="number of synthetic bags seeded")
+define("loadtest_batch_size", default=5, type=int,
+       help="number of frames leased at once, as frame.js does")
+define("loadtest_db", default="lens_loadtest",
+       help="database to seed, which is emptied first")
+define("loadtest_duration", default=30, type=int,
+       help="seconds each number of annotators is tested for")
+define("loadtest_encoding", default="bgr8",
+       help="ROS image encoding of the synthetic frames")
+define("loadtest_feeds", default=2, type=int,
+       help="number of feeds per synthetic bag")
+define("loadtest_frames", default=1000, type=int,
+       help="number of frames per synthetic feed")
+define("loadtest_level", default=0, type=int,
+       help="pyramid level of the images requested")
+define("loadtest_output", default="",
+       help="file to save the results to as JSON")
+define("loadtest_port", default=8899, type=int,
+       help="port to start the backend on")
+define("loadtest_resolution", default="640x480",
+       help="resolution of the synthetic frames")
+define("loadtest_think_time", default=0.0, type=float,
+       help="mean seconds an annotator spends on a frame")
+define("loadtest_url", default="",
+       help="URL of a running backend (default: start one)")
+
+# Seconds to wait for a started backend to accept requests.
+STARTUP_TIMEOUT = 30
+
+
+def start_backend():
+    """Starts a backend on the load test database.
+
+    Options other than the load test's are passed on, so the backend is
+    configured the same way as the seeded frames.
+
+    Returns:
+        Tuple of (backend process, URL).
+    """
+    argv = [
+        arg for arg in sys.argv[1:]
+        if arg.startswith("--") and not arg.startswith("--loadtest_")
+    ]
+    process = subprocess.Popen(
+        [sys.executable, "app.py"] + argv + [
+            "--db={}".format(options.loadtest_db),
+            "--port={}".format(options.loadtest_port),
+            "--ingest_concurrency=0",
+            "--backfill=false"
+        ],
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    return process, "http://localhost:{}".format(options.loadtest_port)
+
+
+@coroutine
+def wait_for(url):
+    """Waits for a backend to accept requests.
+
+    Args:
+        url: Base URL of the backend.
+
+    Raises:
+        RuntimeError: If the backend doesn't start in time.
+    """
+    deadline = time.time() + STARTUP_TIMEOUT
+    while time.time() < deadline:
+        response = yield AsyncHTTPClient().fetch(url, raise_error=False)
+        if response.code != 599:
+            return
+        yield sleep(0.5)
+    raise RuntimeError("Backend at {} did not start".format(url))
+
+
+@coroutine
+def simulate(url, annotators):
+    """Runs simulated annotators against a backend.
+
+    Args:
+        url: Base URL of the backend.
+        annotators: Number of simultaneous annotators.
+
+    Returns:
+        LoadStats.
+    """
+    # Every annotator may have a batch of images and a lease in flight, and
+    # none should wait on the client to be sent.
+    client = AsyncHTTPClient(
+        force_instance=True,
+        max_clients=annotators * (options.loadtest_batch_size + 2)
+    )
+    stats = LoadStats(annotators)
+    stats.started = time.time()
+    deadline = stats.started + options.loadtest_duration
+    yield [
+        Annotator(
+            i, client, url, stats,
+            options.loadtest_batch_size,
+            options.loadtest_think_time,
+            options.loadtest_level
+        ).run(deadline)
+        for i in range(annotators)
+    ]
+    stats.stopped = time.time()
+    client.close()
+    raise Return(stats)
+
+
+@coroutine
+def run_load_test(url, levels):
+    """Seeds the database and simulates each number of annotators.
+
+    Args:
+        url: Base URL of the backend.
+        levels: List of numbers of simultaneous annotators.
+
+    Returns:
+        List of dictionaries of results.
+    """
+    width, height = parse_resolution(options.loadtest_resolution)
+    yield wait_for(url)
+
+    results = []
+    for annotators in levels:
+        # Start every run from the same untouched frames.
+        yield reset()
+        frames = yield seed(
+            options.loadtest_bags,
+            options.loadtest_feeds,
+            options.loadtest_frames,
+            width,
+            height,
+            options.loadtest_encoding
+        )
+        logging.info("Simulating %d annotators on %d frames",
+                     annotators, frames)
+
+        stats = yield simulate(url, annotators)
+        print(stats.report())
+        print("")
+
+        summary = stats.summary()
+        summary["frames"] = frames
+        results.append(summary)
+    raise Return(results)
+
+
+def run():
+    """Runs the load test configured on the command line."""
+    options.parse_command_line()
+    if options.loadtest_db == options.db:
+        logging.error("--loadtest_db must not be --db, since it is emptied")
+        sys.exit(1)
+
+    try:
+        levels = [int(n) for n in options.loadtest_annotators.split(",")]
+    except ValueError:
+        logging.error("Invalid --loadtest_annotators")
+        sys.exit(1)
+
+    connect(options.loadtest_db)
+    backend = None
+    url = options.loadtest_url
+    if not url:
+        backend, url = start_backend()
+
+    try:
+        results = IOLoop.instance().run_sync(
+            lambda: run_load_test(url, levels)
+        )
+    finally:
+        if backend:
+            backend.terminate()
+            backend.wait()
+
+    if options.loadtest_output:
+        with open(options.loadtest_output, "w") as f:
+            json.dump({
+                "url": url,
+                "duration": options.loadtest_duration,
+                "think_time": options.loadtest_think_time,
+                "batch_size": options.loadtest_batch_size,
+                "results": results
+            }, f, indent=2, sort_keys=True)
+
+    # Leases are renewed as frames are shown, so no frame should ever be
+    # handed to two annotators.
+    if any(result["duplicate_leases"] for result in results):
+        logging.error("Frames were leased to more than one annotator")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    run()
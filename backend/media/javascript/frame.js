@@ -15,37 +15,171 @@ function Frame () {
   this.container = document.getElementById('annotate-img');
   this.aspectRatio;
 
-  // Request the next frame
+  // Show the next leased frame once this frame is set as `Lens.image`.
+  window.setTimeout(Frame.showNext, 0);
+}
+
+
+/**
+ * Number of frames leased from the backend at once.
+ */
+Frame.BATCH_SIZE = 5;
+
+
+/**
+ * Frames leased from the backend that have not been shown yet.
+ */
+Frame.queue = [];
+
+
+/**
+ * Whether a request for more frames is in flight.
+ */
+Frame.fetching = false;
+
+
+/**
+ * Unique ID of this annotation session, which frames are leased under.
+ */
+Frame.session = Math.random().toString(36).slice(2) + Date.now().toString(36);
+
+
+/**
+ * Shows the next leased frame, and leases more frames if running low. The
+ * leases of the frames still queued are renewed so they don't expire while
+ * waiting to be shown.
+ * @return undefined
+ */
+Frame.showNext = function () {
+  if (Frame.queue.length) {
+    Lens.image.setBackgroundImage(Frame.queue.shift());
+    Frame.renew();
+  }
+  if (Frame.queue.length <= 1) {
+    Frame.fetch();
+  }
+};
+
+
+/**
+ * Renews the leases of the frames leased by this session that were not
+ * annotated yet.
+ * @return undefined
+ */
+Frame.renew = function () {
   var req = new XMLHttpRequest();
-  req.addEventListener('load', this.setBackgroundImage);
-  // Make an assynchronous request for the next frame
-  req.open("GET", '/next', true);
+  req.open('POST', '/next/renew?session=' + Frame.session, true);
   req.send();
-}
+};
 
 
 /**
- * Sets the `background-img` property of the main SVG tag.
- * @this: Reffers to the HTTP response object.
+ * Leases a batch of frames and prefetches their images so they can be shown
+ * without waiting.
  * @return undefined
  */
-Frame.prototype.setBackgroundImage = function () {
-  if (this.status !== 500 && this.status !== 404){
-    var frameInfo = JSON.parse(this.responseText);
-    Lens.frameId = frameInfo.id;
-    var url = '/image/' + Lens.frameId;
-    Lens.image.container.style.backgroundImage = 'url(' + url + ')';
-    var img = document.createElement('img');
-    img.onload = function () {
-      Lens.image.aspectRatio = img.width / img.height;
-      Lens.image.resizeFrame();
+Frame.fetch = function () {
+  if (Frame.fetching) {
+    return;
+  }
+  Frame.fetching = true;
+
+  var req = new XMLHttpRequest();
+  req.addEventListener('load', function () {
+    Frame.fetching = false;
+    if (this.status !== 200) {
+      // Handle errors
+      return;
     }
-    img.src = url;
+
+    var waiting = Lens.frameId === null;
+    JSON.parse(this.responseText).frames.forEach(function (frameInfo) {
+      var img = new Image();
+      img.src = Lens.image.imageUrl(frameInfo);
+      Frame.queue.push(frameInfo);
+    });
+
+    // Show a frame right away if none was available before.
+    if (waiting && Frame.queue.length) {
+      Lens.image.setBackgroundImage(Frame.queue.shift());
+    }
+  });
+  req.addEventListener('error', function () {
+    Frame.fetching = false;
+  });
+
+  // Make an assynchronous request for the next frames
+  req.open('GET', '/next?count=' + Frame.BATCH_SIZE +
+           '&session=' + Frame.session, true);
+  req.send();
+};
+
+
+/**
+ * Returns the frames leased by this session that were never shown so other
+ * annotators can get them right away.
+ * @return undefined
+ */
+Frame.release = function () {
+  var url = '/next/release?session=' + Frame.session;
+  if (navigator.sendBeacon) {
+    navigator.sendBeacon(url);
   } else {
-    // Handle errors
+    var req = new XMLHttpRequest();
+    req.open('POST', url, false);
+    req.send();
   }
 };
 
+window.addEventListener('unload', Frame.release);
+
+
+/**
+ * Sets the `background-img` property of the main SVG tag.
+ * @param {Object} frameInfo : Frame information returned by the backend.
+ * @return undefined
+ */
+Frame.prototype.setBackgroundImage = function (frameInfo) {
+  Lens.frameId = frameInfo.id;
+  var url = Lens.image.imageUrl(frameInfo);
+  Lens.image.container.style.backgroundImage = 'url(' + url + ')';
+  var img = document.createElement('img');
+  img.onload = function () {
+    Lens.image.aspectRatio = img.width / img.height;
+    Lens.image.resizeFrame();
+  }
+  img.src = url;
+};
+
+
+/**
+ * Deepest pyramid level served by the backend, i.e. 1/8 of the full size.
+ */
+Frame.MAX_LEVEL = 3;
+
+
+/**
+ * Returns the URL of the smallest pyramid level of a frame that still covers
+ * every pixel it will be displayed at.
+ * @param {Object} frameInfo : Frame information returned by the backend.
+ * @return {string} Image URL.
+ */
+Frame.prototype.imageUrl = function (frameInfo) {
+  var url = '/image/' + frameInfo.id;
+  var container = this.container;
+  var displayWidth = (container.clientWidth ||
+                      container.parentElement.clientWidth ||
+                      window.innerWidth) * (window.devicePixelRatio || 1);
+
+  var level = 0;
+  while (level < Frame.MAX_LEVEL &&
+         frameInfo.width / Math.pow(2, level + 1) >= displayWidth) {
+    level++;
+  }
+
+  return level ? url + '?level=' + level : url;
+};
+
 
 /**
  * Dynamically fits the frame to the user's page to allow easy annotation of
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+"""Lens Backend Migrations.
+
+Runs online data migrations against the database. Migrations are idempotent
+and can be run while the backend is serving requests.
+
+Usage:
+    python migrate.py [--db=lens] [--migration_batch_size=500] [names...]
+
+If no migration names are given, all migrations are run in order.
+"""
+
+import sys
+import logging
+from app import options
+from functools import partial
+from motorengine import connect
+from tornado.ioloop import IOLoop
+from migrations import MIGRATIONS, run_migrations
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+
+def run():
+    """Runs migrations given on the command line."""
+    names = options.parse_command_line()
+
+    unknown = set(names) - set(name for name, _ in MIGRATIONS)
+    if unknown:
+        logging.error("Unknown migrations: %s", ", ".join(sorted(unknown)))
+        sys.exit(1)
+
+    connect(options.db)
+    IOLoop.instance().run_sync(
+        partial(run_migrations, names, options.migration_batch_size)
+    )
+
+
+if __name__ == "__main__":
+    run()
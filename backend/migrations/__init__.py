@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+"""Lens Backend Migrations."""
+
+import logging
+import binary_frames
+import annotated_frames
+import frame_dimensions
+from tornado.gen import coroutine
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+# Migrations by name, in the order they should be run.
+MIGRATIONS = [
+    ("binary_frames", binary_frames.migrate),
+    ("frame_dimensions", frame_dimensions.migrate),
+    ("annotated_frames", annotated_frames.migrate),
+]
+
+# Migrations that are run in the background whenever the backend starts.
+BACKFILLS = ["frame_dimensions", "annotated_frames"]
+
+__all__ = ["BACKFILLS", "MIGRATIONS", "run_migrations"]
+
+
+@coroutine
+def run_migrations(names, batch_size):
+    """Runs migrations in order.
+
+    Args:
+        names: Names of the migrations to run, or empty to run all of them.
+        batch_size: Number of documents to migrate per round trip.
+    """
+    for name, migrate in MIGRATIONS:
+        if names and name not in names:
+            continue
+
+        logging.info("Running migration %s", name)
+        count = yield migrate(batch_size)
+        logging.info("Migration %s updated %d documents", name, count)
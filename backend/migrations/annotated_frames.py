@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+"""Backfills whether frames are annotated."""
+
+import logging
+from models import Frame
+from tornado.gen import coroutine, Return
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+
+@coroutine
+def migrate(batch_size):
+    """Sets the annotated flag of frames ingested before it was recorded.
+
+    Frames are only leased once they have the flag, since the lease query and
+    its partial index depend on it.
+
+    Args:
+        batch_size: Unused, since each case is a single server-side update.
+
+    Returns:
+        Number of frames updated.
+    """
+    coll = Frame.objects.coll()
+    missing = {"annotated": {"$exists": False}}
+
+    unannotated = yield coll.update(
+        dict(missing, annotations={"$size": 0}),
+        {"$set": {"annotated": False}},
+        multi=True
+    )
+    annotated = yield coll.update(
+        missing,
+        {"$set": {"annotated": True}},
+        multi=True
+    )
+
+    updated = unannotated["n"] + annotated["n"]
+    logging.info("Backfilled annotated flag of %d frames", updated)
+    raise Return(updated)
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+"""Converts base64 encoded frame images to BSON binary."""
+
+import base64
+import logging
+from bson import Binary
+from models import Frame
+from tornado.gen import coroutine, Return
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+
+@coroutine
+def migrate(batch_size):
+    """Rewrites every base64 encoded frame image as BSON binary.
+
+    This is safe to run while the backend is serving requests since frames
+    can be read in either format. Each frame is only updated if its image is
+    still a base64 string, so running this more than once or concurrently is
+    harmless.
+
+    Args:
+        batch_size: Number of frames to convert per round trip.
+
+    Returns:
+        Number of frames converted.
+    """
+    coll = Frame.objects.coll()
+    converted = 0
+    last_id = None
+
+    while True:
+        # Base64 images were stored as BSON strings, i.e. type 2.
+        query = {"data": {"$type": 2}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+
+        cursor = coll.find(query, fields=["data"]).sort("_id", 1)
+        docs = yield cursor.limit(batch_size).to_list(batch_size)
+        if not docs:
+            break
+
+        bulk = coll.initialize_unordered_bulk_op()
+        for doc in docs:
+            data = Binary(base64.b64decode(doc["data"]))
+            bulk.find({"_id": doc["_id"], "data": {"$type": 2}}).update_one(
+                {"$set": {"data": data}}
+            )
+        result = yield bulk.execute()
+
+        converted += result["nMatched"]
+        last_id = docs[-1]["_id"]
+        logging.info("Converted %d frames to binary", converted)
+
+    raise Return(converted)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+"""Backfills frame image dimensions."""
+
+import logging
+from models import Frame
+from tornado.gen import coroutine, Return
+from pymongo.errors import InvalidOperation
+from helpers import guess_encoding, image_info
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+
+@coroutine
+def migrate(batch_size):
+    """Fills in the width, height, channels and encoding of frames ingested
+    before they were recorded.
+
+    Only the image header is parsed, so no pixels are decoded. The original
+    ROS encoding is guessed from the stored image format.
+
+    Args:
+        batch_size: Number of frames to update per round trip.
+
+    Returns:
+        Number of frames updated.
+    """
+    coll = Frame.objects.coll()
+    updated = 0
+    last_id = None
+
+    while True:
+        query = {"width": {"$exists": False}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+
+        cursor = coll.find(query, fields=["data", "locator"]).sort("_id", 1)
+        docs = yield cursor.limit(batch_size).to_list(batch_size)
+        if not docs:
+            break
+
+        bulk = coll.initialize_unordered_bulk_op()
+        for doc in docs:
+            frame = Frame.from_son(doc)
+            info = image_info(frame.image_buffer())
+            if info is None:
+                logging.warn("Unrecognized image format in frame %s",
+                             doc["_id"])
+                continue
+
+            width, height, channels, depth = info
+            query = {"_id": doc["_id"], "width": {"$exists": False}}
+            bulk.find(query).update_one({"$set": {
+                "width": width,
+                "height": height,
+                "channels": channels,
+                "encoding": guess_encoding(channels, depth)
+            }})
+
+        last_id = docs[-1]["_id"]
+        try:
+            result = yield bulk.execute()
+        except InvalidOperation:
+            # Nothing in this batch could be updated.
+            continue
+
+        updated += result["nMatched"]
+        logging.info("Backfilled dimensions of %d frames", updated)
+
+    raise Return(updated)
@@ -7,9 +7,16 @@ from bag import Bag
 from feed import Feed
 from user import User
 from frame import Frame
+from job import IngestJob
+from loader import Loader
 from annotation import Annotation
+from queries import instrument_queries
+from indexes import describe_indexes, ensure_indexes
 
 __author__ = "Anass Al-Wohoush"
 __version__ = "0.3.0"
 
-__all__ = ["Annotation", "Bag", "Feed", "Frame", "Tag", "User"]
+__all__ = [
+    "Annotation", "Bag", "Feed", "Frame", "IngestJob", "Loader", "Tag",
+    "User", "describe_indexes", "ensure_indexes", "instrument_queries"
+]
@@ -20,7 +20,7 @@ class Annotation(Document):
         timestamp:  Time of annotation.
     """
 
-    __lazy__ = False
+    __lazy__ = True
     __collection__ = "annotations"
 
     data = fields.JsonField(required=True)
@@ -28,7 +28,10 @@ class Annotation(Document):
     timestamp = fields.DateTimeField(default=datetime.utcnow())
 
     def dump(self):
-        """Returns dictionary representation of annotation."""
+        """Returns dictionary representation of annotation.
+
+        The annotation's author must have been resolved with a Loader first.
+        """
         return {
             "author": self.author.name,
             "timestamp": self.timestamp,
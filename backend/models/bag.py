@@ -22,6 +22,10 @@ class Bag(Document):
 
     __collection__ = "bags"
 
+    # Incremented whenever a bag or feed changes, so cached listings can tell
+    # that they are stale.
+    version = 0
+
     name = fields.StringField(required=True)
     robot = fields.StringField(required=True)
     location = fields.StringField(required=True)
@@ -63,13 +67,21 @@ class Bag(Document):
             conditions=conditions,
             recorded=recorded
         )
+        Bag.touch()
         raise Return(bag)
+
+    @classmethod
+    def touch(cls):
+        """Marks bags or feeds as changed."""
+        Bag.version += 1
+
     @classmethod
     @coroutine
     def get_bags(self):
         """ Returns all bags. """
         bags = yield Bag.objects.find_all()
         raise Return(bags)
+
     @classmethod
     @coroutine
     def get_bag(self, bag_id):
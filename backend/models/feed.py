@@ -2,14 +2,20 @@
 
 """Feed model."""
 
+import time
 from tag import Tag
 from bag import Bag
+from loader import Loader
+from codec import topic_codec
 from tornado.gen import coroutine, Return
-from motorengine import Document, fields, Q
+from motorengine import ASCENDING, Document, fields, Q
 
 __author__ = "Monica Ung, Anass Al-Wohoush"
 __version__ = "0.1.0"
 
+# Cached bag listing as (bag version, expiry, listing).
+_listing = None
+
 
 class Feed(Document):
     """Image feed document.
@@ -18,22 +24,37 @@ class Feed(Document):
         bag: Bag of the feed.
         topic: ROS topic name.
         available_tags: List of tags available for the feed.
+        codec: ID of the codec the feed's images are encoded with, or None
+            for the one set by --codec.
     """
 
     __collection__ = "feeds"
-    __lazy__ = False
+    __lazy__ = True
+    __indexes__ = [
+        ([("bag", ASCENDING), ("topic", ASCENDING)], {}),
+    ]
+
+    # Seconds for which the bag listing is cached. Changes made through this
+    # process invalidate it immediately, so this only bounds how stale it can
+    # get with respect to other processes.
+    LISTING_TTL = 10
 
     bag = fields.ReferenceField(reference_document_type=Bag)
     topic = fields.StringField(required=True)
     available_tags = fields.ListField(fields.ReferenceField(Tag))
+    codec = fields.StringField()
 
     def dump(self):
-        """Returns dictionary representation of feed information."""
+        """Returns dictionary representation of feed information.
+
+        The feed's references must have been resolved with a Loader first.
+        """
         return {
             "id": str(self._id),
             "bag": self.bag.dump(),
             "topic": self.topic,
-            "available_tags": [t.dump() for t in self.available_tags]
+            "available_tags": [t.dump() for t in self.available_tags],
+            "codec": self.codec
         }
 
     @classmethod
@@ -41,6 +62,9 @@ class Feed(Document):
     def from_topic(cls, bag, topic):
         """Creates a feed from a topic and writes it to the database.
 
+        New feeds are encoded with the codec set for their topic by
+        --topic_codecs, or by --codec.
+
         Args:
             bag: Bag that the feed belongs to.
             topic: ROS topic name.
@@ -58,7 +82,9 @@ class Feed(Document):
         feed = yield Feed.objects.create(
             bag=bag,
             topic=topic,
+            codec=topic_codec(topic)
         )
+        Bag.touch()
         raise Return(feed)
 
     @coroutine
@@ -71,6 +97,26 @@ class Feed(Document):
         if not self.exist(tag):
             self.available_tags.append(tag)
             yield self.save()
+            Bag.touch()
+
+    @coroutine
+    def set_tags(self, tags):
+        """Replaces the available tags of a feed in a single update.
+
+        Args:
+            tags: List of Tags that could be seen in the feed.
+        """
+        unique = []
+        for tag in tags:
+            if not any(t._id == tag._id for t in unique):
+                unique.append(tag)
+
+        yield Feed.objects.coll().update(
+            {"_id": self._id},
+            {"$set": {"available_tags": [t._id for t in unique]}}
+        )
+        self.available_tags = unique
+        Bag.touch()
 
     @classmethod
     @coroutine
@@ -90,11 +136,94 @@ class Feed(Document):
             feeds = yield Feed.objects.find_all()
         raise Return(feeds)
 
+    @classmethod
+    @coroutine
+    def by_bags(cls, bags):
+        """Returns the feeds of several bags with their tags loaded.
+
+        This takes two queries no matter how many bags, feeds and tags there
+        are, instead of one per feed and per reference.
+
+        Args:
+            bags: List of Bags.
+
+        Returns:
+            Dictionary of bag ID to list of Feeds.
+        """
+        bags = dict((bag._id, bag) for bag in bags)
+        feeds = dict((bag_id, []) for bag_id in bags)
+        if not bags:
+            raise Return(feeds)
+
+        cursor = Feed.objects.coll().find({"bag": {"$in": list(bags)}})
+        docs = yield cursor.sort("_id", 1).to_list(None)
+
+        # The bags are already loaded, so only the tags need to be queried.
+        loader = Loader()
+        for bag in bags.values():
+            loader.prime(bag)
+        related_feeds = [Feed.from_son(doc) for doc in docs]
+        yield loader.resolve(related_feeds)
+
+        for feed in related_feeds:
+            feeds[feed.bag._id].append(feed)
+        raise Return(feeds)
+
+    @classmethod
+    @coroutine
+    def listing(cls):
+        """Returns every bag along with its feeds.
+
+        The listing is cached until a bag or feed changes.
+
+        Returns:
+            List of (Bag, list of Feeds) tuples.
+        """
+        global _listing
+        if _listing:
+            version, expiry, listing = _listing
+            if version == Bag.version and time.time() < expiry:
+                raise Return(listing)
+
+        version = Bag.version
+        bags = yield Bag.get_bags()
+        feeds = yield Feed.by_bags(bags)
+        listing = [(bag, feeds[bag._id]) for bag in bags]
+
+        # Only cache if nothing changed while the listing was being built.
+        if version == Bag.version:
+            _listing = (version, time.time() + cls.LISTING_TTL, listing)
+        raise Return(listing)
+
+    @classmethod
+    @coroutine
+    def ids_for_bags(cls, query):
+        """Returns the IDs of the feeds of every bag matching a query.
+
+        Args:
+            query: MongoDB query on the bags collection.
+
+        Returns:
+            List of feed ObjectIds.
+        """
+        cursor = Bag.objects.coll().find(query, fields=["_id"])
+        bags = yield cursor.to_list(None)
+        if not bags:
+            raise Return([])
+
+        cursor = Feed.objects.coll().find(
+            {"bag": {"$in": [b["_id"] for b in bags]}},
+            fields=["_id"]
+        )
+        feeds = yield cursor.to_list(None)
+        raise Return([f["_id"] for f in feeds])
+
     @coroutine
     def clear_tags(self):
         """Clears available_tags."""
         self.available_tags = []
         yield self.save()
+        Bag.touch()
 
     def exist(self, tag):
         """Checks if tag already exists in available_tags.
@@ -106,6 +235,7 @@ class Feed(Document):
             Boolean.
         """
         for existing_tag in self.available_tags:
-            if tag.name == existing_tag.name:
+            # Tags that haven't been loaded are still ObjectIds.
+            if getattr(existing_tag, "_id", existing_tag) == tag._id:
                 return True
         return False
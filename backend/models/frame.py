@@ -4,22 +4,234 @@
 
 import cv2
 import six
-import base64
+import time
 import logging
 import numpy as np
 from tag import Tag
 from feed import Feed
-from toro import Lock
 from bson import Binary
 from cv_bridge import CvBridge
 from annotation import Annotation
+from tornado.options import options
+from storage import get_store, store_for
 from datetime import datetime, timedelta
 from tornado.gen import coroutine, Return
-from motorengine import Document, fields, Q
+from motorengine import ASCENDING, Document, fields
+from helpers import get_pool, guess_encoding, image_format, image_info
+from codec import (
+    DECODE_SECONDS, ENCODE_SECONDS, codec_for, encode_image, get_codec
+)
 
 __author__ = "Anass Al-Wohoush, Monica Ung"
 
-lock = Lock()
+
+# NumPy type and number of channels of the ROS image encodings whose pixels
+# can be used as is.
+IMAGE_TYPES = {
+    "mono8": (np.uint8, 1),
+    "bgr8": (np.uint8, 3),
+    "rgb8": (np.uint8, 3),
+    "bgra8": (np.uint8, 4),
+    "rgba8": (np.uint8, 4),
+    "8UC1": (np.uint8, 1),
+    "8UC3": (np.uint8, 3),
+    "8UC4": (np.uint8, 4),
+    "mono16": (np.uint16, 1),
+    "bgr16": (np.uint16, 3),
+    "rgb16": (np.uint16, 3),
+    "bgra16": (np.uint16, 4),
+    "rgba16": (np.uint16, 4),
+    "16UC1": (np.uint16, 1),
+    "16UC3": (np.uint16, 3),
+    "16UC4": (np.uint16, 4),
+}
+
+
+def image_array(msg):
+    """Returns the pixels of a ROS sensor_msgs/Image as a NumPy array.
+
+    The array is a view of the message's data unless rows are padded or the
+    data isn't in native byte order, so it is never copied more than once.
+    Like CvBridge's passthrough conversion, the pixels are left as is.
+
+    Args:
+        msg: ROS Image.
+
+    Returns:
+        Array of shape (height, width) or (height, width, channels), or None
+        if the encoding isn't one of IMAGE_TYPES.
+    """
+    if msg.encoding not in IMAGE_TYPES:
+        return
+
+    dtype, channels = IMAGE_TYPES[msg.encoding]
+    dtype = np.dtype(dtype)
+    if msg.is_bigendian:
+        dtype = dtype.newbyteorder(">")
+
+    img = np.frombuffer(msg.data, dtype=dtype, count=(
+        msg.height * msg.step // dtype.itemsize
+    )).reshape(msg.height, -1)[:, :msg.width * channels]
+    if channels > 1:
+        img = img.reshape(msg.height, msg.width, channels)
+
+    # OpenCV needs native byte order and contiguous rows.
+    if not dtype.isnative:
+        img = img.astype(dtype.newbyteorder("="))
+    return np.ascontiguousarray(img)
+
+
+# Length of the header compressed_depth_image_transport prefixes its PNGs
+# with, which holds the depth quantization parameters.
+DEPTH_HEADER_SIZE = 12
+
+
+def is_compressed(msg):
+    """Returns whether a ROS image message is a sensor_msgs/CompressedImage.
+
+    Args:
+        msg: ROS Image or CompressedImage.
+
+    Returns:
+        Whether the message is compressed.
+    """
+    return hasattr(msg, "format")
+
+
+def compressed_image(msg):
+    """Returns the image of a ROS sensor_msgs/CompressedImage as it is.
+
+    JPEGs and PNGs are kept exactly as they were recorded. Depth images
+    compressed by compressed_depth_image_transport are only supported when
+    they are 16-bit, since their PNGs then hold the original pixels.
+
+    Args:
+        msg: ROS CompressedImage.
+
+    Returns:
+        Tuple of (codec, encoded image, ROS image encoding, image shape), or
+        None if the image's format is not supported.
+    """
+    # image_transport formats are like "bgr8; jpeg compressed bgr8", or just
+    # "jpeg" for older recordings.
+    encoding = None
+    if ";" in msg.format:
+        encoding = msg.format.split(";", 1)[0].strip()
+
+    data = msg.data
+    if "compressedDepth" in msg.format:
+        if encoding not in ("16UC1", "mono16"):
+            return
+        data = buffer(data, DEPTH_HEADER_SIZE)
+
+    codec = image_format(data)
+    info = image_info(data) if codec else None
+    if info is None:
+        return
+
+    width, height, channels, depth = info
+    encoding = encoding or guess_encoding(channels, depth)
+    shape = (height, width, channels) if channels > 1 else (height, width)
+    return codec, bytes(data), encoding, shape
+
+
+def encode_message(msg, codec):
+    """Encodes a ROS image message for storage.
+
+    CompressedImages are stored as they are, while Images are encoded with
+    the given codec. This is kept at module level so it can be pickled and
+    run in a worker process, off the IOLoop.
+
+    Args:
+        msg: ROS Image or CompressedImage.
+        codec: Codec to encode Images with.
+
+    Returns:
+        Tuple of (codec ID, encoded image, ROS image encoding, image shape),
+        or None if the message is a CompressedImage in an unsupported format.
+    """
+    if is_compressed(msg):
+        return compressed_image(msg)
+    codec, img, shape = encode_ros_image(msg, codec)
+    return codec, img, msg.encoding, shape
+
+
+def encode_ros_image(msg, codec):
+    """Encodes a ROS sensor_msgs/Image.
+
+    This is kept at module level so it can be pickled and run in a worker
+    process, off the IOLoop.
+
+    Args:
+        msg: ROS Image.
+        codec: Codec to encode with, which falls back to zlib if it doesn't
+            support the image's pixel type.
+
+    Returns:
+        Tuple of (codec ID, encoded byte string, image shape).
+    """
+    # Convert ROS Image to OpenCV image, falling back to CvBridge for
+    # encodings whose pixels can't be used as is.
+    img = image_array(msg)
+    if img is None:
+        bridge = CvBridge()
+        img = bridge.imgmsg_to_cv2(msg, desired_encoding="passthrough")
+
+    # Every codec offered is lossless, so this can be retrieved as a ROS
+    # image without issue.
+    name, data = encode_image(codec, img)
+    return name, data, img.shape
+
+
+def downscale(img, level):
+    """Downscales an image by a power of two.
+
+    Args:
+        img: OpenCV image.
+        level: Pyramid level, where level n is 1/2^n of the full size.
+
+    Returns:
+        OpenCV image.
+    """
+    if level:
+        height, width = img.shape[:2]
+        size = (max(1, width >> level), max(1, height >> level))
+        img = cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+    return img
+
+
+def jpeg_tiles(codec, data, level, size):
+    """Encodes every tile of a pyramid level of a stored image as JPEGs.
+
+    This is kept at module level so it can be pickled and run in a worker
+    process, off the IOLoop.
+
+    Args:
+        codec: Codec the image was encoded with.
+        data: Encoded byte string.
+        level: Pyramid level, where level n is 1/2^n of the full size.
+        size: Tile width and height in pixels.
+
+    Returns:
+        Tuple of (dictionary of JPEG encoded byte strings by (column, row),
+        seconds taken to decode the image, list of seconds taken to encode
+        each tile).
+    """
+    start = time.time()
+    img = codec.decode(data)
+    decode_seconds = time.time() - start
+    img = downscale(img, level)
+    height, width = img.shape[:2]
+
+    tiles = {}
+    encode_seconds = []
+    for y in range(0, height, size):
+        for x in range(0, width, size):
+            start = time.time()
+            jpeg = cv2.imencode('.jpg', img[y:y + size, x:x + size])[1]
+            encode_seconds.append(time.time() - start)
+            tiles[(x // size, y // size)] = jpeg.tostring()
+    return tiles, decode_seconds, encode_seconds
 
 
 class ImageField(fields.BinaryField):
@@ -35,6 +247,9 @@ class ImageField(fields.BinaryField):
         Returns:
             True if value is valid, False otherwise.
         """
+        # Images kept in an external image store leave this empty.
+        if value is None:
+            return True
         if not isinstance(value, (six.binary_type, six.text_type, Binary)):
             return False
         if self.max_bytes is not None and len(value) > self.max_bytes:
@@ -49,26 +264,67 @@ class Frame(Document):
     Attributes:
         tags: List of tags.
         feed: Corresponding feed.
-        data: Image data.
+        seq: Frame sequence in feed.
+        stamp: Time the image was recorded at in the bag in seconds.
+        width: Image width in pixels.
+        height: Image height in pixels.
+        channels: Number of image channels.
+        encoding: Original ROS image encoding.
+        codec: ID of the codec the image was encoded with. JPEGs are only
+            ever stored as they were recorded.
+        data: Image data, if stored in the document.
+        locator: [segment, offset, length] of the image, if stored in
+            segment files.
         annotations: List of annotations.
+        annotated: Whether the frame has any annotations.
         accessed: Datetime accessed in UTC, an indicator of whether in use.
+        lease: Annotation session the frame is leased to, if any.
     """
 
-    __lazy__ = False
+    __lazy__ = True
     __collection__ = "frames"
+    __indexes__ = [
+        ([("tags", ASCENDING)], {}),
+        ([("feed", ASCENDING), ("stamp", ASCENDING)], {}),
+        # Unleased frames are stored with a null lease, which a sparse index
+        # would still hold, so only frames actually leased are indexed.
+        ([("lease", ASCENDING)], {
+            "name": "leased",
+            "partialFilterExpression": {"lease": {"$type": "string"}}
+        }),
+        # Only unannotated frames are ever leased, so only they are indexed.
+        ([("accessed", ASCENDING)], {
+            "name": "unannotated_accessed",
+            "partialFilterExpression": {"annotated": False}
+        }),
+    ]
 
     tags = fields.ListField(fields.ReferenceField(Tag))
     feed = fields.ReferenceField(reference_document_type=Feed)
     seq = fields.IntField(required=True)
-    data = ImageField(required=True)
+    stamp = fields.FloatField()
+    width = fields.IntField()
+    height = fields.IntField()
+    channels = fields.IntField()
+    encoding = fields.StringField()
+    codec = fields.StringField(default="png")
+    data = ImageField()
+    locator = fields.ListField(fields.IntField())
     annotations = fields.ListField(fields.ReferenceField(Annotation))
+    annotated = fields.BooleanField(default=False)
     accessed = fields.DateTimeField()
+    lease = fields.StringField()
 
     def dump(self):
-        """Returns dictionary representation of frame information."""
-        # Get image size.
-        img = self.parse_image()
-        height, width = img.shape[:2]
+        """Returns dictionary representation of frame information.
+
+        The frame's references must have been resolved with a Loader first.
+        """
+        # Only decode the image for frames whose size hasn't been backfilled.
+        if self.width is None or self.height is None:
+            height, width = self.parse_image().shape[:2]
+        else:
+            height, width = self.height, self.width
 
         return {
             "id": str(self._id),
@@ -77,117 +333,297 @@ class Frame(Document):
             "seq": self.seq,
             "height": height,
             "width": width,
+            "channels": self.channels,
+            "encoding": self.encoding,
+            "codec": self.codec,
             "annotations": [x.dump() for x in self.annotations],
             "accessed": self.accessed,
         }
 
+    @classmethod
     @coroutine
-    def use(self):
-        """Updates last accessed time."""
-        # Avoid setting this while querying for next frame.
-        with (yield lock.acquire()):
-            # Update timestamp.
-            self.accessed = datetime.utcnow()
-            yield self.save()
+    def next(cls, session=None):
+        """Returns the optimal next frame to annotate.
+
+        The frame is leased by atomically stamping its accessed time in the
+        same operation that finds it, so concurrent requests, even from other
+        backend processes, are never handed the same frame. The lease expires
+        after --lease_timeout seconds if the frame isn't annotated.
+
+        Args:
+            session: Annotation session to lease the frame to, if any.
+
+        Returns:
+            Non-annotated frame, with its references not loaded yet.
+        """
+        # Find the first non-annotated frame that isn't currently leased.
+        now = datetime.utcnow()
+        expired = now - timedelta(seconds=options.lease_timeout)
+        query = {
+            "annotated": False,
+            "$or": [{"accessed": None}, {"accessed": {"$lt": expired}}]
+        }
+
+        # The image is re-read when it's requested, so it's left out of the
+        # lease unless the frame's size hasn't been backfilled, in which case
+        # dump() has to decode it.
+        doc = yield Frame.objects.coll().find_and_modify(
+            query,
+            {"$set": {"accessed": now, "lease": session}},
+            new=True,
+            fields={"data": False}
+        )
+        if not doc:
+            return
+        if doc.get("width") is None or doc.get("height") is None:
+            doc = yield Frame.objects.coll().find_one({"_id": doc["_id"]})
+
+        raise Return(Frame.from_son(doc))
 
     @classmethod
     @coroutine
-    def next(cls):
-        """Returns the optimal next frame to annotate.
+    def lease(cls, session, count):
+        """Leases several frames to annotate at once.
+
+        Args:
+            session: Annotation session to lease the frames to.
+            count: Maximum number of frames to lease.
 
         Returns:
-            Non-annotated frame.
+            List of non-annotated frames, which may be shorter than count if
+            not enough frames are available.
         """
-        def prepare_query():
-            """Returns filter for frames with no metadata and who have not been
-            accessed lately.
-            """
-            # Find the first non-annotated frame that hasn't been accessed in
-            # the past 10 minutes.
-            cache = datetime.utcnow() - timedelta(minutes=1)
-            return (
-                Q({"annotations": {"$size": 0}}) &
-                (Q(accessed__is_null=True) | Q(accessed__lt=cache))
-            )
-
-        # Avoid querying for next frame while marking another frame in use.
-        with (yield lock.acquire()):
-            query = prepare_query()
-            frames = yield Frame.objects.filter(query).limit(1).find_all()
-            next_frame = frames[0] if frames else None
-
-        # Return the frame if found and mark as in use.
-        if next_frame:
-            yield next_frame.use()
-            raise Return(next_frame)
+        # Each lease is atomic on its own, so they can run concurrently.
+        frames = yield [Frame.next(session) for _ in range(count)]
+        raise Return([f for f in frames if f])
+
+    @classmethod
+    @coroutine
+    def renew(cls, session):
+        """Renews the leases of the frames leased to a session that were not
+        annotated, so frames waiting to be shown don't expire.
+
+        Args:
+            session: Annotation session.
+
+        Returns:
+            Number of frames renewed.
+        """
+        result = yield Frame.objects.coll().update(
+            {"lease": session, "annotated": False},
+            {"$set": {"accessed": datetime.utcnow()}},
+            multi=True
+        )
+        raise Return(result["n"])
+
+    @classmethod
+    @coroutine
+    def release(cls, session):
+        """Returns the frames leased to a session that were not annotated.
+
+        Args:
+            session: Annotation session.
+
+        Returns:
+            Number of frames released.
+        """
+        result = yield Frame.objects.coll().update(
+            {"lease": session, "annotated": False},
+            {"$set": {"accessed": None, "lease": None}},
+            multi=True
+        )
+        raise Return(result["n"])
 
     @coroutine
     def annotate(self, annotations, tags):
         """Updates the frame's annotations.
 
+        The update is done atomically on the server, so concurrent annotations
+        of the same frame are never lost.
+
         Args:
             annotations: Annotations.
             tags: List of tags.
         """
-        # Avoid concurrently overwriting a frame's annotations.
-        with (yield lock.acquire()):
-            self.annotations.extend(annotations)
-            self.tags.extend(tags)
-            self.tags = list(set(self.tags))
-            yield self.save()
+        update = {
+            "$push": {"annotations": {"$each": [a._id for a in annotations]}},
+            "$addToSet": {"tags": {"$each": [t._id for t in tags]}}
+        }
+        if annotations:
+            update["$set"] = {"annotated": True}
+        yield Frame.objects.coll().update({"_id": self._id}, update)
+
+        self.annotations.extend(annotations)
+        self.annotated = bool(self.annotations)
+        tag_ids = set(t._id for t in self.tags)
+        for tag in tags:
+            if tag._id not in tag_ids:
+                tag_ids.add(tag._id)
+                self.tags.append(tag)
 
     @classmethod
     @coroutine
-    def from_ros_image(cls, feed, seq, msg):
-        """Creates a Frame from a ROS sensor_msgs/Image and writes it to the
-        database.
+    def encode(cls, feed, seq, msg, stamp=None):
+        """Creates a Frame from a ROS sensor_msgs/Image or CompressedImage
+        without writing it to the database.
+
+        The image is encoded with the feed's codec in the worker process
+        pool, so this does not block the IOLoop, and then written to the
+        configured image store.
 
         Args:
             feed: Corresponding feed.
             seq: Frame sequence in feed.
-            msg: ROS Image.
+            msg: ROS Image or CompressedImage.
+            stamp: Time the image was recorded at in the bag in seconds.
 
         Returns:
-            Frame.
+            Unsaved Frame.
+
+        Raises:
+            ValueError: If the CompressedImage's format is not supported.
         """
-        # Convert ROS Image to OpenCV image.
-        bridge = CvBridge()
-        img = bridge.imgmsg_to_cv2(msg, desired_encoding="passthrough")
+        codec = get_codec(feed.codec)
+        encoded = yield get_pool().submit(encode_message, msg, codec)
+        if encoded is None:
+            raise ValueError("Unsupported image format: {}".format(
+                msg.format
+            ))
+
+        codec, img, encoding, shape = encoded
+        frame = yield Frame.from_encoded(
+            feed, seq, encoding, img, shape, stamp, codec
+        )
+        raise Return(frame)
+
+    @classmethod
+    @coroutine
+    def from_encoded(cls, feed, seq, encoding, img, shape, stamp=None,
+                     codec="png"):
+        """Creates a Frame from an image encoded by encode_message() without
+        writing it to the database.
+
+        The image is written to the configured image store.
 
-        # Convert to PNG with highest level of compression.
-        # Although high quality compression is slower, it is acceptable since
-        # these images are read more often than they are written.
-        # PNG is a lossless format, so this can be retrived as a ROS image
-        # without issue.
-        compression = [cv2.IMWRITE_PNG_COMPRESSION, 9]
-        img = cv2.imencode('.png', img, compression)[1].tostring()
+        Args:
+            feed: Corresponding feed.
+            seq: Frame sequence in feed.
+            encoding: Original ROS image encoding.
+            img: Encoded image.
+            shape: Image shape.
+            stamp: Time the image was recorded at in the bag in seconds.
+            codec: ID of the codec the image was encoded with.
 
-        frame = yield Frame.objects.create(
+        Returns:
+            Unsaved Frame.
+        """
+        frame = Frame(
             feed=feed,
             seq=seq,
-            data=base64.b64encode(img)
+            stamp=stamp,
+            width=shape[1],
+            height=shape[0],
+            channels=shape[2] if len(shape) > 2 else 1,
+            encoding=encoding,
+            codec=codec
         )
+        yield get_store().put(frame, img)
         raise Return(frame)
 
-    def parse_image(self):
-        """Parses image into OpenCV image.
+    @classmethod
+    @coroutine
+    def from_ros_image(cls, feed, seq, msg):
+        """Creates a Frame from a ROS sensor_msgs/Image or CompressedImage
+        and writes it to the database.
+
+        Args:
+            feed: Corresponding feed.
+            seq: Frame sequence in feed.
+            msg: ROS Image or CompressedImage.
 
         Returns:
-            OpenCV Image.
+            Frame.
         """
-        nparr = np.fromstring(base64.b64decode(self.data), np.uint8)
-        img = cv2.imdecode(nparr, cv2.CV_LOAD_IMAGE_COLOR)
+        frame = yield Frame.encode(feed, seq, msg)
+        yield get_store().sync()
+        yield frame.save()
+        raise Return(frame)
+
+    def image_buffer(self):
+        """Returns the encoded image from whichever store it was written to.
 
+        Returns:
+            Encoded image byte string or read-only buffer.
+        """
+        return store_for(self).get(self)
+
+    def parse_image(self):
+        """Parses image into OpenCV image with the codec it was encoded with.
+
+        Returns:
+            8-bit BGR OpenCV Image.
+        """
+        codec = codec_for(self)
+        data = self.image_buffer()
+        start = time.time()
+        img = codec.decode(data)
+        DECODE_SECONDS.observe(time.time() - start, (codec.name,))
         return img
 
+    def render(self, level=0):
+        """Returns the frame's image downscaled by a power of two.
+
+        Args:
+            level: Pyramid level, where level n is 1/2^n of the full size.
+
+        Returns:
+            OpenCV Image.
+        """
+        return downscale(self.parse_image(), level)
+
     @coroutine
-    def to_jpeg(self):
+    def to_jpeg(self, level=0):
         """Returns a JPEG image of the frame.
 
+        Args:
+            level: Pyramid level, where level n is 1/2^n of the full size.
+
         Returns:
             JPEG encoded byte string.
         """
-        img = self.parse_image()
+        # Images recorded as JPEGs are returned as they are.
+        if self.codec == "jpeg" and not level:
+            raise Return(bytes(self.image_buffer()))
+
+        img = self.render(level)
 
         # Convert to JPEG.
-        raise Return(cv2.imencode('.jpg', img)[1].tostring())
+        start = time.time()
+        jpeg = cv2.imencode('.jpg', img)[1].tostring()
+        ENCODE_SECONDS.observe(time.time() - start, ("jpeg",))
+        raise Return(jpeg)
+
+    @coroutine
+    def to_jpeg_tiles(self, level, size):
+        """Returns every tile of a pyramid level of the frame as JPEGs.
+
+        The image is only decoded and downscaled once for all tiles, in the
+        worker process pool so this does not block the IOLoop. Tiles on the
+        right and bottom edges may be smaller than the tile size.
+
+        Args:
+            level: Pyramid level, where level n is 1/2^n of the full size.
+            size: Tile width and height in pixels.
+
+        Returns:
+            Dictionary of JPEG encoded byte strings by (column, row).
+        """
+        codec = codec_for(self)
+        data = bytes(self.image_buffer())
+        tiles, decode_seconds, encode_seconds = yield get_pool().submit(
+            jpeg_tiles, codec, data, level, size
+        )
+        DECODE_SECONDS.observe(decode_seconds, (codec.name,))
+        for seconds in encode_seconds:
+            ENCODE_SECONDS.observe(seconds, ("jpeg",))
+        raise Return(tiles)
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+"""Index management."""
+
+import logging
+from tag import Tag
+from bag import Bag
+from feed import Feed
+from user import User
+from frame import Frame
+from job import IngestJob
+from annotation import Annotation
+from tornado.gen import coroutine, Return
+from pymongo.errors import OperationFailure
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+# Every model that may declare indexes.
+MODELS = [Annotation, Bag, Feed, Frame, IngestJob, Tag, User]
+
+# Outcome of the last attempt at creating each declared index.
+status = []
+
+
+@coroutine
+def ensure_indexes():
+    """Creates every index declared in the models' __indexes__.
+
+    Each model may declare a list of (keys, options) tuples, where keys and
+    options are as accepted by pymongo's create_index. Creating an index that
+    already exists does nothing, so this is safe to run on every startup.
+    Indexes are built in the background so the database stays available.
+
+    Returns:
+        List of dictionaries describing the outcome for each index.
+    """
+    results = []
+    for model in MODELS:
+        for keys, kwargs in getattr(model, "__indexes__", []):
+            kwargs = dict(kwargs, background=True)
+            result = {
+                "collection": model.__collection__,
+                "keys": keys,
+                "options": kwargs
+            }
+
+            try:
+                name = yield model.objects.coll().create_index(keys, **kwargs)
+            except OperationFailure as e:
+                # For example, a unique index over existing duplicates.
+                logging.error("Could not create index %r on %s: %s",
+                              keys, model.__collection__, e)
+                result["error"] = str(e)
+            else:
+                result["name"] = name
+
+            results.append(result)
+
+    status[:] = results
+    raise Return(results)
+
+
+@coroutine
+def describe_indexes():
+    """Returns the declared and existing indexes of every model.
+
+    Returns:
+        Dictionary by collection name of dictionaries of the form:
+            {
+                'declared': outcome of the last ensure_indexes() call,
+                'existing': index information as returned by MongoDB
+            }
+    """
+    existing = yield [model.objects.coll().index_information()
+                      for model in MODELS]
+
+    indexes = {}
+    for model, info in zip(MODELS, existing):
+        indexes[model.__collection__] = {
+            "declared": [s for s in status
+                         if s["collection"] == model.__collection__],
+            "existing": info
+        }
+    raise Return(indexes)
@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+
+"""Ingest job model."""
+
+from bag import Bag
+from datetime import datetime, timedelta
+from tornado.gen import coroutine, Return
+from motorengine import ASCENDING, DESCENDING, Document, fields
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+
+class IngestJob(Document):
+    """Bag ingest job document.
+
+    Jobs are queued until a backend process claims them. The job is then
+    checkpointed as the bag is ingested, so that it can be resumed from where
+    it left off if the process stops.
+
+    Attributes:
+        bag: Bag being ingested.
+        path: Path to the ROS bag file.
+        state: One of queued, running, done, failed or cancelled.
+        priority: Jobs with a higher priority are run first.
+        error: Error message if the job failed.
+        owner: Backend process ingesting the bag.
+        heartbeat: Datetime of the last checkpoint in UTC.
+        created: Datetime created in UTC.
+        started: Datetime the current run started in UTC.
+        finished: Datetime finished in UTC.
+        size: Size of the bag file in bytes.
+        start_stamp: Recorded time of the first message in seconds.
+        end_stamp: Recorded time of the last message in seconds.
+        stamp: Recorded time of the last message read in seconds.
+        run_stamp: Recorded time the current run started reading from.
+        total: Number of image messages in the bag.
+        messages: Number of image messages read.
+        bytes: Number of image bytes read.
+        frames: Number of frames written.
+        run_frames: Number of frames written before the current run.
+        topics: Dictionary of checkpoints by topic, each with the recorded
+            time of the last frame written as 'stamp' and the number of
+            frames written as 'frames'.
+    """
+
+    __collection__ = "ingest_jobs"
+    __indexes__ = [
+        ([("bag", ASCENDING), ("created", DESCENDING)], {}),
+        ([("state", ASCENDING), ("heartbeat", ASCENDING)], {}),
+        ([
+            ("state", ASCENDING),
+            ("priority", DESCENDING),
+            ("created", ASCENDING)
+        ], {}),
+    ]
+
+    # States of jobs that are not over yet.
+    ACTIVE = ["queued", "running"]
+
+    bag = fields.ReferenceField(reference_document_type=Bag)
+    path = fields.StringField(required=True)
+    state = fields.StringField(default="queued")
+    priority = fields.IntField(default=0)
+    error = fields.StringField()
+    owner = fields.StringField()
+    heartbeat = fields.DateTimeField()
+    created = fields.DateTimeField()
+    started = fields.DateTimeField()
+    finished = fields.DateTimeField()
+    size = fields.IntField()
+    start_stamp = fields.FloatField()
+    end_stamp = fields.FloatField()
+    stamp = fields.FloatField()
+    run_stamp = fields.FloatField()
+    total = fields.IntField()
+    messages = fields.IntField(default=0)
+    bytes = fields.IntField(default=0)
+    frames = fields.IntField(default=0)
+    run_frames = fields.IntField(default=0)
+    topics = fields.JsonField(default=dict)
+
+    def dump(self):
+        """Returns dictionary representation of the job's progress."""
+        now = self.finished or self.heartbeat or datetime.utcnow()
+        elapsed = None
+        if self.started:
+            elapsed = (now - self.started).total_seconds()
+
+        # Progress is measured in recorded time, since messages are read in
+        # the order they were recorded.
+        progress = None
+        if self.state == "done":
+            progress = 1.0
+        elif self.stamp is not None and self.end_stamp > self.start_stamp:
+            progress = min(1.0, (self.stamp - self.start_stamp) /
+                           (self.end_stamp - self.start_stamp))
+
+        frames_per_second = None
+        eta = None
+        if elapsed:
+            frames_per_second = (self.frames - self.run_frames) / elapsed
+            if (self.state == "running" and self.stamp is not None and
+                    self.stamp > self.run_stamp):
+                rate = (self.stamp - self.run_stamp) / elapsed
+                eta = (self.end_stamp - self.stamp) / rate
+
+        # The bag only needs to be loaded for its ID.
+        bag = self.get_field_value("bag")
+
+        return {
+            "id": str(self._id),
+            "bag": str(getattr(bag, "_id", bag)),
+            "path": self.path,
+            "state": self.state,
+            "priority": self.priority,
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "updated": self.heartbeat,
+            "finished": self.finished,
+            "progress": progress,
+            "total": self.total,
+            "messages": self.messages,
+            "frames": self.frames,
+            "bytes": self.bytes,
+            "size": self.size,
+            "frames_per_second": frames_per_second,
+            "eta": eta
+        }
+
+    @classmethod
+    @coroutine
+    def from_bag(cls, bag, path, priority=0):
+        """Queues an ingest job for a bag and writes it to the database.
+
+        Args:
+            bag: Bag being ingested.
+            path: Path to the ROS bag file.
+            priority: Jobs with a higher priority are run first.
+
+        Returns:
+            IngestJob.
+        """
+        job = yield IngestJob.objects.create(
+            bag=bag,
+            path=path,
+            priority=priority,
+            created=datetime.utcnow()
+        )
+        raise Return(job)
+
+    @classmethod
+    @coroutine
+    def find(cls, states=None, limit=100):
+        """Returns the latest ingest jobs.
+
+        Args:
+            states: List of states to filter by, or None for every state.
+            limit: Maximum number of jobs.
+
+        Returns:
+            List of IngestJobs, latest first.
+        """
+        query = {"state": {"$in": states}} if states else {}
+        cursor = IngestJob.objects.coll().find(query).sort("created", -1)
+        docs = yield cursor.limit(limit).to_list(None)
+        raise Return([IngestJob.from_son(doc) for doc in docs])
+
+    @classmethod
+    @coroutine
+    def count_active(cls):
+        """Returns the number of jobs that are not over yet by state.
+
+        Returns:
+            Dictionary of number of jobs by state.
+        """
+        counts = yield [
+            IngestJob.objects.coll().find({"state": state}).count()
+            for state in IngestJob.ACTIVE
+        ]
+        raise Return(dict(zip(IngestJob.ACTIVE, counts)))
+
+    @classmethod
+    @coroutine
+    def cancel(cls, job_id):
+        """Cancels a job that is not over yet.
+
+        A running job only stops at its next checkpoint, and keeps the frames
+        it already wrote.
+
+        Args:
+            job_id: IngestJob ObjectId.
+
+        Returns:
+            IngestJob as it was before being cancelled, or None if there is
+            no such job that is not over yet.
+        """
+        doc = yield IngestJob.objects.coll().find_and_modify(
+            {"_id": job_id, "state": {"$in": IngestJob.ACTIVE}},
+            {"$set": {"state": "cancelled", "finished": datetime.utcnow()}}
+        )
+        if doc:
+            raise Return(IngestJob.from_son(doc))
+
+    @classmethod
+    @coroutine
+    def latest(cls, bag_id):
+        """Returns the latest ingest job of a bag.
+
+        Args:
+            bag_id: Bag ObjectId.
+
+        Returns:
+            IngestJob, or None if the bag was never ingested.
+        """
+        cursor = IngestJob.objects.coll().find({"bag": bag_id})
+        docs = yield cursor.sort("created", -1).limit(1).to_list(None)
+        if docs:
+            raise Return(IngestJob.from_son(docs[0]))
+
+    @classmethod
+    @coroutine
+    def claim(cls, owner, timeout, exclude=(), by_priority=True):
+        """Claims the next queued job, or a running job whose owner stopped
+        checkpointing it.
+
+        Args:
+            owner: Backend process claiming the job.
+            timeout: Seconds after the last checkpoint for which a job is
+                considered abandoned.
+            exclude: ObjectIds of jobs not to claim.
+            by_priority: Whether to run jobs by priority, or in the order
+                they were queued.
+
+        Returns:
+            IngestJob, or None if there are no jobs to run.
+        """
+        now = datetime.utcnow()
+        sort = [("created", ASCENDING)]
+        if by_priority:
+            sort.insert(0, ("priority", DESCENDING))
+        doc = yield IngestJob.objects.coll().find_and_modify(
+            {
+                "_id": {"$nin": list(exclude)},
+                "$or": [{"state": "queued"}, {
+                    "state": "running",
+                    "heartbeat": {"$lt": now - timedelta(seconds=timeout)}
+                }]
+            },
+            {"$set": {
+                "state": "running",
+                "owner": owner,
+                "heartbeat": now,
+                "started": now
+            }},
+            sort=sort,
+            new=True
+        )
+        if doc:
+            raise Return(IngestJob.from_son(doc))
+
+    @coroutine
+    def checkpoint(self, **values):
+        """Atomically writes the job's progress if it is still running and
+        owned by the same process.
+
+        Args:
+            **values: Fields to update.
+
+        Returns:
+            Whether the job is still running and owned.
+        """
+        values["heartbeat"] = datetime.utcnow()
+        son = dict(
+            (name, self._fields[name].to_son(value))
+            for name, value in values.items()
+        )
+        result = yield IngestJob.objects.coll().update(
+            {"_id": self._id, "owner": self.owner, "state": "running"},
+            {"$set": son}
+        )
+        for name, value in values.items():
+            setattr(self, name, value)
+        raise Return(result["n"] > 0)
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+"""Batched reference loader."""
+
+from bson.objectid import ObjectId
+from tornado.gen import coroutine, Return
+from motorengine.fields import ListField, ReferenceField
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+
+class Loader(object):
+
+    """Batched and memoized document loader.
+
+    References are resolved one level at a time: the IDs referenced by every
+    document of a level are gathered and each collection is queried once with
+    $in, no matter how many documents refer to it. Loaded documents are
+    memoized, so a loader should only live as long as a single request.
+    """
+
+    def __init__(self):
+        """Constructs a Loader."""
+        # Documents by (document type, ID), None if they don't exist.
+        self._documents = {}
+
+    def prime(self, document):
+        """Adds an already loaded document to the loader.
+
+        Args:
+            document: Document.
+        """
+        self._documents[(type(document), document._id)] = document
+
+    @coroutine
+    def load_many(self, document_type, ids):
+        """Returns documents by ID.
+
+        Only the documents that weren't already loaded are queried for.
+
+        Args:
+            document_type: Document class.
+            ids: List of ObjectIds.
+
+        Returns:
+            List of documents in the same order as the IDs, with None for the
+            IDs that don't exist.
+        """
+        ids = [ObjectId(i) for i in ids]
+        missing = set(
+            i for i in ids if (document_type, i) not in self._documents
+        )
+        if missing:
+            cursor = document_type.objects.coll().find(
+                {"_id": {"$in": list(missing)}}
+            )
+            for doc in (yield cursor.to_list(None)):
+                document = document_type.from_son(doc)
+                self._documents[(document_type, doc["_id"])] = document
+            for i in missing:
+                self._documents.setdefault((document_type, i), None)
+
+        raise Return([self._documents[(document_type, i)] for i in ids])
+
+    @coroutine
+    def load(self, document_type, id):
+        """Returns a document by ID.
+
+        Args:
+            document_type: Document class.
+            id: ObjectId.
+
+        Returns:
+            Document, or None if it doesn't exist.
+        """
+        documents = yield self.load_many(document_type, [id])
+        raise Return(documents[0])
+
+    @staticmethod
+    def _reference_fields(document):
+        """Yields the reference fields of a document.
+
+        Args:
+            document: Document.
+
+        Yields:
+            (field name, referenced document type, whether it is a list).
+        """
+        for name, field in document._fields.items():
+            if isinstance(field, ReferenceField):
+                yield name, field.reference_type, False
+            elif (isinstance(field, ListField) and
+                    isinstance(field._base_field, ReferenceField)):
+                yield name, field._base_field.reference_type, True
+
+    @coroutine
+    def resolve(self, documents):
+        """Loads the references of documents, recursively.
+
+        Missing references are set to None, or dropped from lists.
+
+        Args:
+            documents: List of documents.
+        """
+        seen = set()
+        level = [d for d in documents if d is not None]
+        while level:
+            seen.update(id(d) for d in level)
+
+            # Gather the unloaded IDs referenced by this level.
+            wanted = {}
+            for document in level:
+                references = self._reference_fields(document)
+                for name, document_type, many in references:
+                    value = document._values.get(name)
+                    values = (value or []) if many else [value]
+                    wanted.setdefault(document_type, set()).update(
+                        v for v in values if isinstance(v, ObjectId)
+                    )
+
+            # Load every referenced collection concurrently.
+            yield [
+                self.load_many(document_type, list(ids))
+                for document_type, ids in wanted.items() if ids
+            ]
+
+            # Fill in the references and move on to the referenced documents.
+            next_level = []
+            for document in level:
+                references = self._reference_fields(document)
+                for name, document_type, many in references:
+                    value = document._values.get(name)
+                    if value is None:
+                        continue
+
+                    values = value if many else [value]
+                    loaded = []
+                    for v in values:
+                        if isinstance(v, ObjectId):
+                            v = self._documents[(document_type, v)]
+                        if v is not None:
+                            loaded.append(v)
+                            if id(v) not in seen:
+                                seen.add(id(v))
+                                next_level.append(v)
+
+                    if many:
+                        document._values[name] = loaded
+                    else:
+                        document._values[name] = loaded[0] if loaded else None
+
+            level = next_level
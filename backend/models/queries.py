@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+"""Database query instrumentation."""
+
+import time
+from motorengine.queryset import QuerySet
+from helpers import current_request, histogram
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+# Collection and cursor methods that make a round trip to the database.
+COLLECTION_OPERATIONS = {
+    "aggregate", "count", "create_index", "distinct", "drop_index",
+    "ensure_index", "find_and_modify", "find_one", "index_information",
+    "insert", "remove", "save", "update"
+}
+CURSOR_OPERATIONS = {"count", "distinct", "to_list"}
+
+QUERY_SECONDS = histogram(
+    "lens_mongo_query_seconds",
+    "Seconds spent waiting on database queries.",
+    ["collection", "operation"]
+)
+
+
+def _record(collection, operation, start, request):
+    """Records a completed query."""
+    seconds = time.time() - start
+    QUERY_SECONDS.observe(seconds, (collection, operation))
+    if request is not None:
+        request.queries += 1
+        request.query_seconds += seconds
+
+
+def _timed(method, collection, operation):
+    """Wraps an asynchronous Motor method so its queries are recorded.
+
+    Args:
+        method: Motor method, which takes a callback or returns a Future.
+        collection: Collection name.
+        operation: Operation name.
+
+    Returns:
+        Function.
+    """
+    def timed(*args, **kwargs):
+        # The request is looked up now, since the query may complete while
+        # another request is being handled.
+        request = current_request()
+        start = time.time()
+
+        callback = kwargs.get("callback")
+        if callback:
+            def done(*args, **kwargs):
+                _record(collection, operation, start, request)
+                return callback(*args, **kwargs)
+            kwargs["callback"] = done
+            return method(*args, **kwargs)
+
+        future = method(*args, **kwargs)
+
+        # Results a cursor had already fetched never reach the database.
+        if not future.done():
+            future.add_done_callback(
+                lambda _: _record(collection, operation, start, request)
+            )
+        return future
+    return timed
+
+
+class TimedCursor(object):
+
+    """MotorCursor that records the queries it makes."""
+
+    def __init__(self, cursor, collection):
+        """Constructs a TimedCursor.
+
+        Args:
+            cursor: MotorCursor.
+            collection: Collection name.
+        """
+        self._cursor = cursor
+        self._collection = collection
+
+    @property
+    def fetch_next(self):
+        """Future resolving to whether there is another document, as with
+        MotorCursor.fetch_next.
+        """
+        return _timed(
+            lambda: self._cursor.fetch_next, self._collection, "fetch_next"
+        )()
+
+    def __getattr__(self, name):
+        attr = getattr(self._cursor, name)
+        if name in CURSOR_OPERATIONS:
+            return _timed(attr, self._collection, name)
+        if not callable(attr):
+            return attr
+
+        # Keep chained calls like sort() and limit() timed.
+        def chained(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            return self if result is self._cursor else result
+        return chained
+
+
+class TimedCollection(object):
+
+    """MotorCollection that records the queries it makes."""
+
+    def __init__(self, collection):
+        """Constructs a TimedCollection.
+
+        Args:
+            collection: MotorCollection.
+        """
+        self._collection = collection
+
+    def find(self, *args, **kwargs):
+        """Returns a TimedCursor, as with MotorCollection.find()."""
+        return TimedCursor(
+            self._collection.find(*args, **kwargs), self._collection.name
+        )
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name in COLLECTION_OPERATIONS:
+            return _timed(attr, self._collection.name, name)
+        return attr
+
+
+def instrument_queries():
+    """Records every query made through a document's QuerySet.
+
+    Queries are timed by collection and operation, and counted towards the
+    request that made them, if any.
+    """
+    coll = QuerySet.coll
+    if getattr(coll, "timed", False):
+        return
+
+    def timed_coll(self, alias=None):
+        return TimedCollection(coll(self, alias))
+    timed_coll.timed = True
+    QuerySet.coll = timed_coll
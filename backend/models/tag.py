@@ -2,8 +2,11 @@
 
 """Tag model."""
 
-from motorengine import Document, fields
+from upsert import upsert
+from functools import partial
+from helpers import get_intern_cache
 from tornado.gen import coroutine, Return
+from motorengine import ASCENDING, Document, fields
 
 __author__ = "Monica Ung, Anass Al-Wohoush"
 __version__ = "0.1.0"
@@ -17,6 +20,9 @@ class Tag(Document):
     """
 
     __collection__ = "tags"
+    __indexes__ = [
+        ([("name", ASCENDING)], {"unique": True}),
+    ]
 
     name = fields.StringField(required=True)
 
@@ -27,7 +33,9 @@ class Tag(Document):
     @classmethod
     @coroutine
     def from_tag(cls, name):
-        """Creates a tag and writes it to the database.
+        """Returns a tag by name, creating it in the database if needed.
+
+        Tags are interned, so hot tag names resolve without a round trip.
 
         Args:
             name: tag name.
@@ -35,11 +43,28 @@ class Tag(Document):
         Returns:
             Tag.
         """
-        # Look up if tag already exists.
-        tags = yield Tag.objects.filter(name=name).limit(1).find_all()
-        if tags:
-            raise Return(tags[0])
-
-        # Otherwise, create a new one.
-        tag = yield Tag.objects.create(name=name)
+        tag = yield get_intern_cache(cls.__collection__).get(
+            name, partial(upsert, cls, {"name": name})
+        )
         raise Return(tag)
+
+    @classmethod
+    @coroutine
+    def ids_by_name(cls, names):
+        """Looks up the IDs of existing tags by name without creating any.
+
+        Args:
+            names: List of tag names.
+
+        Returns:
+            Dictionary of tag ObjectIds by name for the tags that exist.
+        """
+        if not names:
+            raise Return({})
+
+        cursor = Tag.objects.coll().find(
+            {"name": {"$in": list(names)}},
+            fields=["name"]
+        )
+        docs = yield cursor.to_list(None)
+        raise Return(dict((doc["name"], doc["_id"]) for doc in docs))
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+"""Atomic get-or-create."""
+
+from tornado.gen import coroutine, Return
+from pymongo.errors import OperationFailure
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+# MongoDB duplicate key error code.
+DUPLICATE_KEY = 11000
+
+
+@coroutine
+def upsert(document_type, query, defaults=None):
+    """Returns the document matching a query, atomically creating it if it
+    doesn't exist.
+
+    Concurrent callers all get the same document, as long as the queried
+    fields have a unique index.
+
+    Args:
+        document_type: Document class.
+        query: Dictionary of field values identifying the document.
+        defaults: Dictionary of other field values to create it with.
+
+    Returns:
+        Document.
+    """
+    coll = document_type.objects.coll()
+    values = dict(defaults or {}, **query)
+
+    try:
+        doc = yield coll.find_and_modify(
+            query,
+            {"$setOnInsert": values},
+            upsert=True,
+            new=True
+        )
+    except OperationFailure as e:
+        # Two upserts raced to insert the same document and this one lost,
+        # so the document now exists.
+        if e.code != DUPLICATE_KEY:
+            raise
+        doc = yield coll.find_one(query)
+
+    raise Return(document_type.from_son(doc))
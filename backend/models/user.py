@@ -2,8 +2,11 @@
 
 """User model."""
 
-from motorengine import Document, fields
+from upsert import upsert
+from functools import partial
+from helpers import get_intern_cache
 from tornado.gen import coroutine, Return
+from motorengine import ASCENDING, Document, fields
 
 __author__ = "Monica Ung, Anass Al-Wohoush"
 __version__ = "0.1.0"
@@ -18,6 +21,9 @@ class User(Document):
     """
 
     __collection__ = "users"
+    __indexes__ = [
+        ([("name", ASCENDING)], {"unique": True}),
+    ]
 
     name = fields.StringField(required=True)
     points = fields.IntField(default=0)
@@ -32,7 +38,9 @@ class User(Document):
     @classmethod
     @coroutine
     def from_username(cls, name):
-        """Creates a user and writes it to the database.
+        """Returns a user by name, creating it in the database if needed.
+
+        Users are interned, so hot usernames resolve without a round trip.
 
         Args:
             name: Username.
@@ -40,21 +48,23 @@ class User(Document):
         Returns:
             User.
         """
-        # Look up if user already exists.
-        users = yield User.objects.filter(name=name).limit(1).find_all()
-        if users:
-            raise Return(users[0])
-
-        # Otherwise, create a new one.
-        user = yield User.objects.create(name=name)
+        user = yield get_intern_cache(cls.__collection__).get(
+            name, partial(upsert, cls, {"name": name}, {"points": 0})
+        )
         raise Return(user)
 
     @coroutine
     def add_points(self, pts):
         """Adds points to the user.
 
+        The increment is done on the server, so it isn't lost if this
+        instance is stale or shared.
+
         Args:
             pts: Number of points to increment by.
         """
         self.points += pts
-        yield self.save()
+        yield User.objects.coll().update(
+            {"_id": self._id},
+            {"$inc": {"points": pts}}
+        )
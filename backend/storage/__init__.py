@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+"""Lens Backend Image Storage."""
+
+from segment import SegmentStore
+from document import DocumentStore
+from tornado.options import options
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+__all__ = ["DocumentStore", "SegmentStore", "get_store", "store_for"]
+
+_stores = {}
+
+
+def get_store(name=None):
+    """Returns an image store.
+
+    Args:
+        name: Store name, defaults to the one set by --image_store.
+
+    Returns:
+        Image store.
+
+    Raises:
+        ValueError: If the store name is unknown.
+    """
+    name = name or options.image_store
+    if name not in _stores:
+        if name == DocumentStore.name:
+            _stores[name] = DocumentStore()
+        elif name == SegmentStore.name:
+            _stores[name] = SegmentStore(
+                options.segment_dir,
+                options.segment_size
+            )
+        else:
+            raise ValueError("Unknown image store: {}".format(name))
+    return _stores[name]
+
+
+def store_for(frame):
+    """Returns the image store a frame's image was written to.
+
+    Args:
+        frame: Frame.
+
+    Returns:
+        Image store.
+    """
+    if frame.locator:
+        return get_store(SegmentStore.name)
+    return get_store(DocumentStore.name)
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+"""In-document image store."""
+
+import six
+import base64
+from bson import Binary
+from tornado.gen import coroutine
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+
+class DocumentStore(object):
+
+    """Stores encoded images inside the frame document itself."""
+
+    name = "document"
+
+    @coroutine
+    def put(self, frame, data):
+        """Stores an encoded image.
+
+        Args:
+            frame: Frame the image belongs to.
+            data: Encoded image byte string.
+        """
+        frame.data = Binary(data)
+
+    def get(self, frame):
+        """Returns a frame's encoded image.
+
+        Images are stored as BSON binary, but frames written by older versions
+        are base64 encoded strings and are decoded here until migrated.
+
+        Args:
+            frame: Frame.
+
+        Returns:
+            Encoded image byte string.
+        """
+        if isinstance(frame.data, six.text_type):
+            return base64.b64decode(frame.data)
+        return frame.data
+
+    @coroutine
+    def sync(self):
+        """Does nothing, since images are written along with their frame."""
+        pass
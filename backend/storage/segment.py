@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+"""Append-only segment file image store."""
+
+import os
+import mmap
+import fcntl
+from tornado.gen import coroutine
+from concurrent.futures import ThreadPoolExecutor
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+
+class SegmentStore(object):
+
+    """Stores encoded images in large append-only segment files on disk.
+
+    Only a [segment, offset, length] locator is kept on the frame, which keeps
+    image data out of MongoDB's working set. Segments are read through mmap,
+    so reading an image does not copy it.
+
+    Appends take an exclusive lock on the segment file, so several backend
+    processes can safely share the same directory. Appends and syncs are run
+    in order on a thread of their own, so the IOLoop never waits on the lock
+    or the disk.
+
+    Attributes:
+        path: Directory holding the segment files.
+        segment_size: Size in bytes after which a new segment is started.
+    """
+
+    name = "segment"
+
+    def __init__(self, path, segment_size):
+        """Constructs a SegmentStore.
+
+        Args:
+            path: Directory holding the segment files.
+            segment_size: Size in bytes after which a new segment is started.
+        """
+        self.path = path
+        self.segment_size = segment_size
+        self._file = None
+        self._segment = None
+        self._maps = {}
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    def _segment_path(self, segment):
+        """Returns the path of a segment file."""
+        return os.path.join(self.path, "{:08d}.seg".format(segment))
+
+    def _last_segment(self):
+        """Returns the number of the newest segment on disk."""
+        segments = [
+            int(f[:-4]) for f in os.listdir(self.path)
+            if f.endswith(".seg") and f[:-4].isdigit()
+        ]
+        return max(segments) if segments else 0
+
+    def _open(self, segment):
+        """Opens a segment for appending."""
+        if self._file:
+            self._sync()
+            self._file.close()
+        self._file = open(self._segment_path(segment), "ab")
+        self._segment = segment
+
+    def _append(self, data):
+        """Appends data to the current segment.
+
+        Args:
+            data: Byte string.
+
+        Returns:
+            Tuple of (segment, offset) the data was written at.
+        """
+        if self._file is None:
+            self._open(self._last_segment())
+
+        while True:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+            try:
+                self._file.seek(0, os.SEEK_END)
+                offset = self._file.tell()
+
+                # Another process may have moved on to a newer segment.
+                if offset and offset + len(data) > self.segment_size:
+                    segment = max(self._segment + 1, self._last_segment())
+                else:
+                    self._file.write(data)
+                    self._file.flush()
+                    return self._segment, offset
+            finally:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+
+            self._open(segment)
+
+    def _map(self, segment, size):
+        """Returns a read-only memory map of a segment.
+
+        Args:
+            segment: Segment number.
+            size: Minimum number of bytes that must be mapped.
+
+        Returns:
+            mmap.
+        """
+        mm = self._maps.get(segment)
+        if mm is None or len(mm) < size:
+            # Map the segment again since it grew since it was last mapped.
+            with open(self._segment_path(segment), "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[segment] = mm
+        return mm
+
+    def _sync(self):
+        """Flushes the current segment to disk."""
+        if self._file:
+            os.fsync(self._file.fileno())
+
+    @coroutine
+    def put(self, frame, data):
+        """Stores an encoded image.
+
+        Args:
+            frame: Frame the image belongs to.
+            data: Encoded image byte string.
+        """
+        segment, offset = yield self._executor.submit(self._append, data)
+        frame.locator = [segment, offset, len(data)]
+
+    def get(self, frame):
+        """Returns a frame's encoded image.
+
+        Args:
+            frame: Frame.
+
+        Returns:
+            Read-only buffer into the mapped segment.
+        """
+        segment, offset, length = frame.locator
+        return buffer(self._map(segment, offset + length), offset, length)
+
+    @coroutine
+    def sync(self):
+        """Flushes appended images to disk.
+
+        This should be called before writing frames that refer to them.
+        """
+        yield self._executor.submit(self._sync)
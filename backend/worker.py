@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+"""Lens Ingest Worker.
+
+Ingests queued bags in a separate process from the web server, so that
+ingestion doesn't compete with requests for the web server's IOLoop. Any
+number of workers can share the queue.
+
+Usage:
+    python worker.py [--db=lens] [--ingest_concurrency=2]
+
+Run the web server with --ingest_concurrency=0 to leave all ingestion to
+the workers. Bags must be uploaded to a path the workers can read.
+"""
+
+import logging
+from app import options
+from ingest import get_queue
+from motorengine import connect
+from tornado.ioloop import IOLoop
+
+__author__ = "Anass Al-Wohoush"
+__version__ = "0.1.0"
+
+
+def run():
+    """Runs the ingest worker."""
+    options.parse_command_line()
+    if options.ingest_concurrency < 1:
+        logging.error("--ingest_concurrency must be at least 1")
+        return
+
+    connect(options.db)
+    get_queue().start(options.ingest_poll_interval)
+    logging.critical("Ingesting up to %d bags at once",
+                     options.ingest_concurrency)
+
+    IOLoop.instance().start()
+
+
+if __name__ == "__main__":
+    run()
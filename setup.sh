@@ -44,9 +44,10 @@ sudo mkdir -p /var/log/nginx
 sudo rm -rf /tmp/pcre* /tmp/nginx-*
 
 # Install MongoDB.
-sudo apt-key adv --keyserver hkp://keyserver.ubuntu.com:80 --recv 7F0CEB10
-echo deb http://repo.mongodb.org/apt/ubuntu trusty/mongodb-org/3.0 multiverse \
-  | sudo tee /etc/apt/sources.list.d/mongodb-org-3.0.list
+# MongoDB 3.2 or later is required for partial indexes.
+sudo apt-key adv --keyserver hkp://keyserver.ubuntu.com:80 --recv EA312927
+echo deb http://repo.mongodb.org/apt/ubuntu trusty/mongodb-org/3.2 multiverse \
+  | sudo tee /etc/apt/sources.list.d/mongodb-org-3.2.list
 sudo apt-get update
 sudo apt-get install -y mongodb-org
 